@@ -0,0 +1,245 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+API = "/api"
+
+# Relative frequency of each kind of visit, roughly what the frontend sends:
+# mostly page views, some comments and likes
+WORKLOAD = {
+    "home": 30,
+    "blog_page": 30,
+    "post_page": 25,
+    "create_comment": 8,
+    "like_post": 5,
+    "like_blog": 2,
+}
+
+
+# Drives a mixed workload against the REST API booted on a temporary SQLite
+# file and reports throughput and p50/p95/p99 latency per endpoint. Runs are
+# reproducible for a given --seed, and a run can be saved as a baseline that
+# later runs are compared with.
+# By default the app runs in this process behind an ASGI transport, which
+# needs nothing beyond the requirements but shares one CPU with the clients.
+# --uvicorn starts a real server in a subprocess instead.
+# Usage: python -m benchmarks.api_load --concurrency 32 --duration 30 --save-baseline baseline.json
+#        python -m benchmarks.api_load --concurrency 32 --duration 30 --compare baseline.json
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[label].append(time.perf_counter() - started)
+        if response.status_code >= 500:
+            self.errors[label] += 1
+        return response
+
+    def report(self, duration: float) -> dict[str, dict[str, float]]:
+        report = {}
+        for label, latencies in sorted(self.latencies.items()):
+            percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+            report[label] = {
+                "requests": len(latencies),
+                "errors": self.errors[label],
+                "throughput": len(latencies) / duration,
+                "p50_ms": percentiles[49] * 1000,
+                "p95_ms": percentiles[94] * 1000,
+                "p99_ms": percentiles[98] * 1000,
+            }
+        return report
+
+
+async def seed(client: httpx.AsyncClient, arguments: argparse.Namespace, rng: random.Random) -> dict[str, list[dict]]:
+    users = []
+    for user_number in range(arguments.users):
+        response = await client.post(f"{API}/createUser", json={
+            "first_name": "Bench", "last_name": "User", "profile_name": f"bench{user_number}",
+            "password": "Passw0rd!", "email": f"bench{user_number}@example.com", "country": "PL"
+        })
+        users.append(response.json())
+
+    blogs = []
+    for blog_number in range(arguments.blogs):
+        response = await client.post(f"{API}/createBlog", json={
+            "user_id": users[blog_number % len(users)]["id"], "title": f"Bench blog {blog_number}",
+            "description": "Benchmark blog"
+        })
+        blogs.append(response.json())
+
+    post_schemas = [{
+        "user_id": blogs[post_number % len(blogs)]["owners"][0]["id"], "blog_id": blogs[post_number % len(blogs)]["id"],
+        "title": f"Bench post {post_number}", "body": "Benchmark post body " * 20
+    } for post_number in range(arguments.posts)]
+    await client.post(f"{API}/createPosts", json=post_schemas)
+    posts = []
+    cursor = None
+    while True:
+        params = {"limit": 200} if cursor is None else {"limit": 200, "cursor": cursor}
+        response = await client.get(f"{API}/getAllPosts", params=params)
+        posts.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    comment_schemas = [{
+        "user_id": rng.choice(users)["id"], "post_id": rng.choice(posts)["id"], "body": "Benchmark comment"
+    } for _ in range(arguments.comments)]
+    for chunk_start in range(0, len(comment_schemas), 5000):
+        await client.post(f"{API}/createComments", json=comment_schemas[chunk_start:chunk_start + 5000])
+
+    return {"users": users, "blogs": blogs, "posts": posts}
+
+
+async def visit(client: httpx.AsyncClient, recorder: Recorder, data: dict[str, list[dict]], rng: random.Random) -> None:
+    user = rng.choice(data["users"])
+    kind = rng.choices(list(WORKLOAD), weights=list(WORKLOAD.values()))[0]
+
+    if kind == "home":
+        await asyncio.gather(
+            recorder.request(client, "getNMostPopularBlogs", "GET", f"{API}/getNMostPopularBlogs",
+                             params={"amount_to_display": 10}),
+            recorder.request(client, "getUser", "GET", f"{API}/getUser/{user['uuid']}")
+        )
+    elif kind == "blog_page":
+        blog = rng.choice(data["blogs"])
+        await asyncio.gather(
+            recorder.request(client, "getBlog", "GET", f"{API}/getBlog/{blog['uuid']}"),
+            recorder.request(client, "getBlogPosts", "GET", f"{API}/getBlogPosts/{blog['uuid']}"),
+            recorder.request(client, "getUser", "GET", f"{API}/getUser/{user['uuid']}")
+        )
+    elif kind == "post_page":
+        post = rng.choice(data["posts"])
+        await asyncio.gather(
+            recorder.request(client, "getPost", "GET", f"{API}/getPost/{post['uuid']}"),
+            recorder.request(client, "getPostComments", "GET", f"{API}/getPostComments/{post['uuid']}")
+        )
+    elif kind == "create_comment":
+        post = rng.choice(data["posts"])
+        await recorder.request(client, "createComment", "POST", f"{API}/createComment",
+                               json={"user_id": user["id"], "post_id": post["id"], "body": "Load test comment"})
+    elif kind == "like_post":
+        post = rng.choice(data["posts"])
+        await recorder.request(client, "createPostLike", "POST", f"{API}/createPostLike",
+                               json={"user_id": user["id"], "post_id": post["id"]})
+    else:
+        blog = rng.choice(data["blogs"])
+        await recorder.request(client, "createBlogLike", "POST", f"{API}/createBlogLike",
+                               json={"user_id": user["id"], "blog_id": blog["id"]})
+
+
+async def drive(client: httpx.AsyncClient, arguments: argparse.Namespace) -> tuple[dict, float]:
+    rng = random.Random(arguments.seed)
+    data = await seed(client, arguments, rng)
+    recorder = Recorder()
+    deadline = time.perf_counter() + arguments.duration
+
+    async def worker(worker_number: int) -> None:
+        worker_rng = random.Random(arguments.seed * 1000 + worker_number)
+        while time.perf_counter() < deadline:
+            await visit(client, recorder, data, worker_rng)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(worker_number) for worker_number in range(arguments.concurrency)))
+    return recorder.report(time.perf_counter() - started), time.perf_counter() - started
+
+
+async def run_in_process(arguments: argparse.Namespace) -> tuple[dict, float]:
+    from src.backend import database
+    from src.backend.main import app
+
+    database.engine.echo = False
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            return await drive(client, arguments)
+    finally:
+        await app.router.shutdown()
+
+
+async def run_with_uvicorn(arguments: argparse.Namespace) -> tuple[dict, float]:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.backend.main:app", "--port", str(arguments.port),
+         "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, env=os.environ
+    )
+    base_url = f"http://127.0.0.1:{arguments.port}"
+    limits = httpx.Limits(max_connections=arguments.concurrency * 3)
+
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/docs")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            return await drive(client, arguments)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def print_report(report: dict, duration: float, baseline: dict | None) -> None:
+    total = sum(row["requests"] for row in report.values())
+    print(f"{total} requests in {duration:.1f}s, {total / duration:.0f} req/s")
+    print(f"{'endpoint':<22}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+
+    for label, row in report.items():
+        line = f"{label:<22}{row['requests']:>10}{row['errors']:>8}{row['throughput']:>10.1f}" \
+               f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+        if baseline is not None and label in baseline:
+            changes = [(row[key] - baseline[label][key]) / baseline[label][key] * 100
+                       for key in ("p50_ms", "p95_ms", "p99_ms") if baseline[label][key]]
+            line += "   vs baseline " + " ".join(f"{change:+.0f}%" for change in changes)
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mixed-workload load test of the REST API")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--blogs", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--comments", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--uvicorn", action="store_true")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--save-baseline")
+    parser.add_argument("--compare")
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["BLOG_DB_URL"] = f"sqlite+aiosqlite:///{os.path.join(directory, 'benchmark.db')}"
+        runner = run_with_uvicorn if arguments.uvicorn else run_in_process
+        report, duration = asyncio.run(runner(arguments))
+
+    baseline = None
+    if arguments.compare:
+        with open(arguments.compare) as baseline_file:
+            baseline = json.load(baseline_file)["endpoints"]
+
+    print_report(report, duration, baseline)
+
+    if arguments.save_baseline:
+        with open(arguments.save_baseline, "w") as baseline_file:
+            json.dump({"arguments": vars(arguments), "endpoints": report}, baseline_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
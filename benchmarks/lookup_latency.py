@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from src.backend.models.models import get_metadata, User, Blog, UserBlog, Post, Comment, BlogLike
+from src.backend.services import get
+
+CHUNK_SIZE = 50_000
+LOOKUPS_PER_CASE = 2_000
+
+
+# Measures the lookup paths of services/get.py on databases of growing size.
+# With the indexes declared in models.py every lookup is an index seek, so the
+# median latency should stay roughly flat as the row count grows.
+# Usage: python -m benchmarks.lookup_latency --scales 10000 100000 1000000 10000000
+def build_database(path: str, rows: int) -> dict:
+    engine = create_engine(f"sqlite:///{path}")
+    get_metadata().create_all(engine)
+    blogs = max(rows // 10, 1)
+    start = datetime(2020, 1, 1)
+    samples = {"user_uuids": [], "profile_names": [], "blog_uuids": [], "blog_titles": [], "post_uuids": [],
+               "post_titles": [], "comment_uuids": []}
+
+    def chunks(total, make_row):
+        for chunk_start in range(1, total + 1, CHUNK_SIZE):
+            yield [make_row(row_id) for row_id in range(chunk_start, min(chunk_start + CHUNK_SIZE, total + 1))]
+
+    seen = dict.fromkeys(samples, 0)
+
+    # Reservoir sampling: the n-th value replaces a random sample with
+    # probability LOOKUPS_PER_CASE / n, so every row is equally likely to be
+    # looked up, wherever it sits in the table
+    def sample(key, value):
+        seen[key] += 1
+        if len(samples[key]) < LOOKUPS_PER_CASE:
+            samples[key].append(value)
+        else:
+            position = random.randrange(seen[key])
+            if position < LOOKUPS_PER_CASE:
+                samples[key][position] = value
+        return value
+
+    with engine.begin() as connection:
+        for chunk in chunks(rows, lambda row_id: {
+            "id": row_id, "uuid": sample("user_uuids", uuid4()), "first_name": "First", "last_name": "Last",
+            "profile_name": sample("profile_names", f"user{row_id}"), "email": f"user{row_id}@example.com",
+            "password": "Passw0rd!", "country": "PL", "created_at": start + timedelta(seconds=row_id)
+        }):
+            connection.execute(insert(User), chunk)
+
+        for chunk in chunks(blogs, lambda row_id: {
+            "id": row_id, "uuid": sample("blog_uuids", uuid4()), "title": sample("blog_titles", f"Blog {row_id}"),
+            "description": "Description", "created_at": start + timedelta(seconds=row_id)
+        }):
+            connection.execute(insert(Blog), chunk)
+
+        for chunk in chunks(blogs, lambda row_id: {"app_user_id": row_id, "blog_id": row_id}):
+            connection.execute(insert(UserBlog), chunk)
+
+        def post_row(row_id):
+            blog_id = (row_id - 1) % blogs + 1
+            sample("post_titles", (f"Post {row_id}", blog_id))
+            return {"id": row_id, "uuid": sample("post_uuids", uuid4()), "blog_id": blog_id, "user_id": blog_id,
+                    "title": f"Post {row_id}", "body": "Body", "created_at": start + timedelta(seconds=row_id)}
+
+        for chunk in chunks(rows, post_row):
+            connection.execute(insert(Post), chunk)
+
+        for chunk in chunks(rows, lambda row_id: {
+            "id": row_id, "uuid": sample("comment_uuids", uuid4()), "user_id": row_id, "post_id": row_id,
+            "body": "Comment", "created_at": start + timedelta(seconds=row_id)
+        }):
+            connection.execute(insert(Comment), chunk)
+
+        for chunk in chunks(rows, lambda row_id: {
+            "app_user_id": row_id, "blog_id": (row_id - 1) % blogs + 1, "liked_at": start + timedelta(seconds=row_id)
+        }):
+            connection.execute(insert(BlogLike), chunk)
+
+    engine.dispose()
+    return samples
+
+
+async def measure(path: str, samples: dict) -> dict[str, float]:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    session_maker = async_sessionmaker(bind=engine, expire_on_commit=False)
+    cases = {
+        "get_user_by_uuid": lambda session, i: get.get_user_by_uuid(session, samples["user_uuids"][i]),
+        "get_user_by_username": lambda session, i: get.get_user_by_username(session, samples["profile_names"][i]),
+        "get_blog_by_uuid": lambda session, i: get.get_blog_by_uuid(session, samples["blog_uuids"][i]),
+        "get_blog_by_title": lambda session, i: get.get_blog_by_title(session, samples["blog_titles"][i]),
+        "get_post_by_uuid": lambda session, i: get.get_post_by_uuid(session, samples["post_uuids"][i]),
+        "get_post_by_title": lambda session, i: get.get_post_by_title(session, *samples["post_titles"][i]),
+        "get_post_comments_by_uuid": lambda session, i: get.get_post_comments_by_uuid(
+            session, samples["post_uuids"][i], None, 50),
+        "get_user_comments_by_uuid": lambda session, i: get.get_user_comments_by_uuid(
+            session, samples["user_uuids"][i]),
+        "get_blog_like_count_by_uuid": lambda session, i: get.get_blog_like_count_by_uuid(
+            session, samples["blog_uuids"][i]),
+    }
+    results = {}
+
+    for name, lookup in cases.items():
+        timings = []
+        for i in range(min(LOOKUPS_PER_CASE, len(samples["blog_uuids"]))):
+            async with session_maker() as session:
+                started = time.perf_counter()
+                await lookup(session, i)
+                timings.append(time.perf_counter() - started)
+        results[name] = statistics.median(timings) * 1_000_000
+
+    await engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Lookup latency of the get services by table size")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    arguments = parser.parse_args()
+    random.seed(0)
+    results = {}
+
+    for rows in arguments.scales:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "benchmark.db")
+            started = time.perf_counter()
+            samples = build_database(path, rows)
+            print(f"built {rows:,} rows per table in {time.perf_counter() - started:.1f}s")
+            results[rows] = asyncio.run(measure(path, samples))
+
+    print(f"{'median latency (us)':<30}" + "".join(f"{rows:>14,}" for rows in arguments.scales))
+    for name in results[arguments.scales[0]]:
+        print(f"{name:<30}" + "".join(f"{results[rows][name]:>14.0f}" for rows in arguments.scales))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import logging
+import random
+from array import array
+from datetime import datetime, timedelta
+from typing import Iterator
+from uuid import UUID
+
+from sqlalchemy import Table, insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.backend.commands.jsonl import CHUNK_SIZE, non_empty_tables
+from src.backend.database import engine, SessionLocal
+from src.backend.models.migrations import migrate
+from src.backend.models.models import get_metadata, User, UserFollowing, UserBlog, Blog, BlogLike, BlogSave, Post, \
+    PostLike, PostSave, Comment, CommentLike, CommentSave
+from src.backend.services.counters import reconcile_counters
+from src.backend.services.feed import rebuild_timelines
+
+START = datetime(2020, 1, 1)
+SPAN_SECONDS = 3 * 365 * 24 * 3600
+
+# Average number of rows of every other table per user. Each user's own
+# activity is heavy-tailed around these means, and the rows they point at are
+# drawn from a power law, so a few users, blogs and posts collect most of the
+# followers, posts, comments, likes and saves.
+PER_USER = {
+    "blogs": 0.1,
+    "posts": 1.0,
+    "comments": 2.0,
+    "follows": 5.0,
+    "blog_likes": 0.5,
+    "post_likes": 2.0,
+    "comment_likes": 1.0,
+    "blog_saves": 0.2,
+    "post_saves": 0.5,
+    "comment_saves": 0.2,
+}
+ACTIVITY_ALPHA = 2.0
+# Every 5th blog has a second owner and every 25th a third
+SECOND_OWNER_EVERY = 5
+THIRD_OWNER_EVERY = 25
+# Prime larger than any table, multiplying ranks by it spreads the most
+# popular rows over the whole id range instead of the oldest ids
+SPREAD_PRIME = 2_147_483_647
+
+FIRST_NAMES = ["Anna", "Jakub", "Maria", "Piotr", "Julia", "Tomasz", "Emma", "Liam", "Olivia", "Noah", "Zofia",
+               "Jan", "Lena", "Adam", "Mia", "Lucas"]
+LAST_NAMES = ["Nowak", "Kowalski", "Smith", "Johnson", "Wisniewska", "Muller", "Garcia", "Brown", "Lewandowski",
+              "Rossi", "Martin", "Silva"]
+COUNTRIES = ["PL", "US", "DE", "GB", "FR", "ES", "IT", "NL", "SE", "CZ", "UA", "BR", "IN", "JP"]
+WORDS = ["python", "database", "index", "query", "cache", "latency", "travel", "mountain", "coffee", "recipe",
+         "garden", "music", "guitar", "film", "review", "camera", "photo", "city", "river", "winter", "summer",
+         "running", "training", "book", "novel", "history", "science", "space", "planet", "game", "design",
+         "startup", "market", "bread", "cheese", "bicycle", "weekend", "family", "morning", "evening", "update",
+         "project", "release", "server", "network", "language", "learning", "teacher", "student", "story", "the",
+         "and", "with", "about", "after", "before", "every", "today", "really", "great", "small", "new", "old"]
+
+logger = logging.getLogger(__name__)
+
+
+# Builds a deterministic dataset for a number of users: the same seed and
+# scale always produce the same rows, uuids and timestamps. Rows are
+# generated in id order and streamed to the database in chunks, so apart
+# from the creation times of blogs, posts and comments (8 bytes per row,
+# needed to keep every row younger than the rows it points at) memory use
+# does not grow with the dataset.
+class DatasetGenerator:
+    def __init__(self, users: int, seed: int, popularity_exponent: float):
+        self.rng = random.Random(seed)
+        self.exponent = popularity_exponent
+        self.users = users
+        self.blogs = max(round(users * PER_USER["blogs"]), 1)
+        self.posts = round(users * PER_USER["posts"])
+        self.comments = round(users * PER_USER["comments"])
+        self.blog_times = array("d")
+        self.post_times = array("d")
+        self.comment_times = array("d")
+
+    # Rank of a draw from a bounded power law over 1..n, P(rank = k) ~ k^-exponent
+    def popular_rank(self, n: int) -> int:
+        u = self.rng.random()
+
+        if self.exponent == 1:
+            return min(int((n + 1) ** u), n)
+
+        a = 1 - self.exponent
+        return min(int((1 + u * ((n + 1) ** a - 1)) ** (1 / a)), n)
+
+    def popular_id(self, n: int) -> int:
+        return spread(self.popular_rank(n), n)
+
+    # Heavy-tailed (Pareto) number of rows with the given mean, rounded
+    # stochastically so that small means are not rounded down to zero
+    def activity(self, mean: float, limit: int) -> int:
+        excess = (self.rng.paretovariate(ACTIVITY_ALPHA) - 1) * (ACTIVITY_ALPHA - 1)
+        return min(int(mean * excess + self.rng.random()), limit)
+
+    # A time between the given offset, in seconds from START, and the end of
+    # the covered period
+    def time_after(self, offset: float) -> float:
+        return offset + self.rng.random() * (SPAN_SECONDS - offset)
+
+    def uuid(self) -> UUID:
+        return UUID(int=self.rng.getrandbits(128), version=4)
+
+    def text(self, min_words: int, max_words: int) -> str:
+        return " ".join(self.rng.choices(WORDS, k=self.rng.randint(min_words, max_words)))
+
+    def user_time(self, user_id: int) -> float:
+        return SPAN_SECONDS * (user_id - 1) / self.users
+
+    def blog_time(self, blog_id: int) -> float:
+        return self.blog_times[blog_id - 1]
+
+    def post_time(self, post_id: int) -> float:
+        return self.post_times[post_id - 1]
+
+    def comment_time(self, comment_id: int) -> float:
+        return self.comment_times[comment_id - 1]
+
+    def blog_owners(self, blog_id: int) -> list[int]:
+        owner_ranks = [blog_id]
+        if blog_id % SECOND_OWNER_EVERY == 0:
+            owner_ranks.append(blog_id + self.blogs)
+        if blog_id % THIRD_OWNER_EVERY == 0:
+            owner_ranks.append(blog_id + 2 * self.blogs)
+        return list(dict.fromkeys(spread((rank - 1) % self.users + 1, self.users) for rank in owner_ranks))
+
+    def user_rows(self) -> Iterator[dict]:
+        for user_id in range(1, self.users + 1):
+            yield {"id": user_id, "uuid": self.uuid(), "first_name": self.rng.choice(FIRST_NAMES),
+                   "last_name": self.rng.choice(LAST_NAMES), "profile_name": f"user{user_id}",
+                   "email": f"user{user_id}@example.com", "password": "Passw0rd!",
+                   "country": self.rng.choice(COUNTRIES), "created_at": at(self.user_time(user_id))}
+
+    def blog_rows(self) -> Iterator[dict]:
+        for blog_id in range(1, self.blogs + 1):
+            created = self.time_after(max(self.user_time(owner_id) for owner_id in self.blog_owners(blog_id)))
+            self.blog_times.append(created)
+            yield {"id": blog_id, "uuid": self.uuid(), "title": f"Blog {blog_id} {self.text(1, 3)}",
+                   "description": self.text(5, 20), "created_at": at(created)}
+
+    def user_blog_rows(self) -> Iterator[dict]:
+        for blog_id in range(1, self.blogs + 1):
+            for owner_id in self.blog_owners(blog_id):
+                yield {"app_user_id": owner_id, "blog_id": blog_id}
+
+    def post_rows(self) -> Iterator[dict]:
+        for post_id in range(1, self.posts + 1):
+            blog_id = self.popular_id(self.blogs)
+            created = self.time_after(self.blog_time(blog_id))
+            self.post_times.append(created)
+            yield {"id": post_id, "uuid": self.uuid(), "blog_id": blog_id,
+                   "user_id": self.rng.choice(self.blog_owners(blog_id)), "title": f"Post {post_id}",
+                   "body": self.text(20, 120), "created_at": at(created)}
+
+    def comment_rows(self) -> Iterator[dict]:
+        for comment_id in range(1, self.comments + 1):
+            post_id = self.popular_id(self.posts)
+            user_id = self.popular_id(self.users)
+            created = self.time_after(max(self.post_time(post_id), self.user_time(user_id)))
+            self.comment_times.append(created)
+            yield {"id": comment_id, "uuid": self.uuid(), "user_id": user_id, "post_id": post_id,
+                   "body": self.text(3, 40), "created_at": at(created)}
+
+    # Rows of an association table, per user a heavy-tailed number of distinct
+    # targets drawn from the power law. Draws of a target the user already
+    # picked are dropped, which only thins out the most active users a little.
+    def association_rows(self, per_user: str, targets: int, target_times, target_key: str, time_key: str,
+                         user_key: str = "app_user_id") -> Iterator[dict]:
+        for user_id in range(1, self.users + 1):
+            picked = {self.popular_id(targets) for _ in range(self.activity(PER_USER[per_user], targets))}
+
+            for target_id in sorted(picked):
+                created = self.time_after(max(self.user_time(user_id), target_times(target_id)))
+                yield {user_key: user_id, target_key: target_id, time_key: at(created)}
+
+    def follow_rows(self) -> Iterator[dict]:
+        for row in self.association_rows("follows", self.users, self.user_time, "app_user_id", "followed_at",
+                                         user_key="follower_id"):
+            if row["app_user_id"] != row["follower_id"]:
+                yield row
+
+    def tables(self) -> Iterator[tuple[Table, Iterator[dict]]]:
+        yield User.__table__, self.user_rows()
+        yield Blog.__table__, self.blog_rows()
+        yield UserBlog.__table__, self.user_blog_rows()
+        yield Post.__table__, self.post_rows()
+        yield Comment.__table__, self.comment_rows()
+        yield UserFollowing.__table__, self.follow_rows()
+        yield BlogLike.__table__, self.association_rows("blog_likes", self.blogs, self.blog_time, "blog_id", "liked_at")
+        yield PostLike.__table__, self.association_rows("post_likes", self.posts, self.post_time, "post_id", "liked_at")
+        yield CommentLike.__table__, self.association_rows("comment_likes", self.comments, self.comment_time,
+                                                           "comment_id", "liked_at")
+        yield BlogSave.__table__, self.association_rows("blog_saves", self.blogs, self.blog_time, "blog_id", "saved_at")
+        yield PostSave.__table__, self.association_rows("post_saves", self.posts, self.post_time, "post_id", "saved_at")
+        yield CommentSave.__table__, self.association_rows("comment_saves", self.comments, self.comment_time,
+                                                           "comment_id", "saved_at")
+
+
+# Bijection of 1..n onto itself, as SPREAD_PRIME is coprime with any smaller n
+def spread(rank: int, n: int) -> int:
+    return (rank - 1) * SPREAD_PRIME % n + 1
+
+
+def at(offset: float) -> datetime:
+    return START + timedelta(seconds=offset)
+
+
+async def insert_rows(connection: AsyncConnection, table: Table, rows: Iterator[dict]) -> None:
+    inserted = 0
+    chunk = []
+
+    async def flush() -> None:
+        nonlocal inserted
+        async with connection.begin():
+            await connection.execute(insert(table), chunk)
+        inserted += len(chunk)
+        logger.info("Inserted %d rows into %s", inserted, table.name)
+        chunk.clear()
+
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            await flush()
+
+    if chunk:
+        await flush()
+
+
+# Fills an empty database with a synthetic dataset for load tests and
+# benchmarks. The full-text search indexes are only created once all rows are
+# in, as one rebuild is much faster than firing their triggers for every
+# insert, and the like and save counters and the home timelines are computed
+# at the end by reconcile_counters and rebuild_timelines.
+# Usage: python -m src.backend.commands.generate --users 1000000 --seed 42
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Fill an empty blog database with a synthetic dataset")
+    parser.add_argument("--users", type=int, required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--popularity-exponent", type=float, default=1.1)
+    arguments = parser.parse_args()
+    engine.echo = False
+
+    async with engine.begin() as connection:
+        await connection.run_sync(get_metadata().create_all)
+
+    async with engine.connect() as connection:
+        occupied_tables = await non_empty_tables(connection)
+        await connection.commit()
+
+        if occupied_tables:
+            logger.error("Generating needs an empty database, but %s already hold rows", ", ".join(occupied_tables))
+        else:
+            generator = DatasetGenerator(arguments.users, arguments.seed, arguments.popularity_exponent)
+            for table, rows in generator.tables():
+                await insert_rows(connection, table, rows)
+
+    if not occupied_tables:
+        async with engine.begin() as connection:
+            await connection.run_sync(migrate)
+
+        async with SessionLocal() as session:
+            await reconcile_counters(session)
+            await rebuild_timelines(session)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
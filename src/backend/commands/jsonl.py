@@ -0,0 +1,149 @@
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+from datetime import datetime
+from typing import IO
+from uuid import UUID
+
+from sqlalchemy import Table, insert, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.backend.database import engine
+from src.backend.models.migrations import migrate
+from src.backend.models.models import get_metadata
+
+CHUNK_SIZE = 10_000
+
+logger = logging.getLogger(__name__)
+
+
+# Streams the whole database to and from JSONL, one {"table": ..., "row": ...}
+# object per line. Tables are written parents first and read back in the same
+# order, with their ids and uuids kept, so every relationship survives the
+# round trip. Rows are read and inserted CHUNK_SIZE at a time, each chunk in
+# its own transaction, so memory use does not grow with the database.
+# Files ending in .gz are compressed.
+# Usage: python -m src.backend.commands.jsonl export blog.jsonl.gz
+#        python -m src.backend.commands.jsonl import blog.jsonl.gz
+def open_dump(path: str, mode: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Cannot export value of type {type(value).__name__}")
+
+
+# JSON has no datetime or uuid, so those columns are converted back according
+# to the column types of the models
+def column_decoders(table: Table) -> dict:
+    decoders = {}
+
+    for column in table.columns:
+        python_type = column.type.python_type
+        if python_type is datetime:
+            decoders[column.key] = datetime.fromisoformat
+        elif python_type is UUID:
+            decoders[column.key] = UUID
+
+    return decoders
+
+
+async def export_dump(connection: AsyncConnection, path: str) -> None:
+    with open_dump(path, "w") as dump:
+        for table in get_metadata().sorted_tables:
+            exported = 0
+            result = await connection.stream(
+                select(table).
+                order_by(*table.primary_key.columns).
+                execution_options(yield_per=CHUNK_SIZE)
+            )
+
+            async for rows in result.mappings().partitions():
+                dump.writelines(json.dumps({"table": table.name, "row": dict(row)}, default=encode_value) + "\n"
+                                for row in rows)
+                exported += len(rows)
+                logger.info("Exported %d rows from %s", exported, table.name)
+
+
+# Imported ids are kept as they are, so they must not collide with rows
+# already in the database
+async def non_empty_tables(connection: AsyncConnection) -> list[str]:
+    return [table.name for table in get_metadata().sorted_tables
+            if await connection.scalar(select(select(table).exists()))]
+
+
+async def import_dump(connection: AsyncConnection, path: str) -> None:
+    tables = {table.name: table for table in get_metadata().sorted_tables}
+    imported = dict.fromkeys(tables, 0)
+    table = None
+    decoders = {}
+    rows = []
+
+    async def flush() -> None:
+        async with connection.begin():
+            await connection.execute(insert(table), rows)
+        imported[table.name] += len(rows)
+        logger.info("Imported %d rows into %s", imported[table.name], table.name)
+        rows.clear()
+
+    with open_dump(path, "r") as dump:
+        for line in dump:
+            entry = json.loads(line)
+
+            if table is None or entry["table"] != table.name:
+                if rows:
+                    await flush()
+                table = tables[entry["table"]]
+                decoders = column_decoders(table)
+
+            row = entry["row"]
+            for key, decode in decoders.items():
+                if row.get(key) is not None:
+                    row[key] = decode(row[key])
+            rows.append(row)
+
+            if len(rows) >= CHUNK_SIZE:
+                await flush()
+
+    if rows:
+        await flush()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Export or import the blog database as JSONL")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path")
+    arguments = parser.parse_args()
+    engine.echo = False
+
+    if arguments.action == "export":
+        async with engine.connect() as connection:
+            await export_dump(connection, arguments.path)
+    else:
+        async with engine.begin() as connection:
+            await connection.run_sync(get_metadata().create_all)
+            await connection.run_sync(migrate)
+
+        async with engine.connect() as connection:
+            occupied_tables = await non_empty_tables(connection)
+            await connection.commit()
+
+            if occupied_tables:
+                logger.error("Import needs an empty database, but %s already hold rows", ", ".join(occupied_tables))
+            else:
+                await import_dump(connection, arguments.path)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
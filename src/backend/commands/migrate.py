@@ -0,0 +1,21 @@
+import asyncio
+import logging
+
+from src.backend.database import engine
+from src.backend.models.migrations import migrate
+from src.backend.models.models import get_metadata
+
+
+# Brings an existing database up to date with the models without starting the
+# API. Usage: python -m src.backend.commands.migrate
+async def main() -> None:
+    async with engine.begin() as connection:
+        await connection.run_sync(get_metadata().create_all)
+        await connection.run_sync(migrate)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
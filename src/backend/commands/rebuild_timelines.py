@@ -0,0 +1,24 @@
+import asyncio
+
+from src.backend.database import engine, SessionLocal
+from src.backend.models.migrations import migrate
+from src.backend.models.models import get_metadata
+from src.backend.services.feed import rebuild_timelines
+
+
+# Refills every home timeline from the follows and posts, needed after
+# importing follows or upgrading a database created before timelines existed.
+# Usage: python -m src.backend.commands.rebuild_timelines
+async def main() -> None:
+    async with engine.begin() as connection:
+        await connection.run_sync(get_metadata().create_all)
+        await connection.run_sync(migrate)
+
+    async with SessionLocal() as session:
+        await rebuild_timelines(session)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,21 @@
+import asyncio
+
+from src.backend.database import engine, SessionLocal
+from src.backend.models.migrations import migrate
+from src.backend.services.counters import reconcile_counters
+
+
+# Recomputes every like/save counter from the association tables in one
+# UPDATE per counter. Usage: python -m src.backend.commands.reconcile_counters
+async def main() -> None:
+    async with engine.begin() as connection:
+        await connection.run_sync(migrate)
+
+    async with SessionLocal() as session:
+        await reconcile_counters(session)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+import itertools
+import math
+import os
+import time
+from typing import AsyncIterator
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+DB_URL = os.getenv("BLOG_DB_URL", "sqlite+aiosqlite:///D:\\blog.db")
+# Comma separated URLs of read replicas of DB_URL, for example copies of the
+# SQLite file kept up to date by a replication tool. Without any, reads go to
+# the primary as well.
+REPLICA_URLS = [url.strip() for url in os.getenv("BLOG_DB_REPLICA_URLS", "").split(",") if url.strip()]
+# After a write the client reads from the primary for this long, so it sees
+# its own write even while the replicas are behind. It should be longer than
+# the usual replication lag.
+READ_PRIMARY_SECONDS = float(os.getenv("BLOG_DB_READ_PRIMARY_SECONDS", "5"))
+READ_PRIMARY_COOKIE = "blog_read_primary_until"
+
+# Pool settings can be overridden through the environment so the same code
+# can be tuned for the expected number of concurrent requests
+POOL_SIZE = int(os.getenv("BLOG_DB_POOL_SIZE", "10"))
+POOL_MAX_OVERFLOW = int(os.getenv("BLOG_DB_POOL_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = int(os.getenv("BLOG_DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("BLOG_DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.getenv("BLOG_DB_POOL_PRE_PING", "1") == "1"
+# Logging every statement is only meant for debugging, statements above the
+# slow query threshold of services/metrics.py are logged regardless
+ECHO = os.getenv("BLOG_DB_ECHO", "0") == "1"
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": "5000",
+    "cache_size": "-64000",
+    "temp_store": "MEMORY",
+    "mmap_size": "268435456",
+}
+# Replicas are only written by replication, a write sent to one by mistake
+# fails instead of silently diverging from the primary
+REPLICA_SQLITE_PRAGMAS = {**SQLITE_PRAGMAS, "query_only": "1"}
+
+
+def create_blog_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=ECHO,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=POOL_PRE_PING,
+    )
+
+
+# WAL lets readers proceed while a single writer holds the lock, which is what
+# allows the pool above to actually serve requests in parallel
+def set_sqlite_pragmas(async_engine: AsyncEngine, pragmas: dict[str, str]) -> None:
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
+
+engine = create_blog_engine(DB_URL)
+set_sqlite_pragmas(engine, SQLITE_PRAGMAS)
+
+replica_engines = [create_blog_engine(url) for url in REPLICA_URLS]
+for replica_engine in replica_engines:
+    set_sqlite_pragmas(replica_engine, REPLICA_SQLITE_PRAGMAS)
+
+# Objects are kept loaded after commit, as lazy loading an expired attribute
+# is not possible once the response is being serialized outside the session
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+ReplicaSessionLocals = [
+    async_sessionmaker(bind=replica_engine, autoflush=False, expire_on_commit=False, info={"replica": True})
+    for replica_engine in replica_engines
+]
+next_replica_session = itertools.cycle(ReplicaSessionLocals).__next__ if ReplicaSessionLocals else None
+
+
+# Session on the primary, for the create, update and delete services. With
+# replicas configured the response also tells the client to read from the
+# primary for a while. The cookie is set before the write runs, as headers
+# can no longer change once it is done, which at worst sends a client whose
+# write failed to the primary for a few seconds.
+async def get_session(response: Response) -> AsyncIterator[AsyncSession]:
+    if ReplicaSessionLocals:
+        response.set_cookie(READ_PRIMARY_COOKIE, f"{time.time() + READ_PRIMARY_SECONDS:.3f}",
+                            max_age=math.ceil(READ_PRIMARY_SECONDS), httponly=True, samesite="lax")
+
+    async with SessionLocal() as session:
+        yield session
+
+
+def reads_from_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+
+# Session for the get services, on the replicas in turn unless the client
+# wrote something within the last READ_PRIMARY_SECONDS
+async def get_read_session(request: Request) -> AsyncIterator[AsyncSession]:
+    session_maker = SessionLocal if not ReplicaSessionLocals or reads_from_primary(request) \
+        else next_replica_session()
+
+    async with session_maker() as session:
+        yield session
@@ -1,28 +1,34 @@
-from fastapi import FastAPI, HTTPException
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from functools import partial
+from typing import Type
+
+from fastapi import FastAPI, HTTPException, Depends, Query, Response, Body, Header
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncScalarResult
 from uuid import UUID
 
+from src.backend.database import engine, replica_engines, get_session, get_read_session, SessionLocal
+from src.backend.models.migrations import migrate
 from src.backend.models.models import get_metadata
+from src.backend.schemas.base_schemas import OrmBaseModel
 from src.backend.schemas.create_schemas import UserCreateSchema, BlogCreateSchema, PostCreateSchema, \
     CommentCreateSchema, BlogLikeCreateSchema, PostLikeCreateSchema, CommentLikeCreateSchema, BlogSaveCreateSchema, \
-    PostSaveCreateSchema, CommentSaveCreateSchema
+    PostSaveCreateSchema, CommentSaveCreateSchema, UserFollowCreateSchema
 from src.backend.schemas.get_schemas import UserGetSchema, BlogGetSchema, PostGetSchema, CommentGetSchema, \
     BlogLikeGetSchema, PostLikeGetSchema, CommentLikeGetSchema, CommentSaveGetSchema, PostSaveGetSchema, \
-    BlogSaveGetSchema
+    BlogSaveGetSchema, BulkCreateResultSchema, PostSearchSchema, CommentSearchSchema, UserFollowGetSchema, \
+    BlogStatsSchema, UserStatsSchema
 from src.backend.schemas.update_schemas import PostUpdateSchema, BlogUpdateSchema, CommentUpdateSchema, UserUpdateSchema
-from src.backend.services import create, delete, get, update
-
-DB_URL = "sqlite:///D:\\blog.db"
-
-engine = create_engine(DB_URL, connect_args={"check_same_thread": False}, echo=True)
-connection = engine.connect()
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-session = SessionLocal()
+from src.backend.services import bulk_create, create, delete, feed, get, page_invalidation, search, stats, update
+from src.backend.services.bulk_create import MAX_BULK_SIZE
+from src.backend.services.cache import entity_cache
+from src.backend.services.follow_graph import follow_graph
+from src.backend.services.leaderboard import blog_leaderboard
+from src.backend.services.metrics import metrics, MetricsMiddleware
+from src.backend.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from src.backend.services.trending import load_trending, TrendingWindow
+from src.backend.services.write_behind import WRITE_BEHIND, write_behind_buffer
 
 metadata = get_metadata()
-metadata.create_all(bind=engine)
 
 tags_metadata = [
     {
@@ -48,273 +54,713 @@ tags_metadata = [
     {
         "name": "save",
         "description": "Operations related to saves.",
+    },
+    {
+        "name": "cache",
+        "description": "Operations related to the entity cache.",
+    },
+    {
+        "name": "metrics",
+        "description": "Request and SQL metrics in the Prometheus text format.",
     }
 ]
 
 app = FastAPI(openapi_tags=tags_metadata)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.on_event("startup")
+async def create_tables():
+    async with engine.begin() as connection:
+        await connection.run_sync(metadata.create_all)
+        await connection.run_sync(migrate)
+
+
+@app.on_event("startup")
+async def load_blog_leaderboard():
+    async with SessionLocal() as session:
+        await blog_leaderboard.load(session)
+
+
+@app.on_event("startup")
+async def load_follow_graph():
+    async with SessionLocal() as session:
+        await follow_graph.load(session)
+
+
+@app.on_event("startup")
+async def load_trending_rankings():
+    async with SessionLocal() as session:
+        await load_trending(session)
+
+
+@app.on_event("startup")
+async def start_write_behind():
+    if WRITE_BEHIND:
+        write_behind_buffer.start()
+
+
+# Registered before dispose_engine, so the buffered likes and saves are
+# written while the engine is still there
+@app.on_event("shutdown")
+async def flush_write_behind():
+    await write_behind_buffer.stop()
+
+
+@app.on_event("shutdown")
+async def close_page_invalidation():
+    await page_invalidation.close()
+
+
+@app.on_event("shutdown")
+async def dispose_engine():
+    await engine.dispose()
+    for replica_engine in replica_engines:
+        await replica_engine.dispose()
+
+
+# List endpoints return one page at a time, the cursor for the following page
+# is sent in a header so the response body stays a plain list
+def set_next_cursor(response: Response, next_cursor: str | None) -> None:
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+
+# If-None-Match uses the weak comparison, so W/ prefixes are ignored
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+# Entities come from the cache as an ETag and a JSON body, which is None when
+# the client's copy is still current
+def entity_response(etag: str, body: bytes | None) -> Response:
+    if body is None:
+        return not_modified_response(etag)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+def ndjson_response(rows: AsyncScalarResult, schema: Type[OrmBaseModel]) -> StreamingResponse:
+    async def serialize_rows():
+        async for row in rows:
+            yield schema.from_orm(row).json() + "\n"
+
+    return StreamingResponse(serialize_rows(), media_type="application/x-ndjson")
 
 
 @app.post("/api/createUser", status_code=200, response_model=UserGetSchema, tags=["user"])
-def create_user(new_user_schema: UserCreateSchema):
-    return create.create_user(session, new_user_schema)
+async def create_user(new_user_schema: UserCreateSchema, session: AsyncSession = Depends(get_session)):
+    return await create.create_user(session, new_user_schema)
 
 
 @app.post("/api/createBlog", status_code=200, response_model=BlogGetSchema, tags=["blog"])
-def create_blog(new_blog_schema: BlogCreateSchema):
-    return create.create_blog(session, new_blog_schema)
+async def create_blog(new_blog_schema: BlogCreateSchema, session: AsyncSession = Depends(get_session)):
+    return await create.create_blog(session, new_blog_schema)
 
 
 @app.post("/api/createPost", status_code=200, response_model=PostGetSchema, tags=["post"])
-def create_post(new_post_schema: PostCreateSchema):
-    return create.create_post(session, new_post_schema)
+async def create_post(new_post_schema: PostCreateSchema, session: AsyncSession = Depends(get_session)):
+    return await create.create_post(session, new_post_schema)
 
 
 @app.post("/api/createComment", status_code=200, response_model=CommentGetSchema, tags=["comment"])
-def create_comment(new_comment_schema: CommentCreateSchema):
-    return create.create_comment(session, new_comment_schema)
+async def create_comment(new_comment_schema: CommentCreateSchema, session: AsyncSession = Depends(get_session)):
+    return await create.create_comment(session, new_comment_schema)
 
 
 @app.post("/api/createBlogLike", status_code=200, response_model=BlogLikeGetSchema, tags=["like"])
-def create_blog_like(new_blog_like_schema: BlogLikeCreateSchema):
-    return create.create_blog_like(session, new_blog_like_schema)
+async def create_blog_like(new_blog_like_schema: BlogLikeCreateSchema, session: AsyncSession = Depends(get_session)):
+    return await create.create_blog_like(session, new_blog_like_schema)
 
 
 @app.post("/api/createPostLike", status_code=200, response_model=PostLikeGetSchema, tags=["like"])
-def create_post_like(new_post_like_schema: PostLikeCreateSchema):
-    return create.create_post_like(session, new_post_like_schema)
+async def create_post_like(new_post_like_schema: PostLikeCreateSchema, session: AsyncSession = Depends(get_session)):
+    return await create.create_post_like(session, new_post_like_schema)
 
 
 @app.post("/api/createCommentLike", status_code=200, response_model=CommentLikeGetSchema, tags=["like"])
-def create_comment_like(new_comment_like_schema: CommentLikeCreateSchema):
-    return create.create_comment_like(session, new_comment_like_schema)
+async def create_comment_like(new_comment_like_schema: CommentLikeCreateSchema,
+                              session: AsyncSession = Depends(get_session)):
+    return await create.create_comment_like(session, new_comment_like_schema)
 
 
 @app.post("/api/createBlogSave", status_code=200, response_model=BlogSaveGetSchema, tags=["save"])
-def create_blog_save(new_blog_save_schema: BlogSaveCreateSchema):
-    return create.create_blog_save(session, new_blog_save_schema)
+async def create_blog_save(new_blog_save_schema: BlogSaveCreateSchema, session: AsyncSession = Depends(get_session)):
+    return await create.create_blog_save(session, new_blog_save_schema)
 
 
 @app.post("/api/createPostSave", status_code=200, response_model=PostSaveGetSchema, tags=["save"])
-def create_post_save(new_post_save_schema: PostSaveCreateSchema):
-    return create.create_post_save(session, new_post_save_schema)
+async def create_post_save(new_post_save_schema: PostSaveCreateSchema, session: AsyncSession = Depends(get_session)):
+    return await create.create_post_save(session, new_post_save_schema)
 
 
 @app.post("/api/createCommentSave", status_code=200, response_model=CommentSaveGetSchema, tags=["save"])
-def create_comment_save(new_comment_save_schema: CommentSaveCreateSchema):
-    return create.create_comment_save(session, new_comment_save_schema)
+async def create_comment_save(new_comment_save_schema: CommentSaveCreateSchema,
+                              session: AsyncSession = Depends(get_session)):
+    return await create.create_comment_save(session, new_comment_save_schema)
+
+
+@app.post("/api/createUserFollow", status_code=200, response_model=UserFollowGetSchema, tags=["user"])
+async def create_user_follow(new_user_follow_schema: UserFollowCreateSchema,
+                             session: AsyncSession = Depends(get_session)):
+    return await create.create_user_follow(session, new_user_follow_schema)
+
+
+@app.post("/api/createPosts", status_code=200, response_model=list[BulkCreateResultSchema], tags=["post"])
+async def create_posts(new_post_schemas: list[PostCreateSchema] = Body(max_items=MAX_BULK_SIZE),
+                       session: AsyncSession = Depends(get_session)):
+    return await bulk_create.create_posts(session, new_post_schemas)
+
+
+@app.post("/api/createComments", status_code=200, response_model=list[BulkCreateResultSchema], tags=["comment"])
+async def create_comments(new_comment_schemas: list[CommentCreateSchema] = Body(max_items=MAX_BULK_SIZE),
+                          session: AsyncSession = Depends(get_session)):
+    return await bulk_create.create_comments(session, new_comment_schemas)
+
+
+@app.post("/api/createBlogLikes", status_code=200, response_model=list[BulkCreateResultSchema], tags=["like"])
+async def create_blog_likes(new_blog_like_schemas: list[BlogLikeCreateSchema] = Body(max_items=MAX_BULK_SIZE),
+                            session: AsyncSession = Depends(get_session)):
+    return await bulk_create.create_blog_likes(session, new_blog_like_schemas)
+
+
+@app.post("/api/createPostLikes", status_code=200, response_model=list[BulkCreateResultSchema], tags=["like"])
+async def create_post_likes(new_post_like_schemas: list[PostLikeCreateSchema] = Body(max_items=MAX_BULK_SIZE),
+                            session: AsyncSession = Depends(get_session)):
+    return await bulk_create.create_post_likes(session, new_post_like_schemas)
+
+
+@app.post("/api/createCommentLikes", status_code=200, response_model=list[BulkCreateResultSchema], tags=["like"])
+async def create_comment_likes(new_comment_like_schemas: list[CommentLikeCreateSchema] = Body(max_items=MAX_BULK_SIZE),
+                               session: AsyncSession = Depends(get_session)):
+    return await bulk_create.create_comment_likes(session, new_comment_like_schemas)
+
+
+@app.post("/api/createBlogSaves", status_code=200, response_model=list[BulkCreateResultSchema], tags=["save"])
+async def create_blog_saves(new_blog_save_schemas: list[BlogSaveCreateSchema] = Body(max_items=MAX_BULK_SIZE),
+                            session: AsyncSession = Depends(get_session)):
+    return await bulk_create.create_blog_saves(session, new_blog_save_schemas)
+
+
+@app.post("/api/createPostSaves", status_code=200, response_model=list[BulkCreateResultSchema], tags=["save"])
+async def create_post_saves(new_post_save_schemas: list[PostSaveCreateSchema] = Body(max_items=MAX_BULK_SIZE),
+                            session: AsyncSession = Depends(get_session)):
+    return await bulk_create.create_post_saves(session, new_post_save_schemas)
+
+
+@app.post("/api/createCommentSaves", status_code=200, response_model=list[BulkCreateResultSchema], tags=["save"])
+async def create_comment_saves(new_comment_save_schemas: list[CommentSaveCreateSchema] = Body(max_items=MAX_BULK_SIZE),
+                               session: AsyncSession = Depends(get_session)):
+    return await bulk_create.create_comment_saves(session, new_comment_save_schemas)
+
+
+@app.get("/api/getCacheStats", response_model=dict[str, int], tags=["cache"])
+async def get_cache_stats():
+    return entity_cache.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["metrics"])
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/api/getUser/{user_uuid}", response_model=UserGetSchema, tags=["user"])
-def get_user_by_uuid(user_uuid: UUID):
-    user = get.get_user_by_uuid(session, user_uuid)
+async def get_user_by_uuid(user_uuid: UUID,
+                           if_none_match: str | None = Header(None),
+                           session: AsyncSession = Depends(get_read_session)):
+    user = await get.get_cached_user_by_uuid(session, user_uuid, partial(etag_matches, if_none_match))
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return entity_response(*user)
 
 
 # Bad solution since the password is shown in plaintext in url, will fix later
 # TODO: fix get_user_by_name_and_password to not expose user password
 @app.get("/api/getUserByLogin", response_model=UserGetSchema, tags=["user"])
-def get_user_by_name_and_password(user_profile_name: str, user_password: str):
-    user = get.get_user_by_username_and_password(session, user_profile_name, user_password)
+async def get_user_by_name_and_password(user_profile_name: str,
+                                        user_password: str,
+                                        session: AsyncSession = Depends(get_read_session)):
+    user = await get.get_user_by_username_and_password(session, user_profile_name, user_password)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
 @app.get("/api/getUsersByBlog/{blog_uuid}", response_model=list[UserGetSchema], tags=["user"])
-def get_users_by_blog(blog_uuid: UUID):
-    users = get.get_users_by_blog(session, blog_uuid)
+async def get_users_by_blog(blog_uuid: UUID, session: AsyncSession = Depends(get_read_session)):
+    users = await get.get_users_by_blog(session, blog_uuid)
     if not users:
         raise HTTPException(status_code=404, detail="Users not found")
     return users
 
 
 @app.get("/api/getBlog/{blog_uuid}", response_model=BlogGetSchema, tags=["blog"])
-def get_blog_by_uuid(blog_uuid: UUID):
-    blog = get.get_blog_by_uuid(session, blog_uuid)
+async def get_blog_by_uuid(blog_uuid: UUID,
+                           if_none_match: str | None = Header(None),
+                           session: AsyncSession = Depends(get_read_session)):
+    blog = await get.get_cached_blog_by_uuid(session, blog_uuid, partial(etag_matches, if_none_match))
     if blog is None:
         raise HTTPException(status_code=404, detail="Blog not found")
-    return blog
+    return entity_response(*blog)
 
 
 @app.get("/api/getBlog/{blog_title}", response_model=BlogGetSchema, tags=["blog"])
-def get_blog_by_title(blog_title: str):
-    blog = get.get_blog_by_title(session, blog_title)
+async def get_blog_by_title(blog_title: str, session: AsyncSession = Depends(get_read_session)):
+    blog = await get.get_blog_by_title(session, blog_title)
     if blog is None:
         raise HTTPException(status_code=404, detail="Blog not found")
     return blog
 
 
 @app.get("/api/getPost/{post_uuid}", response_model=PostGetSchema, tags=["post"])
-def get_post_by_uuid(post_uuid: UUID):
-    post = get.get_post_by_uuid(session, post_uuid)
+async def get_post_by_uuid(post_uuid: UUID,
+                           if_none_match: str | None = Header(None),
+                           session: AsyncSession = Depends(get_read_session)):
+    post = await get.get_cached_post_by_uuid(session, post_uuid, partial(etag_matches, if_none_match))
     if post is None:
         raise HTTPException(status_code=404, detail="Post not found")
-    return post
+    return entity_response(*post)
 
 
 @app.get("/api/getComment/{comment_uuid}", response_model=CommentGetSchema, tags=["comment"])
-def get_comment_by_uuid(comment_uuid: UUID):
-    comment = get.get_comment_by_uuid(session, comment_uuid)
+async def get_comment_by_uuid(comment_uuid: UUID,
+                              if_none_match: str | None = Header(None),
+                              session: AsyncSession = Depends(get_read_session)):
+    comment = await get.get_cached_comment_by_uuid(session, comment_uuid, partial(etag_matches, if_none_match))
     if comment is None:
         raise HTTPException(status_code=404, detail="Comment not found")
-    return comment
+    return entity_response(*comment)
+
+
+@app.get("/api/getUserStats/{user_uuid}", response_model=UserStatsSchema, tags=["user"])
+async def get_user_stats_by_uuid(user_uuid: UUID, session: AsyncSession = Depends(get_read_session)):
+    user_stats = await stats.get_user_stats_by_uuid(session, user_uuid)
+    if user_stats is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user_stats
+
+
+@app.get("/api/getBlogStats/{blog_uuid}", response_model=BlogStatsSchema, tags=["blog"])
+async def get_blog_stats_by_uuid(blog_uuid: UUID, session: AsyncSession = Depends(get_read_session)):
+    blog_stats = await stats.get_blog_stats_by_uuid(session, blog_uuid)
+    if blog_stats is None:
+        raise HTTPException(status_code=404, detail="Blog not found")
+    return blog_stats
 
 
 @app.get("/api/getUserBlogs/{user_uuid}", response_model=list[BlogGetSchema], tags=["blog"])
-def get_user_blogs_by_uuid(user_uuid: UUID):
-    user_blogs = get.get_user_blogs_by_uuid(session, user_uuid)
+async def get_user_blogs_by_uuid(user_uuid: UUID, session: AsyncSession = Depends(get_read_session)):
+    user_blogs = await get.get_user_blogs_by_uuid(session, user_uuid)
     if not user_blogs:
         raise HTTPException(status_code=404, detail="No blogs belonging to given user found")
     return user_blogs
 
 
 @app.get("/api/getBlogPosts/{blog_uuid}", response_model=list[PostGetSchema], tags=["post"])
-def get_blog_posts_by_uuid(blog_uuid: UUID):
-    blog_posts = get.get_blog_posts_by_uuid(session, blog_uuid)
+async def get_blog_posts_by_uuid(blog_uuid: UUID,
+                                 response: Response,
+                                 cursor: str | None = None,
+                                 limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                 stream: bool = False,
+                                 if_none_match: str | None = Header(None),
+                                 session: AsyncSession = Depends(get_read_session)):
+    if stream:
+        return ndjson_response(await get.stream_blog_posts_by_uuid(session, blog_uuid, cursor), PostGetSchema)
+    etag = await get.get_blog_posts_etag(session, blog_uuid, cursor, limit)
+    if etag_matches(if_none_match, etag):
+        return not_modified_response(etag)
+    blog_posts, next_cursor = await get.get_blog_posts_by_uuid(session, blog_uuid, cursor, limit)
     if not blog_posts:
         raise HTTPException(status_code=404, detail="No posts belonging to given blog found")
+    set_next_cursor(response, next_cursor)
+    response.headers["ETag"] = etag
     return blog_posts
 
 
 @app.get("/api/getPostComments/{post_uuid}", response_model=list[CommentGetSchema], tags=["comment"])
-def get_post_comments_by_uuid(post_uuid: UUID):
-    post_comments = get.get_post_comments_by_uuid(session, post_uuid)
+async def get_post_comments_by_uuid(post_uuid: UUID,
+                                    response: Response,
+                                    cursor: str | None = None,
+                                    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                    stream: bool = False,
+                                    if_none_match: str | None = Header(None),
+                                    session: AsyncSession = Depends(get_read_session)):
+    if stream:
+        return ndjson_response(await get.stream_post_comments_by_uuid(session, post_uuid, cursor), CommentGetSchema)
+    etag = await get.get_post_comments_etag(session, post_uuid, cursor, limit)
+    if etag_matches(if_none_match, etag):
+        return not_modified_response(etag)
+    post_comments, next_cursor = await get.get_post_comments_by_uuid(session, post_uuid, cursor, limit)
     if not post_comments:
         raise HTTPException(status_code=404, detail="No comments belonging to given post found")
+    set_next_cursor(response, next_cursor)
+    response.headers["ETag"] = etag
     return post_comments
 
 
 @app.get("/api/getUserComments/{user_uuid}", response_model=list[CommentGetSchema], tags=["comment"])
-def get_user_comments_by_uuid(user_uuid: UUID):
-    user_comments = get.get_user_comments_by_uuid(session, user_uuid)
+async def get_user_comments_by_uuid(user_uuid: UUID, session: AsyncSession = Depends(get_read_session)):
+    user_comments = await get.get_user_comments_by_uuid(session, user_uuid)
     if not user_comments:
         raise HTTPException(status_code=404, detail="No comments belonging to given user found")
     return user_comments
 
 
 @app.get("/api/getUserFollowers/{user_uuid}", response_model=list[UserGetSchema], tags=["user"])
-def get_user_followers_by_uuid(user_uuid: UUID):
-    user_followers = get.get_user_followers_by_uuid(session, user_uuid)
-    if not user_followers:
+async def get_user_followers_by_uuid(user_uuid: UUID,
+                                     response: Response,
+                                     cursor: str | None = None,
+                                     limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                     session: AsyncSession = Depends(get_read_session)):
+    user_followers = await get.get_user_followers_by_uuid(session, user_uuid, cursor, limit)
+    if user_followers is None or not user_followers[0]:
         raise HTTPException(status_code=404, detail="The user does not exist or has no followers")
-    return user_followers
+    followers, next_cursor = user_followers
+    set_next_cursor(response, next_cursor)
+    return followers
 
 
 @app.get("/api/getUserFollows/{user_uuid}", response_model=list[UserGetSchema], tags=["user"])
-def get_user_follows_by_uuid(user_uuid: UUID):
-    user_follows = get.get_user_follows_by_uuid(session, user_uuid)
-    if not user_follows:
+async def get_user_follows_by_uuid(user_uuid: UUID,
+                                   response: Response,
+                                   cursor: str | None = None,
+                                   limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                   session: AsyncSession = Depends(get_read_session)):
+    user_follows = await get.get_user_follows_by_uuid(session, user_uuid, cursor, limit)
+    if user_follows is None or not user_follows[0]:
         raise HTTPException(status_code=404, detail="The user does not exist or does not follow anyone")
-    return user_follows
+    follows, next_cursor = user_follows
+    set_next_cursor(response, next_cursor)
+    return follows
+
+
+@app.get("/api/getUserFollowerCount/{user_uuid}", response_model=int, tags=["user"])
+async def get_user_follower_count_by_uuid(user_uuid: UUID, session: AsyncSession = Depends(get_read_session)):
+    follower_count = await get.get_user_follower_count_by_uuid(session, user_uuid)
+    if follower_count is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return follower_count
+
+
+@app.get("/api/getUserFollowCount/{user_uuid}", response_model=int, tags=["user"])
+async def get_user_follow_count_by_uuid(user_uuid: UUID, session: AsyncSession = Depends(get_read_session)):
+    follow_count = await get.get_user_follow_count_by_uuid(session, user_uuid)
+    if follow_count is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return follow_count
+
+
+@app.get("/api/getUsersFollowEachOther/{user_uuid}/{other_user_uuid}", response_model=bool, tags=["user"])
+async def get_users_follow_each_other(user_uuid: UUID,
+                                      other_user_uuid: UUID,
+                                      session: AsyncSession = Depends(get_read_session)):
+    follow_each_other = await get.get_users_follow_each_other(session, user_uuid, other_user_uuid)
+    if follow_each_other is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return follow_each_other
+
+
+@app.get("/api/getFollowSuggestions/{user_uuid}", response_model=list[UserGetSchema], tags=["user"])
+async def get_follow_suggestions(user_uuid: UUID,
+                                 amount_to_display: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+                                 session: AsyncSession = Depends(get_read_session)):
+    suggestions = await get.get_follow_suggestions(session, user_uuid, amount_to_display)
+    if suggestions is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not suggestions:
+        raise HTTPException(status_code=404, detail="No users to suggest")
+    return suggestions
+
+
+@app.get("/api/getUserFeed/{user_uuid}", response_model=list[PostGetSchema], tags=["post"])
+async def get_user_feed(user_uuid: UUID,
+                        response: Response,
+                        cursor: str | None = None,
+                        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        session: AsyncSession = Depends(get_read_session)):
+    user_feed = await feed.get_user_feed(session, user_uuid, cursor, limit)
+    if user_feed is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    posts, next_cursor = user_feed
+    if not posts:
+        raise HTTPException(status_code=404, detail="No posts from followed users found")
+    set_next_cursor(response, next_cursor)
+    return posts
 
 
 @app.get("/api/getAllUsers", response_model=list[UserGetSchema], tags=["user"])
-def get_all_users():
-    users = get.get_all_users(session)
+async def get_all_users(response: Response,
+                        cursor: str | None = None,
+                        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        stream: bool = False,
+                        if_none_match: str | None = Header(None),
+                        session: AsyncSession = Depends(get_read_session)):
+    if stream:
+        return ndjson_response(await get.stream_all_users(session, cursor), UserGetSchema)
+    etag = await get.get_all_users_etag(session, cursor, limit)
+    if etag_matches(if_none_match, etag):
+        return not_modified_response(etag)
+    users, next_cursor = await get.get_all_users(session, cursor, limit)
     if not users:
         raise HTTPException(status_code=404, detail="No users in database")
+    set_next_cursor(response, next_cursor)
+    response.headers["ETag"] = etag
     return users
 
 
 @app.get("/api/getAllBlogs", response_model=list[BlogGetSchema], tags=["blog"])
-def get_all_blogs():
-    blogs = get.get_all_blogs(session)
+async def get_all_blogs(response: Response,
+                        cursor: str | None = None,
+                        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        stream: bool = False,
+                        if_none_match: str | None = Header(None),
+                        session: AsyncSession = Depends(get_read_session)):
+    if stream:
+        return ndjson_response(await get.stream_all_blogs(session, cursor), BlogGetSchema)
+    etag = await get.get_all_blogs_etag(session, cursor, limit)
+    if etag_matches(if_none_match, etag):
+        return not_modified_response(etag)
+    blogs, next_cursor = await get.get_all_blogs(session, cursor, limit)
     if not blogs:
         raise HTTPException(status_code=404, detail="No blogs in database")
+    set_next_cursor(response, next_cursor)
+    response.headers["ETag"] = etag
     return blogs
 
 
 @app.get("/api/getNMostPopularBlogs", response_model=list[BlogGetSchema], tags=["blog"])
-def get_n_most_popular_blogs(amount_to_display: int):
-    blogs = get.get_n_most_popular_blogs(session, amount_to_display)
+async def get_n_most_popular_blogs(amount_to_display: int, session: AsyncSession = Depends(get_read_session)):
+    blogs = await get.get_n_most_popular_blogs(session, amount_to_display)
     if not blogs:
         raise HTTPException(status_code=404, detail="No blogs in database")
     return blogs
 
 
+@app.get("/api/getTrendingBlogs", response_model=list[BlogGetSchema], tags=["blog"])
+async def get_trending_blogs(window: TrendingWindow = TrendingWindow.day,
+                             amount_to_display: int = 10,
+                             session: AsyncSession = Depends(get_read_session)):
+    blogs = await get.get_trending_blogs(session, window, amount_to_display)
+    if not blogs:
+        raise HTTPException(status_code=404, detail="No blog activity in given window")
+    return blogs
+
+
+@app.get("/api/getTrendingPosts", response_model=list[PostGetSchema], tags=["post"])
+async def get_trending_posts(window: TrendingWindow = TrendingWindow.day,
+                             amount_to_display: int = 10,
+                             session: AsyncSession = Depends(get_read_session)):
+    posts = await get.get_trending_posts(session, window, amount_to_display)
+    if not posts:
+        raise HTTPException(status_code=404, detail="No post activity in given window")
+    return posts
+
+
 @app.get("/api/getAllPosts", response_model=list[PostGetSchema], tags=["post"])
-def get_all_posts():
-    posts = get.get_all_posts(session)
+async def get_all_posts(response: Response,
+                        cursor: str | None = None,
+                        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        stream: bool = False,
+                        if_none_match: str | None = Header(None),
+                        session: AsyncSession = Depends(get_read_session)):
+    if stream:
+        return ndjson_response(await get.stream_all_posts(session, cursor), PostGetSchema)
+    etag = await get.get_all_posts_etag(session, cursor, limit)
+    if etag_matches(if_none_match, etag):
+        return not_modified_response(etag)
+    posts, next_cursor = await get.get_all_posts(session, cursor, limit)
     if not posts:
         raise HTTPException(status_code=404, detail="No posts in database")
+    set_next_cursor(response, next_cursor)
+    response.headers["ETag"] = etag
     return posts
 
 
 @app.get("/api/getAllComments", response_model=list[CommentGetSchema], tags=["comment"])
-def get_all_comments():
-    comments = get.get_all_comments(session)
+async def get_all_comments(response: Response,
+                           cursor: str | None = None,
+                           limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                           stream: bool = False,
+                           if_none_match: str | None = Header(None),
+                           session: AsyncSession = Depends(get_read_session)):
+    if stream:
+        return ndjson_response(await get.stream_all_comments(session, cursor), CommentGetSchema)
+    etag = await get.get_all_comments_etag(session, cursor, limit)
+    if etag_matches(if_none_match, etag):
+        return not_modified_response(etag)
+    comments, next_cursor = await get.get_all_comments(session, cursor, limit)
     if not comments:
         raise HTTPException(status_code=404, detail="No comments in database")
+    set_next_cursor(response, next_cursor)
+    response.headers["ETag"] = etag
     return comments
 
 
+@app.get("/api/searchPosts", response_model=list[PostSearchSchema], tags=["post"])
+async def search_posts(response: Response,
+                       query: str = Query(min_length=1, max_length=200),
+                       cursor: str | None = None,
+                       limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                       session: AsyncSession = Depends(get_read_session)):
+    posts, next_cursor = await search.search_posts(session, query, cursor, limit)
+    if not posts:
+        raise HTTPException(status_code=404, detail="No posts matching given query found")
+    set_next_cursor(response, next_cursor)
+    return posts
+
+
+@app.get("/api/searchComments", response_model=list[CommentSearchSchema], tags=["comment"])
+async def search_comments(response: Response,
+                          query: str = Query(min_length=1, max_length=200),
+                          cursor: str | None = None,
+                          limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                          session: AsyncSession = Depends(get_read_session)):
+    comments, next_cursor = await search.search_comments(session, query, cursor, limit)
+    if not comments:
+        raise HTTPException(status_code=404, detail="No comments matching given query found")
+    set_next_cursor(response, next_cursor)
+    return comments
+
+
+@app.get("/api/getBlogLikeCount/{blog_uuid}", response_model=int, tags=["like"])
+async def get_blog_like_count_by_uuid(blog_uuid: UUID, session: AsyncSession = Depends(get_read_session)):
+    like_count = await get.get_blog_like_count_by_uuid(session, blog_uuid)
+    if like_count is None:
+        raise HTTPException(status_code=404, detail="Blog not found")
+    return like_count
+
+
+@app.get("/api/getPostLikeCount/{post_uuid}", response_model=int, tags=["like"])
+async def get_post_like_count_by_uuid(post_uuid: UUID, session: AsyncSession = Depends(get_read_session)):
+    like_count = await get.get_post_like_count_by_uuid(session, post_uuid)
+    if like_count is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return like_count
+
+
+@app.get("/api/getCommentLikeCount/{comment_uuid}", response_model=int, tags=["like"])
+async def get_comment_like_count_by_uuid(comment_uuid: UUID, session: AsyncSession = Depends(get_read_session)):
+    like_count = await get.get_comment_like_count_by_uuid(session, comment_uuid)
+    if like_count is None:
+        raise HTTPException(status_code=404, detail="Comment not found")
+    return like_count
+
+
+@app.get("/api/getBlogSaveCount/{blog_uuid}", response_model=int, tags=["save"])
+async def get_blog_save_count_by_uuid(blog_uuid: UUID, session: AsyncSession = Depends(get_read_session)):
+    save_count = await get.get_blog_save_count_by_uuid(session, blog_uuid)
+    if save_count is None:
+        raise HTTPException(status_code=404, detail="Blog not found")
+    return save_count
+
+
+@app.get("/api/getPostSaveCount/{post_uuid}", response_model=int, tags=["save"])
+async def get_post_save_count_by_uuid(post_uuid: UUID, session: AsyncSession = Depends(get_read_session)):
+    save_count = await get.get_post_save_count_by_uuid(session, post_uuid)
+    if save_count is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return save_count
+
+
+@app.get("/api/getCommentSaveCount/{comment_uuid}", response_model=int, tags=["save"])
+async def get_comment_save_count_by_uuid(comment_uuid: UUID, session: AsyncSession = Depends(get_read_session)):
+    save_count = await get.get_comment_save_count_by_uuid(session, comment_uuid)
+    if save_count is None:
+        raise HTTPException(status_code=404, detail="Comment not found")
+    return save_count
+
+
 @app.put("/api/updateUser/{user_uuid}", response_model=UserGetSchema, tags=["user"])
-def update_user_by_uuid(user_update_data: UserUpdateSchema, user_uuid: UUID):
-    return update.update_user_by_uuid(session, user_update_data, user_uuid)
+async def update_user_by_uuid(user_update_data: UserUpdateSchema,
+                              user_uuid: UUID,
+                              session: AsyncSession = Depends(get_session)):
+    return await update.update_user_by_uuid(session, user_update_data, user_uuid)
 
 
 @app.put("/api/updateBlog/{blog_uuid}", response_model=BlogGetSchema, tags=["blog"])
-def update_blog_by_uuid(blog_update_data: BlogUpdateSchema, blog_id: UUID):
-    return update.update_blog_by_uuid(session, blog_update_data, blog_id)
+async def update_blog_by_uuid(blog_update_data: BlogUpdateSchema,
+                              blog_id: UUID,
+                              session: AsyncSession = Depends(get_session)):
+    return await update.update_blog_by_uuid(session, blog_update_data, blog_id)
 
 
 @app.put("/api/updatePost/{post_uuid}", response_model=PostGetSchema, tags=["post"])
-def update_post_by_uuid(post_update_data: PostUpdateSchema, post_id: UUID):
-    return update.update_post_by_uuid(session, post_update_data, post_id)
+async def update_post_by_uuid(post_update_data: PostUpdateSchema,
+                              post_id: UUID,
+                              session: AsyncSession = Depends(get_session)):
+    return await update.update_post_by_uuid(session, post_update_data, post_id)
 
 
 @app.put("/api/updateComment/{comment_uuid}", response_model=CommentGetSchema, tags=["comment"])
-def update_comment_by_uuid(comment_update_data: CommentUpdateSchema, comment_id: UUID):
-    return update.update_comment_by_uuid(session, comment_update_data, comment_id)
+async def update_comment_by_uuid(comment_update_data: CommentUpdateSchema,
+                                 comment_id: UUID,
+                                 session: AsyncSession = Depends(get_session)):
+    return await update.update_comment_by_uuid(session, comment_update_data, comment_id)
 
 
 @app.delete("/api/deleteUser/{user_uuid}", status_code=204, tags=["user"])
-def delete_user_by_uuid(user_uuid: UUID):
-    delete.delete_user_by_uuid(session, user_uuid)
+async def delete_user_by_uuid(user_uuid: UUID, session: AsyncSession = Depends(get_session)):
+    await delete.delete_user_by_uuid(session, user_uuid)
 
 
 @app.delete("/api/deleteBlog/{blog_uuid}", status_code=204, tags=["blog"])
-def delete_blog_by_uuid(blog_uuid: UUID):
-    delete.delete_blog_by_uuid(session, blog_uuid)
+async def delete_blog_by_uuid(blog_uuid: UUID, session: AsyncSession = Depends(get_session)):
+    await delete.delete_blog_by_uuid(session, blog_uuid)
 
 
 @app.delete("/api/deletePost/{post_uuid}", status_code=204, tags=["post"])
-def delete_post_by_uuid(post_uuid: UUID):
-    delete.delete_post_by_uuid(session, post_uuid)
+async def delete_post_by_uuid(post_uuid: UUID, session: AsyncSession = Depends(get_session)):
+    await delete.delete_post_by_uuid(session, post_uuid)
 
 
 @app.delete("/api/deleteComment/{comment_uuid}", status_code=204, tags=["comment"])
-def delete_comment_by_uuid(comment_uuid: UUID):
-    delete.delete_comment_by_uuid(session, comment_uuid)
+async def delete_comment_by_uuid(comment_uuid: UUID, session: AsyncSession = Depends(get_session)):
+    await delete.delete_comment_by_uuid(session, comment_uuid)
 
 
 @app.delete("/api/deleteBlogLike/{user_uuid}/{blog_uuid}", status_code=204, tags=["like"])
-def delete_blog_like_by_uuid(user_uuid: UUID, blog_uuid: UUID):
-    delete.delete_blog_like_by_uuid(session, user_uuid, blog_uuid)
+async def delete_blog_like_by_uuid(user_uuid: UUID, blog_uuid: UUID, session: AsyncSession = Depends(get_session)):
+    await delete.delete_blog_like_by_uuid(session, user_uuid, blog_uuid)
 
 
 @app.delete("/api/deletePostLike/{user_uuid}/{post_uuid}", status_code=204, tags=["like"])
-def delete_post_like_by_uuid(user_uuid: UUID, post_uuid: UUID):
-    delete.delete_post_like_by_uuid(session, user_uuid, post_uuid)
+async def delete_post_like_by_uuid(user_uuid: UUID, post_uuid: UUID, session: AsyncSession = Depends(get_session)):
+    await delete.delete_post_like_by_uuid(session, user_uuid, post_uuid)
 
 
 @app.delete("/api/deleteCommentLike/{user_uuid}/{comment_uuid}", status_code=204, tags=["like"])
-def delete_comment_like_by_uuid(user_uuid: UUID, comment_uuid: UUID):
-    delete.delete_comment_like_by_uuid(session, user_uuid, comment_uuid)
+async def delete_comment_like_by_uuid(user_uuid: UUID,
+                                      comment_uuid: UUID,
+                                      session: AsyncSession = Depends(get_session)):
+    await delete.delete_comment_like_by_uuid(session, user_uuid, comment_uuid)
 
 
 @app.delete("/api/deleteBlogSave/{user_uuid}/{blog_uuid}", status_code=204, tags=["save"])
-def delete_blog_save_by_uuid(user_uuid: UUID, blog_uuid: UUID):
-    delete.delete_blog_save_by_uuid(session, user_uuid, blog_uuid)
+async def delete_blog_save_by_uuid(user_uuid: UUID, blog_uuid: UUID, session: AsyncSession = Depends(get_session)):
+    await delete.delete_blog_save_by_uuid(session, user_uuid, blog_uuid)
 
 
 @app.delete("/api/deletePostSave/{user_uuid}/{post_uuid}", status_code=204, tags=["save"])
-def delete_post_save_by_uuid(user_uuid: UUID, post_uuid: UUID):
-    delete.delete_post_save_by_uuid(session, user_uuid, post_uuid)
+async def delete_post_save_by_uuid(user_uuid: UUID, post_uuid: UUID, session: AsyncSession = Depends(get_session)):
+    await delete.delete_post_save_by_uuid(session, user_uuid, post_uuid)
 
 
 @app.delete("/api/deleteCommentSave/{user_uuid}/{comment_uuid}", status_code=204, tags=["save"])
-def delete_comment_save_by_uuid(user_uuid: UUID, comment_uuid: UUID):
-    delete.delete_comment_save_by_uuid(session, user_uuid, comment_uuid)
+async def delete_comment_save_by_uuid(user_uuid: UUID,
+                                      comment_uuid: UUID,
+                                      session: AsyncSession = Depends(get_session)):
+    await delete.delete_comment_save_by_uuid(session, user_uuid, comment_uuid)
+
+
+@app.delete("/api/deleteUserFollow/{follower_uuid}/{user_uuid}", status_code=204, tags=["user"])
+async def delete_user_follow_by_uuid(follower_uuid: UUID,
+                                     user_uuid: UUID,
+                                     session: AsyncSession = Depends(get_session)):
+    await delete.delete_user_follow_by_uuid(session, follower_uuid, user_uuid)
@@ -0,0 +1,84 @@
+import logging
+
+from sqlalchemy import Connection, Index, func, inspect, select, text
+from sqlalchemy.schema import CreateIndex
+
+from src.backend.models.models import get_metadata
+from src.backend.models.search import create_search_indexes
+
+# How many duplicated values a failed unique index lists
+DUPLICATES_REPORTED = 10
+
+logger = logging.getLogger(__name__)
+
+
+# create_all only creates missing tables, so databases created by an older
+# version of the models are brought up to date here: columns that were added
+# later (all of which have a server default), missing indexes and the
+# full-text search indexes are created.
+def migrate(connection: Connection) -> None:
+    add_missing_columns(connection)
+    create_missing_indexes(connection)
+    create_search_indexes(connection)
+
+
+def add_missing_columns(connection: Connection) -> None:
+    inspector = inspect(connection)
+
+    for table in get_metadata().sorted_tables:
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+
+            column_type = column.type.compile(dialect=connection.dialect)
+            column_definition = f"{column.name} {column_type}"
+
+            if column.server_default is not None:
+                column_definition += f" NOT NULL DEFAULT {column.server_default.arg}"
+
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_definition}"))
+            logger.info("Added column %s.%s", table.name, column.name)
+
+
+# A unique index cannot be built while the table still holds duplicates. The
+# application relies on those indexes to reject duplicate titles and names, so
+# instead of starting without one the migration fails, listing the duplicated
+# values to be cleaned up first.
+def create_missing_indexes(connection: Connection) -> None:
+    inspector = inspect(connection)
+
+    for table in get_metadata().sorted_tables:
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+
+            if index.unique:
+                check_duplicates(connection, index)
+
+            connection.execute(CreateIndex(index))
+            logger.info("Created index %s", index.name)
+
+
+def check_duplicates(connection: Connection, index: Index) -> None:
+    columns = list(index.columns)
+    duplicates = connection.execute(
+        select(*columns, func.count()).
+        group_by(*columns).
+        having(func.count() > 1).
+        limit(DUPLICATES_REPORTED + 1)
+    ).all()
+
+    if not duplicates:
+        return
+
+    column_names = ", ".join(column.name for column in columns)
+    report = "; ".join(f"({', '.join(map(str, row[:-1]))}) x{row[-1]}" for row in duplicates[:DUPLICATES_REPORTED])
+    if len(duplicates) > DUPLICATES_REPORTED:
+        report += "; ..."
+
+    raise RuntimeError(f"Cannot create unique index {index.name}, {index.table.name} holds duplicate values of "
+                       f"({column_names}): {report}. Remove the duplicates and start again.")
@@ -1,7 +1,7 @@
 from datetime import datetime
 from uuid import UUID
 
-from sqlalchemy import MetaData, ForeignKey
+from sqlalchemy import MetaData, ForeignKey, Index, text
 from sqlalchemy.orm import registry, Mapped, mapped_column, relationship
 
 metadata = MetaData()
@@ -11,16 +11,20 @@ mapper_registry = registry(metadata=metadata)
 @mapper_registry.mapped
 class User:
     __tablename__ = "app_user"
+    __table_args__ = (
+        Index("ix_app_user_created_at_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column("id", primary_key=True, autoincrement=True)
-    uuid: Mapped[UUID] = mapped_column("uuid")
+    uuid: Mapped[UUID] = mapped_column("uuid", index=True, unique=True)
     first_name: Mapped[str] = mapped_column("first_name")
     last_name: Mapped[str] = mapped_column("last_name")
-    profile_name: Mapped[str] = mapped_column("profile_name")
+    profile_name: Mapped[str] = mapped_column("profile_name", index=True, unique=True)
     email: Mapped[str] = mapped_column("email")
     password: Mapped[str] = mapped_column("password")
     country: Mapped[str] = mapped_column("country")
     created_at: Mapped[datetime] = mapped_column("created_at")
+    version: Mapped[int] = mapped_column("version", default=1, server_default="1")
     blogs: Mapped[list["Blog"]] = relationship(
         secondary="user_blog",
         back_populates="owners"
@@ -56,7 +60,7 @@ class UserFollowing:
 
     user_id: Mapped[int] = mapped_column("app_user_id", ForeignKey("app_user.id"), primary_key=True)
     user: Mapped["User"] = relationship(back_populates="follow_associations", foreign_keys=[user_id])
-    follower_id: Mapped[int] = mapped_column("follower_id", ForeignKey("app_user.id"), primary_key=True)
+    follower_id: Mapped[int] = mapped_column("follower_id", ForeignKey("app_user.id"), primary_key=True, index=True)
     follower: Mapped["User"] = relationship(back_populates="follower_associations", foreign_keys=[follower_id])
     followed_at: Mapped[datetime] = mapped_column("followed_at")
 
@@ -70,7 +74,7 @@ class UserBlog:
 
     user_id: Mapped[int] = mapped_column("app_user_id", ForeignKey("app_user.id"), primary_key=True)
     user: Mapped["User"] = relationship()
-    blog_id: Mapped[int] = mapped_column("blog_id", ForeignKey("blog.id"), primary_key=True)
+    blog_id: Mapped[int] = mapped_column("blog_id", ForeignKey("blog.id"), primary_key=True, index=True)
     blog: Mapped["Blog"] = relationship()
 
     def __repr__(self):
@@ -80,12 +84,18 @@ class UserBlog:
 @mapper_registry.mapped
 class Blog:
     __tablename__ = "blog"
+    __table_args__ = (
+        Index("ix_blog_created_at_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column("id", primary_key=True, autoincrement=True)
-    uuid: Mapped[UUID] = mapped_column("uuid")
-    title: Mapped[str] = mapped_column("title")
+    uuid: Mapped[UUID] = mapped_column("uuid", index=True, unique=True)
+    title: Mapped[str] = mapped_column("title", index=True, unique=True)
     description: Mapped[str] = mapped_column("description")
     created_at: Mapped[datetime] = mapped_column("created_at")
+    like_count: Mapped[int] = mapped_column("like_count", default=0, server_default="0")
+    save_count: Mapped[int] = mapped_column("save_count", default=0, server_default="0")
+    version: Mapped[int] = mapped_column("version", default=1, server_default="1")
     owners: Mapped[list["User"]] = relationship(
         secondary="user_blog",
         back_populates="blogs"
@@ -104,9 +114,9 @@ class BlogLike:
 
     user_id: Mapped[int] = mapped_column("app_user_id", ForeignKey("app_user.id"), primary_key=True)
     user: Mapped["User"] = relationship(back_populates="blog_like_associations")
-    blog_id: Mapped[int] = mapped_column("blog_id", ForeignKey("blog.id"), primary_key=True)
+    blog_id: Mapped[int] = mapped_column("blog_id", ForeignKey("blog.id"), primary_key=True, index=True)
     blog: Mapped["Blog"] = relationship(back_populates="blog_like_associations")
-    liked_at: Mapped[datetime] = mapped_column("liked_at")
+    liked_at: Mapped[datetime] = mapped_column("liked_at", index=True)
 
     def __repr__(self):
         return f"BlogLike: {self.user_id} {self.blog_id} {self.liked_at}"
@@ -118,7 +128,7 @@ class BlogSave:
 
     user_id: Mapped[int] = mapped_column("app_user_id", ForeignKey("app_user.id"), primary_key=True)
     user: Mapped["User"] = relationship(back_populates="blog_save_associations")
-    blog_id: Mapped[int] = mapped_column("blog_id", ForeignKey("blog.id"), primary_key=True)
+    blog_id: Mapped[int] = mapped_column("blog_id", ForeignKey("blog.id"), primary_key=True, index=True)
     blog: Mapped["Blog"] = relationship(back_populates="blog_save_associations")
     saved_at: Mapped[datetime] = mapped_column("saved_at")
 
@@ -129,16 +139,26 @@ class BlogSave:
 @mapper_registry.mapped
 class Post:
     __tablename__ = "post"
+    __table_args__ = (
+        Index("ix_post_blog_id_title", "blog_id", "title", unique=True),
+        Index("ix_post_blog_id_created_at_id", "blog_id", "created_at", "id"),
+        Index("ix_post_created_at_id", "created_at", "id"),
+        Index("ix_post_fan_out_on_read", "user_id", "created_at", "id", sqlite_where=text("fanned_out = 0")),
+    )
 
     id: Mapped[int] = mapped_column("id", primary_key=True, autoincrement=True)
-    uuid: Mapped[UUID] = mapped_column("uuid")
+    uuid: Mapped[UUID] = mapped_column("uuid", index=True, unique=True)
     blog_id: Mapped[int] = mapped_column("blog_id", ForeignKey("blog.id"))
     blog: Mapped["Blog"] = relationship(back_populates="posts")
-    user_id: Mapped[int] = mapped_column("user_id", ForeignKey("app_user.id"))
+    user_id: Mapped[int] = mapped_column("user_id", ForeignKey("app_user.id"), index=True)
     user: Mapped["User"] = relationship(back_populates="posts")
     title: Mapped[str] = mapped_column("title")
     body: Mapped[str] = mapped_column("body")
     created_at: Mapped[datetime] = mapped_column("created_at")
+    like_count: Mapped[int] = mapped_column("like_count", default=0, server_default="0")
+    save_count: Mapped[int] = mapped_column("save_count", default=0, server_default="0")
+    version: Mapped[int] = mapped_column("version", default=1, server_default="1")
+    fanned_out: Mapped[bool] = mapped_column("fanned_out", default=True, server_default="1")
     comments: Mapped[list["Comment"]] = relationship(back_populates="post")
     post_like_associations: Mapped[list["PostLike"]] = relationship(back_populates="post")
     post_save_associations: Mapped[list["PostSave"]] = relationship(back_populates="post")
@@ -147,15 +167,34 @@ class Post:
         return f"Post: {self.id} {self.title}"
 
 
+# Home timelines of the users, one row per post of a followed author that was
+# fanned out to the follower when it was created. The primary key is the sort
+# order of the feed and the table has no rowid, so a page of a feed is one
+# range scan of the table itself.
+@mapper_registry.mapped
+class TimelineEntry:
+    __tablename__ = "timeline"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    user_id: Mapped[int] = mapped_column("app_user_id", ForeignKey("app_user.id", ondelete="CASCADE"),
+                                         primary_key=True)
+    created_at: Mapped[datetime] = mapped_column("created_at", primary_key=True)
+    post_id: Mapped[int] = mapped_column("post_id", ForeignKey("post.id", ondelete="CASCADE"), primary_key=True,
+                                         index=True)
+
+    def __repr__(self):
+        return f"TimelineEntry: {self.user_id} {self.created_at} {self.post_id}"
+
+
 @mapper_registry.mapped
 class PostLike:
     __tablename__ = "post_like"
 
     user_id: Mapped[int] = mapped_column("app_user_id", ForeignKey("app_user.id"), primary_key=True)
     user: Mapped["User"] = relationship(back_populates="post_like_associations")
-    post_id: Mapped[int] = mapped_column("post_id", ForeignKey("post.id"), primary_key=True)
+    post_id: Mapped[int] = mapped_column("post_id", ForeignKey("post.id"), primary_key=True, index=True)
     post: Mapped["Post"] = relationship(back_populates="post_like_associations")
-    liked_at: Mapped[datetime] = mapped_column("liked_at")
+    liked_at: Mapped[datetime] = mapped_column("liked_at", index=True)
 
     def __repr__(self):
         return f"BlogLike: {self.user_id} {self.post_id} {self.liked_at}"
@@ -167,7 +206,7 @@ class PostSave:
 
     user_id: Mapped[int] = mapped_column("app_user_id", ForeignKey("app_user.id"), primary_key=True)
     user: Mapped["User"] = relationship(back_populates="post_save_associations")
-    post_id: Mapped[int] = mapped_column("post_id", ForeignKey("post.id"), primary_key=True)
+    post_id: Mapped[int] = mapped_column("post_id", ForeignKey("post.id"), primary_key=True, index=True)
     post: Mapped["Post"] = relationship(back_populates="post_save_associations")
     saved_at: Mapped[datetime] = mapped_column("saved_at")
 
@@ -178,15 +217,22 @@ class PostSave:
 @mapper_registry.mapped
 class Comment:
     __tablename__ = "comment"
+    __table_args__ = (
+        Index("ix_comment_post_id_created_at_id", "post_id", "created_at", "id"),
+        Index("ix_comment_created_at_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column("id", primary_key=True, autoincrement=True)
-    uuid: Mapped[UUID] = mapped_column("uuid")
-    user_id: Mapped[int] = mapped_column("user_id", ForeignKey("app_user.id"))
+    uuid: Mapped[UUID] = mapped_column("uuid", index=True, unique=True)
+    user_id: Mapped[int] = mapped_column("user_id", ForeignKey("app_user.id"), index=True)
     user: Mapped["User"] = relationship(back_populates="comments")
     post_id: Mapped[int] = mapped_column("post_id", ForeignKey("post.id"))
     post: Mapped["Post"] = relationship(back_populates="comments")
     body: Mapped[str] = mapped_column("body")
     created_at: Mapped[datetime] = mapped_column("created_at")
+    like_count: Mapped[int] = mapped_column("like_count", default=0, server_default="0")
+    save_count: Mapped[int] = mapped_column("save_count", default=0, server_default="0")
+    version: Mapped[int] = mapped_column("version", default=1, server_default="1")
     comment_like_associations: Mapped[list["CommentLike"]] = relationship(back_populates="comment")
     comment_save_associations: Mapped[list["CommentSave"]] = relationship(back_populates="comment")
 
@@ -200,7 +246,7 @@ class CommentLike:
 
     user_id: Mapped[int] = mapped_column("app_user_id", ForeignKey("app_user.id"), primary_key=True)
     user: Mapped["User"] = relationship(back_populates="comment_like_associations")
-    comment_id: Mapped[int] = mapped_column("comment_id", ForeignKey("comment.id"), primary_key=True)
+    comment_id: Mapped[int] = mapped_column("comment_id", ForeignKey("comment.id"), primary_key=True, index=True)
     comment: Mapped["Comment"] = relationship(back_populates="comment_like_associations")
     liked_at: Mapped[datetime] = mapped_column("liked_at")
 
@@ -214,7 +260,7 @@ class CommentSave:
 
     user_id: Mapped[int] = mapped_column("app_user_id", ForeignKey("app_user.id"), primary_key=True)
     user: Mapped["User"] = relationship(back_populates="comment_save_associations")
-    comment_id: Mapped[int] = mapped_column("comment_id", ForeignKey("comment.id"), primary_key=True)
+    comment_id: Mapped[int] = mapped_column("comment_id", ForeignKey("comment.id"), primary_key=True, index=True)
     comment: Mapped["Comment"] = relationship(back_populates="comment_save_associations")
     saved_at: Mapped[datetime] = mapped_column("saved_at")
 
@@ -0,0 +1,49 @@
+from sqlalchemy import Connection, column, inspect, table, text
+
+# FTS5 indexes over post titles and bodies and comment bodies. They are
+# external content tables, so the text is stored once in post and comment,
+# and triggers keep them in sync with every write, including bulk inserts,
+# imports and the set-based deletes of the services. Only updates of the
+# indexed columns touch the index, not the like and save counters.
+post_search = table("post_search", column("rowid"))
+comment_search = table("comment_search", column("rowid"))
+
+SEARCH_DDL = {
+    "post_search": [
+        "CREATE VIRTUAL TABLE post_search USING fts5("
+        "title, body, content='post', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER post_search_insert AFTER INSERT ON post BEGIN "
+        "INSERT INTO post_search(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+        "CREATE TRIGGER post_search_delete AFTER DELETE ON post BEGIN "
+        "INSERT INTO post_search(post_search, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END",
+        "CREATE TRIGGER post_search_update AFTER UPDATE OF title, body ON post BEGIN "
+        "INSERT INTO post_search(post_search, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+        "INSERT INTO post_search(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+        "INSERT INTO post_search(post_search) VALUES ('rebuild')",
+    ],
+    "comment_search": [
+        "CREATE VIRTUAL TABLE comment_search USING fts5("
+        "body, content='comment', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER comment_search_insert AFTER INSERT ON comment BEGIN "
+        "INSERT INTO comment_search(rowid, body) VALUES (new.id, new.body); END",
+        "CREATE TRIGGER comment_search_delete AFTER DELETE ON comment BEGIN "
+        "INSERT INTO comment_search(comment_search, rowid, body) VALUES ('delete', old.id, old.body); END",
+        "CREATE TRIGGER comment_search_update AFTER UPDATE OF body ON comment BEGIN "
+        "INSERT INTO comment_search(comment_search, rowid, body) VALUES ('delete', old.id, old.body); "
+        "INSERT INTO comment_search(rowid, body) VALUES (new.id, new.body); END",
+        "INSERT INTO comment_search(comment_search) VALUES ('rebuild')",
+    ],
+}
+
+
+# Creates the missing search indexes together with their triggers and fills
+# them from the rows already in the database
+def create_search_indexes(connection: Connection) -> None:
+    existing_tables = set(inspect(connection).get_table_names())
+
+    for search_table, statements in SEARCH_DDL.items():
+        if search_table in existing_tables:
+            continue
+
+        for statement in statements:
+            connection.execute(text(statement))
@@ -75,3 +75,8 @@ class PostSaveCreateSchema(SaveBaseSchema):
 
 class CommentSaveCreateSchema(SaveBaseSchema):
     comment_id: int
+
+
+class UserFollowCreateSchema(OrmBaseModel):
+    user_id: int
+    follower_id: int
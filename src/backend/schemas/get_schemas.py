@@ -1,8 +1,10 @@
 from datetime import datetime
+from uuid import UUID
 
-from src.backend.schemas.base_schemas import UserBaseSchema, BlogBaseSchema, PostBaseSchema, CommentBaseSchema
+from src.backend.schemas.base_schemas import OrmBaseModel, UserBaseSchema, BlogBaseSchema, PostBaseSchema, \
+    CommentBaseSchema
 from src.backend.schemas.create_schemas import BlogLikeCreateSchema, PostLikeCreateSchema, BlogSaveCreateSchema, \
-    PostSaveCreateSchema, CommentLikeCreateSchema, CommentSaveCreateSchema
+    PostSaveCreateSchema, CommentLikeCreateSchema, CommentSaveCreateSchema, UserFollowCreateSchema
 
 
 class UserGetSchema(UserBaseSchema):
@@ -10,16 +12,28 @@ class UserGetSchema(UserBaseSchema):
 
 
 class BlogGetSchema(BlogBaseSchema):
+    like_count: int
+    save_count: int
     owners: list[UserBaseSchema]
     posts: list[PostBaseSchema]
 
 
 class PostGetSchema(PostBaseSchema):
-    pass
+    like_count: int
+    save_count: int
 
 
 class CommentGetSchema(CommentBaseSchema):
-    pass
+    like_count: int
+    save_count: int
+
+
+class PostSearchSchema(PostGetSchema):
+    snippet: str
+
+
+class CommentSearchSchema(CommentGetSchema):
+    snippet: str
 
 
 class BlogLikeGetSchema(BlogLikeCreateSchema):
@@ -44,3 +58,44 @@ class CommentLikeGetSchema(CommentLikeCreateSchema):
 
 class CommentSaveGetSchema(CommentSaveCreateSchema):
     saved_at: datetime
+
+
+class UserFollowGetSchema(UserFollowCreateSchema):
+    followed_at: datetime
+
+
+class BlogStatsSchema(OrmBaseModel):
+    blog_id: int
+    owner_count: int
+    post_count: int
+    comment_count: int
+    like_count: int
+    save_count: int
+    post_like_count: int
+    post_save_count: int
+    comment_like_count: int
+    comment_save_count: int
+    last_activity_at: datetime
+
+
+class UserStatsSchema(OrmBaseModel):
+    user_id: int
+    blog_count: int
+    post_count: int
+    comment_count: int
+    post_like_count: int
+    post_save_count: int
+    comment_like_count: int
+    comment_save_count: int
+    likes_given: int
+    saves_given: int
+    follower_count: int
+    follow_count: int
+    last_activity_at: datetime
+
+
+class BulkCreateResultSchema(OrmBaseModel):
+    index: int
+    status_code: int
+    detail: str | None = None
+    uuid: UUID | None = None
@@ -0,0 +1,252 @@
+from collections import Counter
+from datetime import datetime
+from functools import partial
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+from uuid import uuid4
+
+from src.backend.models.models import User, Blog, Post, Comment, UserBlog, BlogLike, PostLike, CommentLike, BlogSave, \
+    PostSave, CommentSave
+from src.backend.schemas.base_schemas import LikeBaseSchema, SaveBaseSchema
+from src.backend.schemas.create_schemas import PostCreateSchema, CommentCreateSchema, BlogLikeCreateSchema, \
+    PostLikeCreateSchema, CommentLikeCreateSchema, BlogSaveCreateSchema, PostSaveCreateSchema, CommentSaveCreateSchema
+from src.backend.schemas.get_schemas import BulkCreateResultSchema
+from src.backend.services.cache import mark_changed
+from src.backend.services.counters import change_counters
+from src.backend.services.feed import fan_out, fan_out_on_read_authors
+from src.backend.services.leaderboard import blog_leaderboard
+from src.backend.services.page_invalidation import invalidate_pages_on_commit
+from src.backend.services.trending import blog_trending, post_trending, LIKE_SCORE, COMMENT_SCORE
+
+# Keeps every IN list of the validation queries below SQLite's bound
+# parameter limit
+MAX_BULK_SIZE = 10_000
+
+# Details of a missing user, a missing target and an existing like or save,
+# worded like the single-item services
+LIKE_ERRORS = {
+    "blog": ("Liking user does not exist", "Liked blog does not exist", "Blog has already been liked"),
+    "post": ("Liking user does not exist", "Liked post does not exist", "Post has already been liked"),
+    "comment": ("Liking user does not exist", "Liked comment does not exist", "Comment has already been liked"),
+}
+
+SAVE_ERRORS = {
+    "blog": ("Saving user does not exist", "Saved blog does not exist", "Blog has already been saved"),
+    "post": ("Saving user does not exist", "Saved post does not exist", "Post has already been saved"),
+    "comment": ("Saving user does not exist", "Saved comment does not exist", "Comment has already been saved"),
+}
+
+
+# Batch counterparts of the services in create.py. A whole batch is validated
+# with one set-based query per rule instead of several lookups per item, the
+# valid items are inserted with a single executemany and the batch is
+# committed once. Every item gets its own result carrying the status code and
+# detail its single-item endpoint would have answered with, so one invalid
+# item does not reject the rest of the batch.
+async def create_posts(session: AsyncSession,
+                       new_post_schemas: list[PostCreateSchema]) -> list[BulkCreateResultSchema]:
+    blog_ids = {new_post_schema.blog_id for new_post_schema in new_post_schemas}
+    user_ids = {new_post_schema.user_id for new_post_schema in new_post_schemas}
+    titles = {new_post_schema.title for new_post_schema in new_post_schemas}
+
+    existing_blog_ids = await _existing_ids(session, Blog, blog_ids)
+    existing_user_ids = await _existing_ids(session, User, user_ids)
+    owned_blogs = set(await session.execute(
+        select(UserBlog.user_id, UserBlog.blog_id).
+        filter(UserBlog.user_id.in_(user_ids))
+    ))
+    taken_titles = set(await session.execute(
+        select(Post.blog_id, Post.title).
+        filter(Post.blog_id.in_(blog_ids), Post.title.in_(titles))
+    ))
+
+    fan_out_on_read = await fan_out_on_read_authors(session, existing_user_ids)
+    created_at = datetime.utcnow()
+    results = []
+    new_post_rows = []
+
+    for index, new_post_schema in enumerate(new_post_schemas):
+        if new_post_schema.blog_id not in existing_blog_ids:
+            results.append(_failed(index, 404, "Parent blog does not exist"))
+        elif new_post_schema.user_id not in existing_user_ids:
+            results.append(_failed(index, 404, "Post creator does not exist"))
+        elif (new_post_schema.user_id, new_post_schema.blog_id) not in owned_blogs:
+            results.append(_failed(index, 400, "User does not own blog"))
+        elif (new_post_schema.blog_id, new_post_schema.title) in taken_titles:
+            results.append(_failed(index, 400, "Post with given title already exists in given blog"))
+        else:
+            taken_titles.add((new_post_schema.blog_id, new_post_schema.title))
+            new_post_rows.append({**new_post_schema.dict(), "uuid": uuid4(), "created_at": created_at,
+                                  "fanned_out": new_post_schema.user_id not in fan_out_on_read})
+            results.append(BulkCreateResultSchema(index=index, status_code=200, uuid=new_post_rows[-1]["uuid"]))
+
+    await mark_changed(session, Blog, {new_post_row["blog_id"] for new_post_row in new_post_rows})
+    new_post_uuids = [new_post_row["uuid"] for new_post_row in new_post_rows]
+    await _insert_and_commit(session, Post, new_post_rows, partial(fan_out, session, Post.uuid.in_(new_post_uuids)))
+
+    return results
+
+
+async def create_comments(session: AsyncSession,
+                          new_comment_schemas: list[CommentCreateSchema]) -> list[BulkCreateResultSchema]:
+    post_ids = {new_comment_schema.post_id for new_comment_schema in new_comment_schemas}
+    user_ids = {new_comment_schema.user_id for new_comment_schema in new_comment_schemas}
+
+    parent_posts = (await session.execute(
+        select(Post.id, Post.blog_id, Post.uuid).
+        filter(Post.id.in_(post_ids))
+    )).all()
+    parent_blog_ids = {post_id: blog_id for post_id, blog_id, _ in parent_posts}
+    parent_post_uuids = {post_id: post_uuid for post_id, _, post_uuid in parent_posts}
+    existing_user_ids = await _existing_ids(session, User, user_ids)
+
+    created_at = datetime.utcnow()
+    results = []
+    new_comment_rows = []
+
+    for index, new_comment_schema in enumerate(new_comment_schemas):
+        if new_comment_schema.post_id not in parent_blog_ids:
+            results.append(_failed(index, 404, "Parent post does not exist"))
+        elif new_comment_schema.user_id not in existing_user_ids:
+            results.append(_failed(index, 404, "Comment creator does not exist"))
+        else:
+            new_comment_rows.append({**new_comment_schema.dict(), "uuid": uuid4(), "created_at": created_at})
+            results.append(BulkCreateResultSchema(index=index, status_code=200, uuid=new_comment_rows[-1]["uuid"]))
+
+    invalidate_pages_on_commit(session, Post, {parent_post_uuids[new_comment_row["post_id"]]
+                                               for new_comment_row in new_comment_rows})
+    await _insert_and_commit(session, Comment, new_comment_rows)
+
+    for new_comment_row in new_comment_rows:
+        post_trending.record(new_comment_row["post_id"], created_at, COMMENT_SCORE)
+        blog_trending.record(parent_blog_ids[new_comment_row["post_id"]], created_at, COMMENT_SCORE)
+
+    return results
+
+
+async def create_blog_likes(session: AsyncSession,
+                            new_like_schemas: list[BlogLikeCreateSchema]) -> list[BulkCreateResultSchema]:
+    results, new_like_rows = await _create_associations(session, new_like_schemas, BlogLike.blog_id, Blog.like_count,
+                                                        "liked_at", LIKE_ERRORS["blog"])
+
+    for blog_id, amount in Counter(new_like_row["blog_id"] for new_like_row in new_like_rows).items():
+        blog_leaderboard.change(blog_id, amount)
+    for new_like_row in new_like_rows:
+        blog_trending.record(new_like_row["blog_id"], new_like_row["liked_at"], LIKE_SCORE)
+
+    return results
+
+
+async def create_post_likes(session: AsyncSession,
+                            new_like_schemas: list[PostLikeCreateSchema]) -> list[BulkCreateResultSchema]:
+    results, new_like_rows = await _create_associations(session, new_like_schemas, PostLike.post_id, Post.like_count,
+                                                        "liked_at", LIKE_ERRORS["post"])
+
+    for new_like_row in new_like_rows:
+        post_trending.record(new_like_row["post_id"], new_like_row["liked_at"], LIKE_SCORE)
+
+    return results
+
+
+async def create_comment_likes(session: AsyncSession,
+                               new_like_schemas: list[CommentLikeCreateSchema]) -> list[BulkCreateResultSchema]:
+    results, _ = await _create_associations(session, new_like_schemas, CommentLike.comment_id, Comment.like_count,
+                                            "liked_at", LIKE_ERRORS["comment"])
+    return results
+
+
+async def create_blog_saves(session: AsyncSession,
+                            new_save_schemas: list[BlogSaveCreateSchema]) -> list[BulkCreateResultSchema]:
+    results, _ = await _create_associations(session, new_save_schemas, BlogSave.blog_id, Blog.save_count,
+                                            "saved_at", SAVE_ERRORS["blog"])
+    return results
+
+
+async def create_post_saves(session: AsyncSession,
+                            new_save_schemas: list[PostSaveCreateSchema]) -> list[BulkCreateResultSchema]:
+    results, _ = await _create_associations(session, new_save_schemas, PostSave.post_id, Post.save_count,
+                                            "saved_at", SAVE_ERRORS["post"])
+    return results
+
+
+async def create_comment_saves(session: AsyncSession,
+                               new_save_schemas: list[CommentSaveCreateSchema]) -> list[BulkCreateResultSchema]:
+    results, _ = await _create_associations(session, new_save_schemas, CommentSave.comment_id, Comment.save_count,
+                                            "saved_at", SAVE_ERRORS["comment"])
+    return results
+
+
+# Likes and saves only differ in the association table, the counted target
+# and the error details, so they share one implementation. Returns the
+# inserted rows as well, for the callers to update the in-process rankings.
+async def _create_associations(session: AsyncSession,
+                               new_schemas: list[LikeBaseSchema | SaveBaseSchema],
+                               target_column: InstrumentedAttribute,
+                               counter: InstrumentedAttribute,
+                               timestamp_key: str,
+                               errors: tuple[str, str, str]) -> tuple[list[BulkCreateResultSchema], list[dict]]:
+    association = target_column.class_
+    target_key = target_column.key
+    user_ids = {new_schema.user_id for new_schema in new_schemas}
+    target_ids = {getattr(new_schema, target_key) for new_schema in new_schemas}
+
+    existing_user_ids = await _existing_ids(session, User, user_ids)
+    existing_target_ids = await _existing_ids(session, counter.class_, target_ids)
+    existing_pairs = set(await session.execute(
+        select(association.user_id, target_column).
+        filter(association.user_id.in_(user_ids), target_column.in_(target_ids))
+    ))
+
+    created_at = datetime.utcnow()
+    results = []
+    new_rows = []
+
+    for index, new_schema in enumerate(new_schemas):
+        pair = (new_schema.user_id, getattr(new_schema, target_key))
+
+        if new_schema.user_id not in existing_user_ids:
+            results.append(_failed(index, 404, errors[0]))
+        elif pair[1] not in existing_target_ids:
+            results.append(_failed(index, 404, errors[1]))
+        elif pair in existing_pairs:
+            results.append(_failed(index, 400, errors[2]))
+        else:
+            existing_pairs.add(pair)
+            new_rows.append({**new_schema.dict(), timestamp_key: created_at})
+            results.append(BulkCreateResultSchema(index=index, status_code=200))
+
+    await change_counters(session, counter, Counter(new_row[target_key] for new_row in new_rows))
+    await _insert_and_commit(session, association, new_rows)
+
+    return results, new_rows
+
+
+async def _existing_ids(session: AsyncSession, model, ids: set[int]) -> set[int]:
+    return set(await session.scalars(select(model.id).filter(model.id.in_(ids))))
+
+
+# A row written by a concurrent request between validation and insert makes
+# the whole batch fail rather than leaving it partially applied
+# after_insert runs in the same transaction, once the rows are inserted
+async def _insert_and_commit(session: AsyncSession,
+                             model,
+                             rows: list[dict],
+                             after_insert: Callable[[], Awaitable[None]] | None = None) -> None:
+    try:
+        if rows:
+            await session.execute(insert(model), rows)
+            if after_insert is not None:
+                await after_insert()
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=409, detail="Batch conflicts with a concurrent write, nothing was created")
+
+
+def _failed(index: int, status_code: int, detail: str) -> BulkCreateResultSchema:
+    return BulkCreateResultSchema(index=index, status_code=status_code, detail=detail)
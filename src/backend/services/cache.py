@@ -0,0 +1,201 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable, Type
+from uuid import UUID
+
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.backend.database import READ_PRIMARY_SECONDS
+from src.backend.schemas.base_schemas import OrmBaseModel
+from src.backend.services.page_invalidation import invalidate_pages_on_commit
+
+CACHE_MAX_ENTRIES = int(os.getenv("BLOG_CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("BLOG_CACHE_TTL_SECONDS", "60"))
+
+
+# Bounded LRU cache of entities already serialized to JSON together with their
+# ETag, keyed by model and uuid. Entries are also indexed by id, as writes
+# usually only know the ids of the rows they touch. Every invalidation bumps a
+# generation number, and an entry loaded while a generation passed is not
+# stored, so a read racing a write cannot put the old row back. Replicas may
+# still return the old row for a while after the write, so entities changed
+# within READ_PRIMARY_SECONDS are not cached from a replica read. Like the
+# leaderboard, every worker process has its own cache, so across processes
+# entries are only as fresh as the TTL.
+class EntityCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: OrderedDict[tuple[type, UUID], tuple[float, int, tuple[str, bytes]]] = OrderedDict()
+        self.uuids_by_id: dict[tuple[type, int], UUID] = {}
+        self.invalidated_at: OrderedDict[tuple[type, int], float] = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, model: type, entity_uuid: UUID) -> tuple[str, bytes] | None:
+        entry = self.entries.get((model, entity_uuid))
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, entity_id, value = entry
+
+        if expires_at <= time.monotonic():
+            self.remove(model, entity_id)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end((model, entity_uuid))
+        self.hits += 1
+        return value
+
+    def set(self, model: type, entity_uuid: UUID, entity_id: int, value: tuple[str, bytes], generation: int) -> None:
+        if generation != self.generation or self.max_entries <= 0:
+            return
+
+        self.entries[(model, entity_uuid)] = (time.monotonic() + self.ttl_seconds, entity_id, value)
+        self.entries.move_to_end((model, entity_uuid))
+        self.uuids_by_id[(model, entity_id)] = entity_uuid
+
+        while len(self.entries) > self.max_entries:
+            (evicted_model, _), (_, evicted_id, _) = self.entries.popitem(last=False)
+            del self.uuids_by_id[(evicted_model, evicted_id)]
+            self.evictions += 1
+
+    def remove(self, model: type, entity_id: int) -> None:
+        entity_uuid = self.uuids_by_id.pop((model, entity_id), None)
+        if entity_uuid is not None:
+            del self.entries[(model, entity_uuid)]
+
+    def invalidate(self, model: type, entity_ids: Iterable[int]) -> None:
+        self.generation += 1
+        now = time.monotonic()
+        for entity_id in entity_ids:
+            self.remove(model, entity_id)
+            self.invalidated_at[(model, entity_id)] = now
+            self.invalidated_at.move_to_end((model, entity_id))
+            self.invalidations += 1
+        self.forget_old_invalidations(now)
+
+    def changed_recently(self, model: type, entity_id: int) -> bool:
+        self.forget_old_invalidations(time.monotonic())
+        return (model, entity_id) in self.invalidated_at
+
+    def forget_old_invalidations(self, now: float) -> None:
+        while self.invalidated_at and next(iter(self.invalidated_at.values())) <= now - READ_PRIMARY_SECONDS:
+            self.invalidated_at.popitem(last=False)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self.entries.clear()
+        self.uuids_by_id.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+entity_cache = EntityCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+
+
+# Every change to what an entity serializes to, including the rows it embeds,
+# bumps its version column, so (table, id, version) identifies one exact body
+def entity_etag(model: type, entity_id: int, version: int) -> str:
+    return f'"{model.__tablename__}-{entity_id}-{version}"'
+
+
+# Returns the ETag and JSON body of an entity, from the cache if possible.
+# When the client already holds the current version, only the version is
+# read from the database and nothing is serialized, the body is then None.
+async def read_through(session: AsyncSession,
+                       model: type,
+                       entity_uuid: UUID,
+                       load: Callable[[], Awaitable[Any]],
+                       schema: Type[OrmBaseModel],
+                       if_none_match: Callable[[str], bool]) -> tuple[str, bytes | None] | None:
+    cached_value = entity_cache.get(model, entity_uuid)
+
+    if cached_value is not None:
+        etag, body = cached_value
+        return etag, None if if_none_match(etag) else body
+
+    generation = entity_cache.generation
+    current_version = (await session.execute(
+        select(model.id, model.version).
+        filter(model.uuid == entity_uuid)
+    )).first()
+
+    if current_version is None:
+        return None
+
+    etag = entity_etag(model, *current_version)
+
+    if if_none_match(etag):
+        return etag, None
+
+    loaded_model = await load()
+
+    if loaded_model is None:
+        return None
+
+    etag = entity_etag(model, loaded_model.id, loaded_model.version)
+    body = schema.from_orm(loaded_model).json().encode()
+
+    if not (session.info.get("replica") and entity_cache.changed_recently(model, loaded_model.id)):
+        entity_cache.set(model, entity_uuid, loaded_model.id, (etag, body), generation)
+    return etag, body
+
+
+# Writes register the entities they change on their session, and the cache
+# entries are only dropped once the transaction commits. Dropping them
+# earlier would let a concurrent read cache the old row again before the
+# new one is visible, and a rollback changes nothing.
+def invalidate_on_commit(session: AsyncSession, model: type, entity_ids: Iterable[int]) -> None:
+    session.sync_session.info.setdefault("cache_invalidations", []).append((model, list(entity_ids)))
+
+
+# Called by every write that changes what an entity serializes to, either the
+# entity itself or a row it embeds, which also drops the frontend pages
+# showing it. Counter updates bump the version in their own UPDATE instead.
+async def mark_changed(session: AsyncSession, model: type, entity_ids: Iterable[int]) -> None:
+    entity_ids = list(entity_ids)
+
+    if not entity_ids:
+        return
+
+    changed_uuids = await session.scalars(
+        update(model).
+        filter(model.id.in_(entity_ids)).
+        values(version=model.version + 1).
+        returning(model.uuid).
+        execution_options(synchronize_session=False)
+    )
+    invalidate_on_commit(session, model, entity_ids)
+    invalidate_pages_on_commit(session, model, changed_uuids.all())
+
+
+@event.listens_for(Session, "after_commit")
+def apply_cache_invalidations(session: Session) -> None:
+    for model, entity_ids in session.info.pop("cache_invalidations", []):
+        entity_cache.invalidate(model, entity_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_cache_invalidations(session: Session) -> None:
+    session.info.pop("cache_invalidations", None)
@@ -0,0 +1,71 @@
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+from src.backend.models.models import Blog, Post, Comment, BlogLike, PostLike, CommentLike, BlogSave, PostSave, \
+    CommentSave
+from src.backend.services.cache import entity_cache, invalidate_on_commit
+
+# Every denormalized counter together with the association table it counts
+# and the column of that table pointing back at the counted row
+COUNTERS = [
+    (Blog.like_count, BlogLike, BlogLike.blog_id),
+    (Blog.save_count, BlogSave, BlogSave.blog_id),
+    (Post.like_count, PostLike, PostLike.post_id),
+    (Post.save_count, PostSave, PostSave.post_id),
+    (Comment.like_count, CommentLike, CommentLike.comment_id),
+    (Comment.save_count, CommentSave, CommentSave.comment_id),
+]
+
+
+# The counter is changed by the database itself (SET x = x + amount), so
+# concurrent likes never overwrite each other's increments. Callers commit
+# it in the same transaction as the like or save row it accounts for.
+async def change_counter(session: AsyncSession, counter: InstrumentedAttribute, criterion, amount: int) -> None:
+    model = counter.class_
+    changed_ids = await session.scalars(
+        update(model).
+        filter(criterion).
+        values({counter.key: counter + amount, "version": model.version + 1}).
+        returning(model.id)
+    )
+    invalidate_on_commit(session, model, changed_ids.all())
+
+
+# Bulk variant of change_counter taking the amount for every counted row id,
+# sent to the database as one executemany UPDATE
+async def change_counters(session: AsyncSession, counter: InstrumentedAttribute, amounts: dict[int, int]) -> None:
+    if not amounts:
+        return
+
+    table = counter.class_.__table__
+    column = table.c[counter.key]
+    await session.execute(
+        update(table).
+        filter(table.c.id == bindparam("counted_id")).
+        values({column: column + bindparam("amount"), table.c.version: table.c.version + 1}),
+        [{"counted_id": counted_id, "amount": amount} for counted_id, amount in amounts.items()]
+    )
+    invalidate_on_commit(session, counter.class_, amounts.keys())
+
+
+# Only rows whose counter drifted are rewritten, and their version is bumped
+# like on every other counter change, so ETags handed out before no longer
+# match the corrected counts
+async def reconcile_counters(session: AsyncSession) -> None:
+    for counter, association, association_parent_id in COUNTERS:
+        model = counter.class_
+        actual_count = select(func.count()). \
+            select_from(association). \
+            filter(association_parent_id == model.id). \
+            scalar_subquery()
+
+        await session.execute(
+            update(model).
+            filter(counter != actual_count).
+            values({counter.key: actual_count, "version": model.version + 1}).
+            execution_options(synchronize_session=False)
+        )
+
+    await session.commit()
+    entity_cache.clear()
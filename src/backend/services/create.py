@@ -1,21 +1,36 @@
 from datetime import datetime
 
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import Index, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
 from uuid import uuid4
 
-from src.backend.models.models import User, Blog, Post, Comment, BlogLike, PostLike, CommentLike, BlogSave, PostSave, \
-    CommentSave
+from src.backend.models.models import User, Blog, Post, Comment, UserBlog, BlogLike, PostLike, CommentLike, BlogSave, \
+    PostSave, CommentSave, UserFollowing
 from src.backend.schemas.create_schemas import UserCreateSchema, BlogCreateSchema, PostCreateSchema, \
     CommentCreateSchema, BlogLikeCreateSchema, PostLikeCreateSchema, CommentLikeCreateSchema, BlogSaveCreateSchema, \
-    PostSaveCreateSchema, CommentSaveCreateSchema
-from src.backend.services.get import get_user_by_username, get_user_by_id, get_blog_by_title, get_blog_by_id, \
-    get_user_blogs_by_id, get_post_by_title, get_post_by_id, get_blog_like_by_id, get_post_like_by_id, \
-    get_comment_by_id, get_comment_like_by_id, get_blog_save_by_id, get_post_save_by_id, get_comment_save_by_id
-
-
-def create_user(session: Session, new_user_schema: UserCreateSchema) -> User:
-    existing_user_model = get_user_by_username(session, new_user_schema.profile_name)
+    PostSaveCreateSchema, CommentSaveCreateSchema, UserFollowCreateSchema
+from src.backend.services.bulk_create import LIKE_ERRORS, SAVE_ERRORS
+from src.backend.services.cache import mark_changed
+from src.backend.services.counters import change_counter
+from src.backend.services.feed import fan_out, fan_out_on_read_authors, fan_out_to_follower
+from src.backend.services.follow_graph import follow_graph
+from src.backend.services.get import get_user_by_username, get_user_by_id, get_post_by_id, get_user_follow_by_id
+from src.backend.services.leaderboard import blog_leaderboard
+from src.backend.services.page_invalidation import invalidate_pages_on_commit
+from src.backend.services.trending import blog_trending, post_trending, LIKE_SCORE, COMMENT_SCORE
+from src.backend.services.write_behind import WRITE_BEHIND, write_behind_buffer
+
+# Unique indexes whose violation is answered with a 400 by _flush_unique
+BLOG_TITLE_INDEX = next(index for index in Blog.__table__.indexes if index.name == "ix_blog_title")
+POST_TITLE_INDEX = next(index for index in Post.__table__.indexes if index.name == "ix_post_blog_id_title")
+
+
+async def create_user(session: AsyncSession, new_user_schema: UserCreateSchema) -> User:
+    existing_user_model = await get_user_by_username(session, new_user_schema.profile_name)
 
     if existing_user_model is not None:
         raise HTTPException(status_code=400, detail="User with given profile name already exists")
@@ -24,23 +39,18 @@ def create_user(session: Session, new_user_schema: UserCreateSchema) -> User:
     new_user_model.uuid = uuid4()
 
     session.add(new_user_model)
-    session.commit()
-    session.refresh(new_user_model)
+    await session.commit()
+    await session.refresh(new_user_model, ["blogs"])
 
     return new_user_model
 
 
-def create_blog(session: Session, new_blog_schema: BlogCreateSchema) -> Blog:
-    user_creator_model = get_user_by_id(session, new_blog_schema.user_id)
+async def create_blog(session: AsyncSession, new_blog_schema: BlogCreateSchema) -> Blog:
+    user_creator_model = await session.get(User, new_blog_schema.user_id)
 
     if user_creator_model is None:
         raise HTTPException(status_code=404, detail="Blog creator does not exist")
 
-    existing_blog_model = get_blog_by_title(session, new_blog_schema.title)
-
-    if existing_blog_model is not None:
-        raise HTTPException(status_code=400, detail="Blog with given title already exists")
-
     new_blog_dict = new_blog_schema.dict()
     del new_blog_dict["user_id"]
 
@@ -48,53 +58,62 @@ def create_blog(session: Session, new_blog_schema: BlogCreateSchema) -> Blog:
     new_blog_model.uuid = uuid4()
     new_blog_model.owners.append(user_creator_model)
 
+    # Users embed the blogs they own
+    await mark_changed(session, User, [user_creator_model.id])
     session.add(new_blog_model)
-    session.commit()
-    session.refresh(new_blog_model)
+    await _flush_unique(session, BLOG_TITLE_INDEX, "Blog with given title already exists")
+    await session.commit()
+    await session.refresh(new_blog_model, ["owners", "posts"])
+    blog_leaderboard.add(new_blog_model.id)
 
     return new_blog_model
 
 
-def create_post(session: Session, new_post_schema: PostCreateSchema) -> Post:
-    parent_blog_model = get_blog_by_id(session, new_post_schema.blog_id)
-
-    if parent_blog_model is None:
+# Ownership is checked with one query of primary key lookups, which does not
+# depend on how many blogs the author owns or how many posts the blog has.
+# A title already taken in the blog is left to the unique index on
+# (blog_id, title).
+async def create_post(session: AsyncSession, new_post_schema: PostCreateSchema) -> Post:
+    blog_found, user_found, user_owns_blog = (await session.execute(select(
+        select(Blog.id).filter(Blog.id == new_post_schema.blog_id).exists(),
+        select(User.id).filter(User.id == new_post_schema.user_id).exists(),
+        select(UserBlog.blog_id).
+        filter(UserBlog.user_id == new_post_schema.user_id, UserBlog.blog_id == new_post_schema.blog_id).
+        exists()
+    ))).one()
+
+    if not blog_found:
         raise HTTPException(status_code=404, detail="Parent blog does not exist")
 
-    user_creator_model = get_user_by_id(session, new_post_schema.user_id)
-
-    if user_creator_model is None:
+    if not user_found:
         raise HTTPException(status_code=404, detail="Post creator does not exist")
 
-    creator_blogs = get_user_blogs_by_id(session, user_creator_model.id)
-
-    if parent_blog_model not in creator_blogs:
+    if not user_owns_blog:
         raise HTTPException(status_code=400, detail="User does not own blog")
 
-    existing_post_model = get_post_by_title(session, new_post_schema.title, new_post_schema.blog_id)
-
-    if existing_post_model is not None:
-        raise HTTPException(status_code=400, detail="Post with given title already exists in given blog")
+    fan_out_on_read = await fan_out_on_read_authors(session, [new_post_schema.user_id])
 
     new_post_model = Post(**new_post_schema.dict(), created_at=datetime.utcnow())
     new_post_model.uuid = uuid4()
-    new_post_model.user = user_creator_model
-    new_post_model.blog = parent_blog_model
+    new_post_model.fanned_out = new_post_schema.user_id not in fan_out_on_read
 
+    # Blogs embed their posts
+    await mark_changed(session, Blog, [new_post_schema.blog_id])
     session.add(new_post_model)
-    session.commit()
-    session.refresh(new_post_model)
+    await _flush_unique(session, POST_TITLE_INDEX, "Post with given title already exists in given blog")
+    await fan_out(session, Post.id == new_post_model.id)
+    await session.commit()
 
     return new_post_model
 
 
-def create_comment(session: Session, new_comment_schema: CommentCreateSchema) -> Comment:
-    parent_post_model = get_post_by_id(session, new_comment_schema.post_id)
+async def create_comment(session: AsyncSession, new_comment_schema: CommentCreateSchema) -> Comment:
+    parent_post_model = await get_post_by_id(session, new_comment_schema.post_id)
 
     if parent_post_model is None:
         raise HTTPException(status_code=404, detail="Parent post does not exist")
 
-    user_creator_model = get_user_by_id(session, new_comment_schema.user_id)
+    user_creator_model = await get_user_by_id(session, new_comment_schema.user_id)
 
     if user_creator_model is None:
         raise HTTPException(status_code=404, detail="Comment creator does not exist")
@@ -105,169 +124,176 @@ def create_comment(session: Session, new_comment_schema: CommentCreateSchema) ->
     new_comment_model.post = parent_post_model
 
     session.add(new_comment_model)
-    session.commit()
-    session.refresh(new_comment_model)
+    invalidate_pages_on_commit(session, Post, [parent_post_model.uuid])
+    await session.commit()
+    await session.refresh(new_comment_model)
+    post_trending.record(parent_post_model.id, new_comment_model.created_at, COMMENT_SCORE)
+    blog_trending.record(parent_post_model.blog_id, new_comment_model.created_at, COMMENT_SCORE)
 
     return new_comment_model
 
 
-def create_blog_like(session: Session, new_like_schema: BlogLikeCreateSchema) -> BlogLike:
-    liking_user_model = get_user_by_id(session, new_like_schema.user_id)
-
-    if liking_user_model is None:
-        raise HTTPException(status_code=404, detail="Liking user does not exist")
-
-    liked_blog_model = get_blog_by_id(session, new_like_schema.blog_id)
-
-    if liked_blog_model is None:
-        raise HTTPException(status_code=404, detail="Liked blog does not exist")
-
-    existing_blog_like_model = get_blog_like_by_id(session, new_like_schema.user_id, new_like_schema.blog_id)
-
-    if existing_blog_like_model is not None:
-        raise HTTPException(status_code=400, detail="Blog has already been liked")
-
+async def create_blog_like(session: AsyncSession, new_like_schema: BlogLikeCreateSchema) -> BlogLike:
     new_like_model = BlogLike(**new_like_schema.dict(), liked_at=datetime.utcnow())
-    new_like_model.user = liking_user_model
-    new_like_model.blog = liked_blog_model
-
-    session.add(new_like_model)
-    session.commit()
-    session.refresh(new_like_model)
-
-    return new_like_model
-
-
-def create_post_like(session: Session, new_like_schema: PostLikeCreateSchema) -> PostLike:
-    liking_user_model = get_user_by_id(session, new_like_schema.user_id)
 
-    if liking_user_model is None:
-        raise HTTPException(status_code=404, detail="Liking user does not exist")
-
-    liked_post_model = get_post_by_id(session, new_like_schema.post_id)
-
-    if liked_post_model is None:
-        raise HTTPException(status_code=404, detail="Liked post does not exist")
-
-    existing_post_like_model = get_post_like_by_id(session, new_like_schema.user_id, new_like_schema.post_id)
-
-    if existing_post_like_model is not None:
-        raise HTTPException(status_code=400, detail="Post has already been liked")
-
-    new_like_model = PostLike(**new_like_schema.dict(), liked_at=datetime.utcnow())
-    new_like_model.user = liking_user_model
-    new_like_model.post = liked_post_model
+    if WRITE_BEHIND:
+        return write_behind_buffer.add(new_like_model)
 
-    session.add(new_like_model)
-    session.commit()
-    session.refresh(new_like_model)
+    await _insert_association(session, new_like_model, BlogLike.blog_id, BlogLike.liked_at, Blog.like_count,
+                              LIKE_ERRORS["blog"])
+    blog_leaderboard.change(new_like_model.blog_id, 1)
+    blog_trending.record(new_like_model.blog_id, new_like_model.liked_at, LIKE_SCORE)
 
     return new_like_model
 
 
-def create_comment_like(session: Session, new_like_schema: CommentLikeCreateSchema) -> CommentLike:
-    liking_user_model = get_user_by_id(session, new_like_schema.user_id)
-
-    if liking_user_model is None:
-        raise HTTPException(status_code=404, detail="Liking user does not exist")
-
-    liked_comment_model = get_comment_by_id(session, new_like_schema.comment_id)
-
-    if liked_comment_model is None:
-        raise HTTPException(status_code=404, detail="Liked comment does not exist")
-
-    existing_comment_like_model = get_comment_like_by_id(session, new_like_schema.user_id, new_like_schema.comment_id)
-
-    if existing_comment_like_model is not None:
-        raise HTTPException(status_code=400, detail="Comment has already been liked")
+async def create_post_like(session: AsyncSession, new_like_schema: PostLikeCreateSchema) -> PostLike:
+    new_like_model = PostLike(**new_like_schema.dict(), liked_at=datetime.utcnow())
 
-    new_like_model = CommentLike(**new_like_schema.dict(), liked_at=datetime.utcnow())
-    new_like_model.user = liking_user_model
-    new_like_model.comment = liked_comment_model
+    if WRITE_BEHIND:
+        return write_behind_buffer.add(new_like_model)
 
-    session.add(new_like_model)
-    session.commit()
-    session.refresh(new_like_model)
+    await _insert_association(session, new_like_model, PostLike.post_id, PostLike.liked_at, Post.like_count,
+                              LIKE_ERRORS["post"])
+    post_trending.record(new_like_model.post_id, new_like_model.liked_at, LIKE_SCORE)
 
     return new_like_model
 
 
-def create_blog_save(session: Session, new_save_schema: BlogSaveCreateSchema) -> BlogSave:
-    saving_user_model = get_user_by_id(session, new_save_schema.user_id)
-
-    if saving_user_model is None:
-        raise HTTPException(status_code=404, detail="Saving user does not exist")
+async def create_comment_like(session: AsyncSession, new_like_schema: CommentLikeCreateSchema) -> CommentLike:
+    new_like_model = CommentLike(**new_like_schema.dict(), liked_at=datetime.utcnow())
 
-    saving_blog_model = get_blog_by_id(session, new_save_schema.blog_id)
+    if WRITE_BEHIND:
+        return write_behind_buffer.add(new_like_model)
 
-    if saving_blog_model is None:
-        raise HTTPException(status_code=404, detail="Saved blog does not exist")
+    await _insert_association(session, new_like_model, CommentLike.comment_id, CommentLike.liked_at, Comment.like_count,
+                              LIKE_ERRORS["comment"])
 
-    existing_blog_save_model = get_blog_save_by_id(session, new_save_schema.user_id, new_save_schema.blog_id)
+    return new_like_model
 
-    if existing_blog_save_model is not None:
-        raise HTTPException(status_code=400, detail="Blog has already been saved")
 
+async def create_blog_save(session: AsyncSession, new_save_schema: BlogSaveCreateSchema) -> BlogSave:
     new_save_model = BlogSave(**new_save_schema.dict(), saved_at=datetime.utcnow())
-    new_save_model.user = saving_user_model
-    new_save_model.blog = saving_blog_model
-
-    session.add(new_save_model)
-    session.commit()
-    session.refresh(new_save_model)
-
-    return new_save_model
 
+    if WRITE_BEHIND:
+        return write_behind_buffer.add(new_save_model)
 
-def create_post_save(session: Session, new_save_schema: PostSaveCreateSchema) -> PostSave:
-    saving_user_model = get_user_by_id(session, new_save_schema.user_id)
+    await _insert_association(session, new_save_model, BlogSave.blog_id, BlogSave.saved_at, Blog.save_count,
+                              SAVE_ERRORS["blog"])
 
-    if saving_user_model is None:
-        raise HTTPException(status_code=404, detail="Saving user does not exist")
-
-    saved_post_model = get_post_by_id(session, new_save_schema.post_id)
-
-    if saved_post_model is None:
-        raise HTTPException(status_code=404, detail="Saved post does not exist")
-
-    existing_post_save_model = get_post_save_by_id(session, new_save_schema.user_id, new_save_schema.post_id)
+    return new_save_model
 
-    if existing_post_save_model is not None:
-        raise HTTPException(status_code=400, detail="Post has already been saved")
 
+async def create_post_save(session: AsyncSession, new_save_schema: PostSaveCreateSchema) -> PostSave:
     new_save_model = PostSave(**new_save_schema.dict(), saved_at=datetime.utcnow())
-    new_save_model.user = saving_user_model
-    new_save_model.post = saved_post_model
-
-    session.add(new_save_model)
-    session.commit()
-    session.refresh(new_save_model)
-
-    return new_save_model
 
+    if WRITE_BEHIND:
+        return write_behind_buffer.add(new_save_model)
 
-def create_comment_save(session: Session, new_save_schema: CommentSaveCreateSchema) -> CommentSave:
-    saving_user_model = get_user_by_id(session, new_save_schema.user_id)
+    await _insert_association(session, new_save_model, PostSave.post_id, PostSave.saved_at, Post.save_count,
+                              SAVE_ERRORS["post"])
 
-    if saving_user_model is None:
-        raise HTTPException(status_code=404, detail="Saving user does not exist")
+    return new_save_model
 
-    saved_comment_model = get_comment_by_id(session, new_save_schema.comment_id)
 
-    if saved_comment_model is None:
-        raise HTTPException(status_code=404, detail="Saved comment does not exist")
+async def create_comment_save(session: AsyncSession, new_save_schema: CommentSaveCreateSchema) -> CommentSave:
+    new_save_model = CommentSave(**new_save_schema.dict(), saved_at=datetime.utcnow())
 
-    existing_comment_save_model = get_comment_save_by_id(session, new_save_schema.user_id, new_save_schema.comment_id)
+    if WRITE_BEHIND:
+        return write_behind_buffer.add(new_save_model)
 
-    if existing_comment_save_model is not None:
-        raise HTTPException(status_code=400, detail="Comment has already been saved")
+    await _insert_association(session, new_save_model, CommentSave.comment_id, CommentSave.saved_at, Comment.save_count,
+                              SAVE_ERRORS["comment"])
 
-    new_save_model = CommentSave(**new_save_schema.dict(), saved_at=datetime.utcnow())
-    new_save_model.user = saving_user_model
-    new_save_model.comment = saved_comment_model
+    return new_save_model
 
-    session.add(new_save_model)
-    session.commit()
-    session.refresh(new_save_model)
 
-    return new_save_model
+# Flushes the new row, answering a violation of the given unique index with
+# the same 400 the lookup before the insert used to give. Any other integrity
+# error is raised as is. The migration refuses to start without the index, so
+# the index always backs the check.
+async def _flush_unique(session: AsyncSession, index: Index, detail: str) -> None:
+    try:
+        await session.flush()
+    except IntegrityError as error:
+        await session.rollback()
+        if _violates(error, index):
+            raise HTTPException(status_code=400, detail=detail)
+        raise
+
+
+# SQLite names the columns of the violated index, as in "UNIQUE constraint
+# failed: post.blog_id, post.title", other databases name the index itself
+def _violates(error: IntegrityError, index: Index) -> bool:
+    message = str(error.orig)
+    columns = ", ".join(f"{index.table.name}.{column.name}" for column in index.columns)
+    return index.name in message or message.endswith(f"constraint failed: {columns}")
+
+
+# Likes and saves are inserted by a single INSERT ... SELECT that only yields
+# a row when both the user and the target exist, with ON CONFLICT DO NOTHING
+# on the primary key, so a concurrent duplicate cannot slip in between a
+# check and the insert. The counter is changed in the same transaction only
+# when a row went in. Why nothing was inserted is looked up afterwards, which
+# only costs a query on the failing path.
+async def _insert_association(session: AsyncSession,
+                              new_model,
+                              target_column: InstrumentedAttribute,
+                              timestamp_column: InstrumentedAttribute,
+                              counter: InstrumentedAttribute,
+                              errors: tuple[str, str, str]):
+    association = type(new_model)
+    target_model = counter.class_
+    target_id = getattr(new_model, target_column.key)
+    columns = [association.user_id, target_column, timestamp_column]
+    user_exists = select(User.id).filter(User.id == new_model.user_id).exists()
+    target_exists = select(target_model.id).filter(target_model.id == target_id).exists()
+
+    inserted = await session.execute(
+        sqlite_insert(association).
+        from_select(columns, select(*[literal(getattr(new_model, column.key), column.type) for column in columns]).
+                    filter(user_exists, target_exists)).
+        on_conflict_do_nothing().
+        returning(association.user_id)
+    )
+
+    if inserted.first() is None:
+        await session.rollback()
+        user_found, target_found = (await session.execute(select(user_exists, target_exists))).one()
+        if not user_found:
+            raise HTTPException(status_code=404, detail=errors[0])
+        if not target_found:
+            raise HTTPException(status_code=404, detail=errors[1])
+        raise HTTPException(status_code=400, detail=errors[2])
+
+    await change_counter(session, counter, target_model.id == target_id, 1)
+    await session.commit()
+
+    return new_model
+
+
+async def create_user_follow(session: AsyncSession, new_follow_schema: UserFollowCreateSchema) -> UserFollowing:
+    if new_follow_schema.user_id == new_follow_schema.follower_id:
+        raise HTTPException(status_code=400, detail="Users cannot follow themselves")
+
+    if await get_user_by_id(session, new_follow_schema.follower_id) is None:
+        raise HTTPException(status_code=404, detail="Following user does not exist")
+
+    if await get_user_by_id(session, new_follow_schema.user_id) is None:
+        raise HTTPException(status_code=404, detail="Followed user does not exist")
+
+    existing_follow_model = await get_user_follow_by_id(session, new_follow_schema.user_id,
+                                                        new_follow_schema.follower_id)
+
+    if existing_follow_model is not None:
+        raise HTTPException(status_code=400, detail="User is already followed")
+
+    new_follow_model = UserFollowing(**new_follow_schema.dict(), followed_at=datetime.utcnow())
+
+    session.add(new_follow_model)
+    await session.flush()
+    await fan_out_to_follower(session, new_follow_model.follower_id, new_follow_model.user_id)
+    await session.commit()
+    follow_graph.follow(new_follow_model.follower_id, new_follow_model.user_id)
+
+    return new_follow_model
@@ -1,79 +1,246 @@
-from sqlalchemy import UUID
-from sqlalchemy.orm import Session
+from sqlalchemy import UUID, delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.backend.models.models import User, Blog, Post, Comment, BlogLike, PostLike, CommentLike, BlogSave, PostSave, \
-    CommentSave
+from src.backend.models.models import User, Blog, Post, Comment, UserBlog, BlogLike, PostLike, CommentLike, BlogSave, \
+    PostSave, CommentSave, TimelineEntry, UserFollowing
+from src.backend.services.cache import invalidate_on_commit, mark_changed
+from src.backend.services.counters import change_counter
+from src.backend.services.feed import remove_from_follower
+from src.backend.services.follow_graph import follow_graph
+from src.backend.services.leaderboard import blog_leaderboard
+from src.backend.services.page_invalidation import invalidate_pages_on_commit
+from src.backend.services.trending import blog_trending, post_trending, LIKE_SCORE, COMMENT_SCORE
+from src.backend.services.write_behind import WRITE_BEHIND, write_behind_buffer
 
 
-def delete_user_by_uuid(session: Session, user_uuid: UUID) -> None:
-    session.query(User).filter(User.uuid == user_uuid).delete()
-    session.commit()
+def _user_id_by_uuid(user_uuid: UUID):
+    return select(User.id).filter(User.uuid == user_uuid).scalar_subquery()
 
 
-def delete_blog_by_uuid(session: Session, blog_uuid: UUID) -> None:
-    session.query(Blog).filter(Blog.uuid == blog_uuid).delete()
-    session.commit()
+def _blog_id_by_uuid(blog_uuid: UUID):
+    return select(Blog.id).filter(Blog.uuid == blog_uuid).scalar_subquery()
 
 
-def delete_post_by_uuid(session: Session, post_uuid: UUID) -> None:
-    session.query(Post).filter(Post.uuid == post_uuid).delete()
-    session.commit()
+def _post_id_by_uuid(post_uuid: UUID):
+    return select(Post.id).filter(Post.uuid == post_uuid).scalar_subquery()
 
 
-def delete_comment_by_uuid(session: Session, comment_uuid: UUID) -> None:
-    session.query(Comment).filter(Comment.uuid == comment_uuid).delete()
-    session.commit()
+def _comment_id_by_uuid(comment_uuid: UUID):
+    return select(Comment.id).filter(Comment.uuid == comment_uuid).scalar_subquery()
 
 
-def delete_blog_like_by_uuid(session: Session, user_uuid: UUID, blog_uuid: UUID) -> None:
-    session.query(BlogLike). \
-        filter(BlogLike.user_uuid == user_uuid
-               and BlogLike.blog_uuid == blog_uuid). \
-        delete()
+# With write-behind on, only the ids are looked up now, the row is deleted
+# and its counter changed by the next flush
+async def _remove_behind(session: AsyncSession, association: type, user_id, target_id) -> None:
+    user_id, target_id = (await session.execute(select(user_id, target_id))).one()
 
-    session.commit()
+    if user_id is not None and target_id is not None:
+        write_behind_buffer.remove(association, user_id, target_id)
 
 
-def delete_post_like_by_uuid(session: Session, user_uuid: UUID, post_uuid: UUID) -> None:
-    session.query(PostLike). \
-        filter(PostLike.user_uuid == user_uuid
-               and PostLike.post_uuid == post_uuid). \
-        delete()
+async def delete_user_by_uuid(session: AsyncSession, user_uuid: UUID) -> None:
+    deleted_user_ids = await session.scalars(delete(User).filter(User.uuid == user_uuid).returning(User.id))
+    deleted_user_ids = deleted_user_ids.all()
+    owned_blog_ids = await session.scalars(select(UserBlog.blog_id).filter(UserBlog.user_id.in_(deleted_user_ids)))
+    await session.execute(delete(TimelineEntry).filter(TimelineEntry.user_id.in_(deleted_user_ids)))
+    await session.execute(
+        delete(UserFollowing).
+        filter(or_(UserFollowing.user_id.in_(deleted_user_ids), UserFollowing.follower_id.in_(deleted_user_ids)))
+    )
 
-    session.commit()
+    # Blogs embed their owners
+    invalidate_on_commit(session, User, deleted_user_ids)
+    await mark_changed(session, Blog, owned_blog_ids.all())
+    await session.commit()
 
+    for user_id in deleted_user_ids:
+        follow_graph.forget_user(user_id)
 
-def delete_comment_like_by_uuid(session: Session, user_uuid: UUID, comment_uuid: UUID) -> None:
-    session.query(CommentLike). \
-        filter(CommentLike.user_uuid == user_uuid
-               and CommentLike.comment_uuid == comment_uuid). \
-        delete()
 
-    session.commit()
+async def delete_blog_by_uuid(session: AsyncSession, blog_uuid: UUID) -> None:
+    deleted_blog_ids = await session.scalars(delete(Blog).filter(Blog.uuid == blog_uuid).returning(Blog.id))
+    deleted_blog_ids = deleted_blog_ids.all()
+    owner_ids = await session.scalars(select(UserBlog.user_id).filter(UserBlog.blog_id.in_(deleted_blog_ids)))
 
+    # Users embed the blogs they own
+    invalidate_on_commit(session, Blog, deleted_blog_ids)
+    await mark_changed(session, User, owner_ids.all())
+    await session.commit()
 
-def delete_blog_save_by_uuid(session: Session, user_uuid: UUID, blog_uuid: UUID) -> None:
-    session.query(BlogSave). \
-        filter(BlogSave.user_uuid == user_uuid
-               and BlogSave.blog_uuid == blog_uuid). \
-        delete()
+    for blog_id in deleted_blog_ids:
+        blog_leaderboard.remove(blog_id)
+        blog_trending.forget(blog_id)
 
-    session.commit()
 
+async def delete_post_by_uuid(session: AsyncSession, post_uuid: UUID) -> None:
+    deleted_posts = await session.execute(delete(Post).filter(Post.uuid == post_uuid).returning(Post.id, Post.blog_id))
+    deleted_posts = deleted_posts.all()
+    await session.execute(
+        delete(TimelineEntry).
+        filter(TimelineEntry.post_id.in_([post_id for post_id, _ in deleted_posts]))
+    )
 
-def delete_post_save_by_uuid(session: Session, user_uuid: UUID, post_uuid: UUID) -> None:
-    session.query(PostSave). \
-        filter(PostSave.user_uuid == user_uuid
-               and PostSave.post_uuid == post_uuid). \
-        delete()
+    # Blogs embed their posts
+    invalidate_on_commit(session, Post, [post_id for post_id, _ in deleted_posts])
+    await mark_changed(session, Blog, [blog_id for _, blog_id in deleted_posts])
+    await session.commit()
 
-    session.commit()
+    for post_id, _ in deleted_posts:
+        post_trending.forget(post_id)
 
 
-def delete_comment_save_by_uuid(session: Session, user_uuid: UUID, comment_uuid: UUID) -> None:
-    session.query(CommentSave). \
-        filter(CommentSave.user_uuid == user_uuid
-               and CommentSave.comment_uuid == comment_uuid). \
-        delete()
+async def delete_comment_by_uuid(session: AsyncSession, comment_uuid: UUID) -> None:
+    deleted_comments = await session.execute(
+        delete(Comment).
+        filter(Comment.uuid == comment_uuid).
+        returning(Comment.id, Comment.post_id, Comment.created_at)
+    )
+    deleted_comments = deleted_comments.all()
+    parent_posts = []
 
-    session.commit()
+    if deleted_comments:
+        parent_posts = (await session.execute(
+            select(Post.id, Post.blog_id, Post.uuid).
+            filter(Post.id.in_([post_id for _, post_id, _ in deleted_comments]))
+        )).all()
+
+    parent_blog_ids = {post_id: blog_id for post_id, blog_id, _ in parent_posts}
+    invalidate_on_commit(session, Comment, [comment_id for comment_id, _, _ in deleted_comments])
+    invalidate_pages_on_commit(session, Post, [post_uuid for _, _, post_uuid in parent_posts])
+    await session.commit()
+
+    for _, post_id, created_at in deleted_comments:
+        post_trending.record(post_id, created_at, -COMMENT_SCORE)
+        if post_id in parent_blog_ids:
+            blog_trending.record(parent_blog_ids[post_id], created_at, -COMMENT_SCORE)
+
+
+async def delete_blog_like_by_uuid(session: AsyncSession, user_uuid: UUID, blog_uuid: UUID) -> None:
+    if WRITE_BEHIND:
+        await _remove_behind(session, BlogLike, _user_id_by_uuid(user_uuid), _blog_id_by_uuid(blog_uuid))
+        return
+
+    deleted_likes = await session.execute(
+        delete(BlogLike).
+        filter(BlogLike.user_id == _user_id_by_uuid(user_uuid),
+               BlogLike.blog_id == _blog_id_by_uuid(blog_uuid)).
+        returning(BlogLike.blog_id, BlogLike.liked_at)
+    )
+    deleted_likes = deleted_likes.all()
+
+    if deleted_likes:
+        await change_counter(session, Blog.like_count, Blog.uuid == blog_uuid, -len(deleted_likes))
+
+    await session.commit()
+
+    for blog_id, liked_at in deleted_likes:
+        blog_leaderboard.change(blog_id, -1)
+        blog_trending.record(blog_id, liked_at, -LIKE_SCORE)
+
+
+async def delete_post_like_by_uuid(session: AsyncSession, user_uuid: UUID, post_uuid: UUID) -> None:
+    if WRITE_BEHIND:
+        await _remove_behind(session, PostLike, _user_id_by_uuid(user_uuid), _post_id_by_uuid(post_uuid))
+        return
+
+    deleted_likes = await session.execute(
+        delete(PostLike).
+        filter(PostLike.user_id == _user_id_by_uuid(user_uuid),
+               PostLike.post_id == _post_id_by_uuid(post_uuid)).
+        returning(PostLike.post_id, PostLike.liked_at)
+    )
+    deleted_likes = deleted_likes.all()
+
+    if deleted_likes:
+        await change_counter(session, Post.like_count, Post.uuid == post_uuid, -len(deleted_likes))
+
+    await session.commit()
+
+    for post_id, liked_at in deleted_likes:
+        post_trending.record(post_id, liked_at, -LIKE_SCORE)
+
+
+async def delete_comment_like_by_uuid(session: AsyncSession, user_uuid: UUID, comment_uuid: UUID) -> None:
+    if WRITE_BEHIND:
+        await _remove_behind(session, CommentLike, _user_id_by_uuid(user_uuid), _comment_id_by_uuid(comment_uuid))
+        return
+
+    deleted_likes = await session.execute(
+        delete(CommentLike).
+        filter(CommentLike.user_id == _user_id_by_uuid(user_uuid),
+               CommentLike.comment_id == _comment_id_by_uuid(comment_uuid))
+    )
+
+    if deleted_likes.rowcount:
+        await change_counter(session, Comment.like_count, Comment.uuid == comment_uuid, -deleted_likes.rowcount)
+
+    await session.commit()
+
+
+async def delete_blog_save_by_uuid(session: AsyncSession, user_uuid: UUID, blog_uuid: UUID) -> None:
+    if WRITE_BEHIND:
+        await _remove_behind(session, BlogSave, _user_id_by_uuid(user_uuid), _blog_id_by_uuid(blog_uuid))
+        return
+
+    deleted_saves = await session.execute(
+        delete(BlogSave).
+        filter(BlogSave.user_id == _user_id_by_uuid(user_uuid),
+               BlogSave.blog_id == _blog_id_by_uuid(blog_uuid))
+    )
+
+    if deleted_saves.rowcount:
+        await change_counter(session, Blog.save_count, Blog.uuid == blog_uuid, -deleted_saves.rowcount)
+
+    await session.commit()
+
+
+async def delete_post_save_by_uuid(session: AsyncSession, user_uuid: UUID, post_uuid: UUID) -> None:
+    if WRITE_BEHIND:
+        await _remove_behind(session, PostSave, _user_id_by_uuid(user_uuid), _post_id_by_uuid(post_uuid))
+        return
+
+    deleted_saves = await session.execute(
+        delete(PostSave).
+        filter(PostSave.user_id == _user_id_by_uuid(user_uuid),
+               PostSave.post_id == _post_id_by_uuid(post_uuid))
+    )
+
+    if deleted_saves.rowcount:
+        await change_counter(session, Post.save_count, Post.uuid == post_uuid, -deleted_saves.rowcount)
+
+    await session.commit()
+
+
+async def delete_comment_save_by_uuid(session: AsyncSession, user_uuid: UUID, comment_uuid: UUID) -> None:
+    if WRITE_BEHIND:
+        await _remove_behind(session, CommentSave, _user_id_by_uuid(user_uuid), _comment_id_by_uuid(comment_uuid))
+        return
+
+    deleted_saves = await session.execute(
+        delete(CommentSave).
+        filter(CommentSave.user_id == _user_id_by_uuid(user_uuid),
+               CommentSave.comment_id == _comment_id_by_uuid(comment_uuid))
+    )
+
+    if deleted_saves.rowcount:
+        await change_counter(session, Comment.save_count, Comment.uuid == comment_uuid, -deleted_saves.rowcount)
+
+    await session.commit()
+
+
+async def delete_user_follow_by_uuid(session: AsyncSession, follower_uuid: UUID, user_uuid: UUID) -> None:
+    deleted_follows = await session.execute(
+        delete(UserFollowing).
+        filter(UserFollowing.follower_id == _user_id_by_uuid(follower_uuid),
+               UserFollowing.user_id == _user_id_by_uuid(user_uuid)).
+        returning(UserFollowing.follower_id, UserFollowing.user_id)
+    )
+    deleted_follows = deleted_follows.all()
+
+    for follower_id, user_id in deleted_follows:
+        await remove_from_follower(session, follower_id, user_id)
+
+    await session.commit()
+
+    for follower_id, user_id in deleted_follows:
+        follow_graph.unfollow(follower_id, user_id)
@@ -0,0 +1,131 @@
+import os
+from typing import Iterable
+from uuid import UUID
+
+from sqlalchemy import delete, false, func, insert, literal, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.backend.models.models import User, Post, UserFollowing, TimelineEntry
+from src.backend.services.pagination import decode_cursor, encode_cursor
+
+# Posts of authors with more followers than this are not copied into every
+# follower's timeline when they are created, their followers' feeds read them
+# from the post table instead
+FAN_OUT_MAX_FOLLOWERS = int(os.getenv("BLOG_FEED_FAN_OUT_MAX_FOLLOWERS", "5000"))
+
+
+# Authors whose posts are read on demand, in one query grouping the follows
+# of all given authors, each counted over its range of the user_id index
+async def fan_out_on_read_authors(session: AsyncSession, author_ids: Iterable[int]) -> set[int]:
+    author_ids = set(author_ids)
+
+    if not author_ids:
+        return set()
+
+    return set(await session.scalars(
+        select(UserFollowing.user_id).
+        filter(UserFollowing.user_id.in_(author_ids)).
+        group_by(UserFollowing.user_id).
+        having(func.count() > FAN_OUT_MAX_FOLLOWERS)
+    ))
+
+
+# Copies the matching posts that are marked as fanned out into the timelines
+# of their authors' followers, in one INSERT ... SELECT run in the
+# transaction that creates the posts
+async def fan_out(session: AsyncSession, post_criterion) -> None:
+    await session.execute(
+        insert(TimelineEntry).
+        from_select([TimelineEntry.user_id, TimelineEntry.created_at, TimelineEntry.post_id],
+                    select(UserFollowing.follower_id, Post.created_at, Post.id).
+                    join(UserFollowing, UserFollowing.user_id == Post.user_id).
+                    filter(post_criterion, Post.fanned_out))
+    )
+
+
+# After a follow the fanned out posts of the followed user are copied into
+# the follower's timeline, the others are read on demand anyway
+async def fan_out_to_follower(session: AsyncSession, follower_id: int, user_id: int) -> None:
+    await session.execute(
+        insert(TimelineEntry).
+        from_select([TimelineEntry.user_id, TimelineEntry.created_at, TimelineEntry.post_id],
+                    select(literal(follower_id), Post.created_at, Post.id).
+                    filter(Post.user_id == user_id, Post.fanned_out))
+    )
+
+
+async def remove_from_follower(session: AsyncSession, follower_id: int, user_id: int) -> None:
+    await session.execute(
+        delete(TimelineEntry).
+        filter(TimelineEntry.user_id == follower_id,
+               TimelineEntry.post_id.in_(select(Post.id).filter(Post.user_id == user_id)))
+    )
+
+
+# Imports and the dataset generator create follows without going through the
+# services, so after those the timelines are rebuilt from scratch, which also
+# decides again which authors have too many followers to be fanned out
+async def rebuild_timelines(session: AsyncSession) -> None:
+    fan_out_on_read = select(UserFollowing.user_id). \
+        group_by(UserFollowing.user_id). \
+        having(func.count() > FAN_OUT_MAX_FOLLOWERS)
+
+    await session.execute(delete(TimelineEntry))
+    await session.execute(
+        update(Post).
+        values(fanned_out=Post.user_id.not_in(fan_out_on_read)).
+        execution_options(synchronize_session=False)
+    )
+    await fan_out(session, Post.fanned_out)
+    await session.commit()
+
+
+# Newest first. The fanned out posts are one range scan of the user's
+# timeline. The posts of followed authors with too many followers are one
+# range scan per such author, of a partial index holding only their posts.
+# The pages are merged here.
+async def get_user_feed(session: AsyncSession,
+                        user_uuid: UUID,
+                        cursor: str | None,
+                        limit: int) -> tuple[list[Post], str | None] | None:
+    user_id = await session.scalar(select(User.id).filter(User.uuid == user_uuid))
+
+    if user_id is None:
+        return None
+
+    fan_out_on_read = await session.scalars(
+        select(UserFollowing.user_id).
+        filter(UserFollowing.follower_id == user_id,
+               select(Post.id).filter(Post.user_id == UserFollowing.user_id, Post.fanned_out == false()).exists())
+    )
+
+    pages = [
+        select(TimelineEntry.created_at, TimelineEntry.post_id.label("id")).
+        filter(TimelineEntry.user_id == user_id).
+        order_by(TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc())
+    ]
+    pages += [
+        select(Post.created_at, Post.id).
+        filter(Post.user_id == author_id, Post.fanned_out == false()).
+        order_by(Post.created_at.desc(), Post.id.desc())
+        for author_id in fan_out_on_read
+    ]
+
+    entries = []
+    before = None if cursor is None else decode_cursor(cursor)
+
+    for page in pages:
+        if before is not None:
+            page = page.filter(tuple_(*page.selected_columns) < before)
+        entries += (await session.execute(page.limit(limit + 1))).all()
+
+    entries = sorted(entries, reverse=True)[:limit + 1]
+
+    posts = await session.scalars(select(Post).filter(Post.id.in_([entry.id for entry in entries[:limit]])))
+    posts_by_id = {post.id: post for post in posts}
+    feed = [posts_by_id[entry.id] for entry in entries[:limit] if entry.id in posts_by_id]
+
+    if len(entries) <= limit:
+        return feed, None
+
+    return feed, encode_cursor(entries[limit - 1])
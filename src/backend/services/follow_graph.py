@@ -0,0 +1,161 @@
+import heapq
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from itertools import islice
+from typing import Iterator
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.backend.models.models import UserFollowing
+
+# Friends of friends are counted over at most this many follows, so the
+# suggestions of a user following many popular users stay cheap
+SUGGESTION_MAX_SCANNED = int(os.getenv("BLOG_FOLLOW_SUGGESTION_MAX_SCANNED", "20000"))
+
+
+# One direction of the follow graph in compressed sparse row form: the
+# neighbours of user n are targets[offsets[n]:offsets[n + 1]], sorted by id,
+# so a count is a subtraction and a membership check a binary search. Changes
+# after the load go to small added and removed sets per user, added never
+# holds an edge of the arrays and removed only holds edges of the arrays.
+class Adjacency:
+    def __init__(self):
+        self.offsets = array("q", [0])
+        self.targets = array("q")
+        self.added: dict[int, set[int]] = defaultdict(set)
+        self.removed: dict[int, set[int]] = defaultdict(set)
+
+    def build(self, edges: list[tuple[int, int]], max_source: int) -> None:
+        edges.sort()
+        self.offsets = array("q", [0]) * (max_source + 2)
+        for source, _ in edges:
+            self.offsets[source + 1] += 1
+        for source in range(1, max_source + 2):
+            self.offsets[source] += self.offsets[source - 1]
+        self.targets = array("q", (target for _, target in edges))
+        self.added.clear()
+        self.removed.clear()
+
+    def bounds(self, source: int) -> tuple[int, int]:
+        if source < 0 or source + 1 >= len(self.offsets):
+            return 0, 0
+        return self.offsets[source], self.offsets[source + 1]
+
+    def in_arrays(self, source: int, target: int) -> bool:
+        start, end = self.bounds(source)
+        position = bisect_left(self.targets, target, start, end)
+        return position < end and self.targets[position] == target
+
+    def contains(self, source: int, target: int) -> bool:
+        if target in self.added.get(source, ()):
+            return True
+        return target not in self.removed.get(source, ()) and self.in_arrays(source, target)
+
+    def count(self, source: int) -> int:
+        start, end = self.bounds(source)
+        return end - start + len(self.added.get(source, ())) - len(self.removed.get(source, ()))
+
+    def add(self, source: int, target: int) -> None:
+        if target in self.removed.get(source, ()):
+            self.removed[source].discard(target)
+        elif not self.in_arrays(source, target):
+            self.added[source].add(target)
+
+    def discard(self, source: int, target: int) -> None:
+        if target in self.added.get(source, ()):
+            self.added[source].discard(target)
+        elif self.in_arrays(source, target):
+            self.removed[source].add(target)
+
+    # Neighbours in id order, starting after the given id
+    def neighbours(self, source: int, after: int = 0) -> Iterator[int]:
+        start, end = self.bounds(source)
+        removed = self.removed.get(source, ())
+        stored = (self.targets[position] for position in range(bisect_right(self.targets, after, start, end), end))
+        added = sorted(target for target in self.added.get(source, ()) if target > after)
+        return (target for target in heapq.merge(stored, added) if target not in removed)
+
+
+# In-process index of the following table, users by integer id. It is built
+# once at startup and afterwards changed by the create/delete services after
+# they commit, like the blog leaderboard. Each worker process keeps its own
+# copy, so a follow made through another worker shows up after a restart.
+class FollowGraph:
+    def __init__(self):
+        self.followers = Adjacency()
+        self.follows = Adjacency()
+
+    async def load(self, session: AsyncSession) -> None:
+        rows = (await session.execute(select(UserFollowing.user_id, UserFollowing.follower_id))).all()
+        max_user_id = max((max(row) for row in rows), default=0)
+        self.followers.build([(user_id, follower_id) for user_id, follower_id in rows], max_user_id)
+        self.follows.build([(follower_id, user_id) for user_id, follower_id in rows], max_user_id)
+
+    def follow(self, follower_id: int, user_id: int) -> None:
+        self.followers.add(user_id, follower_id)
+        self.follows.add(follower_id, user_id)
+
+    def unfollow(self, follower_id: int, user_id: int) -> None:
+        self.followers.discard(user_id, follower_id)
+        self.follows.discard(follower_id, user_id)
+
+    def forget_user(self, user_id: int) -> None:
+        for follower_id in list(self.followers.neighbours(user_id)):
+            self.unfollow(follower_id, user_id)
+        for followed_id in list(self.follows.neighbours(user_id)):
+            self.unfollow(user_id, followed_id)
+
+    def follower_count(self, user_id: int) -> int:
+        return self.followers.count(user_id)
+
+    def follow_count(self, user_id: int) -> int:
+        return self.follows.count(user_id)
+
+    def is_following(self, follower_id: int, user_id: int) -> bool:
+        return self.follows.contains(follower_id, user_id)
+
+    def follow_each_other(self, user_id: int, other_user_id: int) -> bool:
+        return self.is_following(user_id, other_user_id) and self.is_following(other_user_id, user_id)
+
+    # One id past the page is taken, so the last id is only returned as the
+    # next cursor when there actually is a next page
+    def followers_page(self, user_id: int, after: int, limit: int) -> tuple[list[int], int | None]:
+        return page(self.followers.neighbours(user_id, after), limit)
+
+    def follows_page(self, user_id: int, after: int, limit: int) -> tuple[list[int], int | None]:
+        return page(self.follows.neighbours(user_id, after), limit)
+
+    # Users followed by the users this user follows, ranked by how many of
+    # them follow each one, then by id
+    def suggestions(self, user_id: int, amount: int) -> list[int]:
+        counts = Counter()
+        scanned = 0
+
+        for followed_id in self.follows.neighbours(user_id):
+            for suggested_id in self.follows.neighbours(followed_id):
+                scanned += 1
+                if suggested_id != user_id and not self.is_following(user_id, suggested_id):
+                    counts[suggested_id] += 1
+                if scanned >= SUGGESTION_MAX_SCANNED:
+                    break
+            if scanned >= SUGGESTION_MAX_SCANNED:
+                break
+
+        ranking = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        return [suggested_id for suggested_id, _ in ranking[:max(amount, 0)]]
+
+
+def page(ids: Iterator[int], limit: int) -> tuple[list[int], int | None]:
+    ids = list(islice(ids, limit + 1))
+
+    if len(ids) <= limit:
+        return ids, None
+
+    ids = ids[:limit]
+    return ids, ids[-1]
+
+
+follow_graph = FollowGraph()
@@ -1,191 +1,422 @@
-from typing import Type
+from typing import Callable, Type
 
-from sqlalchemy import desc, func
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncScalarResult
+from sqlalchemy.orm import selectinload
 from uuid import UUID
 
 from src.backend.models.models import User, Blog, Post, Comment, BlogLike, PostLike, CommentLike, BlogSave, PostSave, \
-    CommentSave
+    CommentSave, UserFollowing
+from src.backend.schemas.get_schemas import UserGetSchema, BlogGetSchema, PostGetSchema, CommentGetSchema
+from src.backend.services.cache import read_through
+from src.backend.services.follow_graph import follow_graph
+from src.backend.services.leaderboard import blog_leaderboard
+from src.backend.services.pagination import paginate, page_etag, stream, encode_id_cursor, decode_id_cursor
+from src.backend.services.trending import blog_trending, post_trending, TrendingWindow
 
+# Loader options matching the relationships nested by UserGetSchema and
+# BlogGetSchema, for single rows and lists alike. Every collection uses
+# selectinload, so serializing any number of rows costs one extra query per
+# relationship. A joinedload would not be cheaper for a single row either:
+# SQLite plans one of the many-to-many user_blog relationship as a
+# materialized scan of the whole association table, where the selectin query
+# is a lookup of its index.
+USER_GET_OPTIONS = (selectinload(User.blogs),)
+BLOG_GET_OPTIONS = (selectinload(Blog.owners), selectinload(Blog.posts))
 
-def get_user_by_id(session: Session, user_id: int) -> Type[User] | None:
-    return session.query(User).filter(User.id == user_id).first()
 
+async def get_user_by_id(session: AsyncSession, user_id: int) -> Type[User] | None:
+    users = await session.scalars(select(User).filter(User.id == user_id).options(*USER_GET_OPTIONS))
+    return users.unique().first()
 
-def get_user_by_uuid(session: Session, user_uuid: UUID) -> Type[User] | None:
-    return session.query(User).filter(User.uuid == user_uuid).first()
 
+async def get_user_by_uuid(session: AsyncSession, user_uuid: UUID) -> Type[User] | None:
+    users = await session.scalars(select(User).filter(User.uuid == user_uuid).options(*USER_GET_OPTIONS))
+    return users.unique().first()
 
-def get_user_by_username(session: Session, user_profile_name: str) -> Type[User] | None:
-    return session.query(User).filter(User.profile_name == user_profile_name).first()
 
+async def get_cached_user_by_uuid(session: AsyncSession,
+                                  user_uuid: UUID,
+                                  if_none_match: Callable[[str], bool]) -> tuple[str, bytes | None] | None:
+    return await read_through(session, User, user_uuid, lambda: get_user_by_uuid(session, user_uuid), UserGetSchema,
+                              if_none_match)
 
-def get_user_by_username_and_password(session: Session,
-                                      user_profile_name: str,
-                                      user_password: str) -> Type[User] | None:
-    return session.query(User). \
-        filter(User.profile_name == user_profile_name
-               and User.password == user_password). \
-        first()
 
+async def get_user_by_username(session: AsyncSession, user_profile_name: str) -> Type[User] | None:
+    return await session.scalar(select(User).filter(User.profile_name == user_profile_name))
 
-def get_users_by_blog(session: Session, blog_uuid: UUID) -> list[Type[User]]:
-    return session.query(Blog).filter(Blog.uuid == blog_uuid).first().owners
 
+async def get_user_by_username_and_password(session: AsyncSession,
+                                            user_profile_name: str,
+                                            user_password: str) -> Type[User] | None:
+    users = await session.scalars(
+        select(User).
+        filter(User.profile_name == user_profile_name,
+               User.password == user_password).
+        options(*USER_GET_OPTIONS)
+    )
+    return users.unique().first()
 
-def get_blog_by_id(session: Session, blog_id: int) -> Type[Blog] | None:
-    return session.query(Blog).filter(Blog.id == blog_id).first()
 
+async def get_users_by_blog(session: AsyncSession, blog_uuid: UUID) -> list[Type[User]]:
+    users = await session.scalars(
+        select(User).
+        join(User.blogs).
+        filter(Blog.uuid == blog_uuid).
+        options(*USER_GET_OPTIONS)
+    )
+    return list(users)
 
-def get_blog_by_uuid(session: Session, blog_uuid: UUID) -> Type[Blog] | None:
-    return session.query(Blog).filter(Blog.uuid == blog_uuid).first()
 
+async def get_blog_by_id(session: AsyncSession, blog_id: int) -> Type[Blog] | None:
+    blogs = await session.scalars(
+        select(Blog).
+        filter(Blog.id == blog_id).
+        options(*BLOG_GET_OPTIONS)
+    )
+    return blogs.unique().first()
 
-def get_blog_by_title(session: Session, blog_title: str) -> Type[Blog] | None:
-    return session.query(Blog).filter(Blog.title == blog_title).first()
 
+async def get_blog_by_uuid(session: AsyncSession, blog_uuid: UUID) -> Type[Blog] | None:
+    blogs = await session.scalars(
+        select(Blog).
+        filter(Blog.uuid == blog_uuid).
+        options(*BLOG_GET_OPTIONS)
+    )
+    return blogs.unique().first()
 
-def get_post_by_id(session: Session, post_id: int) -> Type[Post] | None:
-    return session.query(Post).filter(Post.id == post_id).first()
 
+async def get_cached_blog_by_uuid(session: AsyncSession,
+                                  blog_uuid: UUID,
+                                  if_none_match: Callable[[str], bool]) -> tuple[str, bytes | None] | None:
+    return await read_through(session, Blog, blog_uuid, lambda: get_blog_by_uuid(session, blog_uuid), BlogGetSchema,
+                              if_none_match)
 
-def get_post_by_uuid(session: Session, post_uuid: UUID) -> Type[Post] | None:
-    return session.query(Post).filter(Post.uuid == post_uuid).first()
+
+async def get_blog_by_title(session: AsyncSession, blog_title: str) -> Type[Blog] | None:
+    blogs = await session.scalars(
+        select(Blog).
+        filter(Blog.title == blog_title).
+        options(*BLOG_GET_OPTIONS)
+    )
+    return blogs.unique().first()
+
+
+async def get_post_by_id(session: AsyncSession, post_id: int) -> Type[Post] | None:
+    return await session.scalar(select(Post).filter(Post.id == post_id))
+
+
+async def get_post_by_uuid(session: AsyncSession, post_uuid: UUID) -> Type[Post] | None:
+    return await session.scalar(select(Post).filter(Post.uuid == post_uuid))
+
+
+async def get_cached_post_by_uuid(session: AsyncSession,
+                                  post_uuid: UUID,
+                                  if_none_match: Callable[[str], bool]) -> tuple[str, bytes | None] | None:
+    return await read_through(session, Post, post_uuid, lambda: get_post_by_uuid(session, post_uuid), PostGetSchema,
+                              if_none_match)
 
 
 # Requires a relevant blog ID to be passed as the website allows for
 # posts with the same name to appear across multiple blogs
-def get_post_by_title(session: Session, post_title: str, blog_id: int) -> Type[Post] | None:
-    return session.query(Post).filter(Post.title == post_title and Post.blog.id == blog_id).first()
+async def get_post_by_title(session: AsyncSession, post_title: str, blog_id: int) -> Type[Post] | None:
+    return await session.scalar(select(Post).filter(Post.title == post_title, Post.blog_id == blog_id))
+
+
+async def get_comment_by_id(session: AsyncSession, comment_id: int) -> Type[Comment] | None:
+    return await session.scalar(select(Comment).filter(Comment.id == comment_id))
+
+
+async def get_comment_by_uuid(session: AsyncSession, comment_uuid: UUID) -> Type[Comment] | None:
+    return await session.scalar(select(Comment).filter(Comment.uuid == comment_uuid))
+
+
+async def get_cached_comment_by_uuid(session: AsyncSession,
+                                     comment_uuid: UUID,
+                                     if_none_match: Callable[[str], bool]) -> tuple[str, bytes | None] | None:
+    return await read_through(session, Comment, comment_uuid, lambda: get_comment_by_uuid(session, comment_uuid),
+                              CommentGetSchema, if_none_match)
+
+
+async def get_user_blogs_by_id(session: AsyncSession, user_id: int) -> list[Type[Blog]]:
+    blogs = await session.scalars(
+        select(Blog).
+        join(Blog.owners).
+        filter(User.id == user_id).
+        options(*BLOG_GET_OPTIONS)
+    )
+    return list(blogs)
+
+
+async def get_user_blogs_by_uuid(session: AsyncSession, user_uuid: UUID) -> list[Type[Blog]]:
+    blogs = await session.scalars(
+        select(Blog).
+        join(Blog.owners).
+        filter(User.uuid == user_uuid).
+        options(*BLOG_GET_OPTIONS)
+    )
+    return list(blogs)
+
+
+async def get_blog_posts_by_id(session: AsyncSession, blog_id: int) -> list[Type[Post]]:
+    posts = await session.scalars(select(Post).filter(Post.blog_id == blog_id))
+    return list(posts)
+
+
+async def get_blog_posts_etag(session: AsyncSession, blog_uuid: UUID, cursor: str | None, limit: int) -> str:
+    statement = select(Post.id, Post.version).join(Post.blog).filter(Blog.uuid == blog_uuid)
+    return await page_etag(session, statement, Post, cursor, limit)
+
+
+async def get_blog_posts_by_uuid(session: AsyncSession,
+                                 blog_uuid: UUID,
+                                 cursor: str | None,
+                                 limit: int) -> tuple[list[Type[Post]], str | None]:
+    return await paginate(session, select(Post).join(Post.blog).filter(Blog.uuid == blog_uuid), Post, cursor, limit)
+
+
+async def stream_blog_posts_by_uuid(session: AsyncSession, blog_uuid: UUID, cursor: str | None) -> AsyncScalarResult:
+    return await stream(session, select(Post).join(Post.blog).filter(Blog.uuid == blog_uuid), Post, cursor)
+
+
+async def get_post_comments_by_id(session: AsyncSession, post_id: int) -> list[Type[Comment]]:
+    comments = await session.scalars(select(Comment).filter(Comment.post_id == post_id))
+    return list(comments)
+
+
+async def get_post_comments_etag(session: AsyncSession, post_uuid: UUID, cursor: str | None, limit: int) -> str:
+    statement = select(Comment.id, Comment.version).join(Comment.post).filter(Post.uuid == post_uuid)
+    return await page_etag(session, statement, Comment, cursor, limit)
+
+
+async def get_post_comments_by_uuid(session: AsyncSession,
+                                    post_uuid: UUID,
+                                    cursor: str | None,
+                                    limit: int) -> tuple[list[Type[Comment]], str | None]:
+    statement = select(Comment).join(Comment.post).filter(Post.uuid == post_uuid)
+    return await paginate(session, statement, Comment, cursor, limit)
+
+
+async def stream_post_comments_by_uuid(session: AsyncSession,
+                                       post_uuid: UUID,
+                                       cursor: str | None) -> AsyncScalarResult:
+    statement = select(Comment).join(Comment.post).filter(Post.uuid == post_uuid)
+    return await stream(session, statement, Comment, cursor)
+
+
+async def get_user_comments_by_id(session: AsyncSession, user_id: int) -> list[Type[Comment]]:
+    comments = await session.scalars(select(Comment).filter(Comment.user_id == user_id))
+    return list(comments)
+
+
+async def get_user_comments_by_uuid(session: AsyncSession, user_uuid: UUID) -> list[Type[Comment]]:
+    comments = await session.scalars(select(Comment).join(Comment.user).filter(User.uuid == user_uuid))
+    return list(comments)
+
+
+async def get_user_id_by_uuid(session: AsyncSession, user_uuid: UUID) -> int | None:
+    return await session.scalar(select(User.id).filter(User.uuid == user_uuid))
+
+
+async def get_users_by_ids(session: AsyncSession, user_ids: list[int]) -> list[Type[User]]:
+    users = await session.scalars(select(User).filter(User.id.in_(user_ids)).options(*USER_GET_OPTIONS))
+    users_by_id = {user.id: user for user in users}
+    return [users_by_id[user_id] for user_id in user_ids if user_id in users_by_id]
+
+
+# The follow lists, counts and suggestions come from the follow graph index,
+# only the users of the page are loaded
+async def get_user_followers_by_uuid(session: AsyncSession,
+                                     user_uuid: UUID,
+                                     cursor: str | None,
+                                     limit: int) -> tuple[list[Type[User]], str | None] | None:
+    user_id = await get_user_id_by_uuid(session, user_uuid)
+
+    if user_id is None:
+        return None
+
+    follower_ids, last_id = follow_graph.followers_page(user_id, 0 if cursor is None else decode_id_cursor(cursor),
+                                                        limit)
+    return await get_users_by_ids(session, follower_ids), None if last_id is None else encode_id_cursor(last_id)
+
+
+async def get_user_follows_by_uuid(session: AsyncSession,
+                                   user_uuid: UUID,
+                                   cursor: str | None,
+                                   limit: int) -> tuple[list[Type[User]], str | None] | None:
+    user_id = await get_user_id_by_uuid(session, user_uuid)
+
+    if user_id is None:
+        return None
+
+    followed_ids, last_id = follow_graph.follows_page(user_id, 0 if cursor is None else decode_id_cursor(cursor),
+                                                      limit)
+    return await get_users_by_ids(session, followed_ids), None if last_id is None else encode_id_cursor(last_id)
+
+
+async def get_user_follower_count_by_uuid(session: AsyncSession, user_uuid: UUID) -> int | None:
+    user_id = await get_user_id_by_uuid(session, user_uuid)
+    return None if user_id is None else follow_graph.follower_count(user_id)
+
+
+async def get_user_follow_count_by_uuid(session: AsyncSession, user_uuid: UUID) -> int | None:
+    user_id = await get_user_id_by_uuid(session, user_uuid)
+    return None if user_id is None else follow_graph.follow_count(user_id)
+
+
+async def get_users_follow_each_other(session: AsyncSession, user_uuid: UUID, other_user_uuid: UUID) -> bool | None:
+    user_ids = dict((await session.execute(
+        select(User.uuid, User.id).
+        filter(User.uuid.in_([user_uuid, other_user_uuid]))
+    )).all())
+
+    if user_uuid not in user_ids or other_user_uuid not in user_ids:
+        return None
+
+    return follow_graph.follow_each_other(user_ids[user_uuid], user_ids[other_user_uuid])
+
+
+async def get_follow_suggestions(session: AsyncSession,
+                                 user_uuid: UUID,
+                                 amount_to_display: int) -> list[Type[User]] | None:
+    user_id = await get_user_id_by_uuid(session, user_uuid)
 
+    if user_id is None:
+        return None
 
-def get_comment_by_id(session: Session, comment_id: int) -> Type[Comment] | None:
-    return session.query(Comment).filter(Comment.id == comment_id).first()
+    return await get_users_by_ids(session, follow_graph.suggestions(user_id, amount_to_display))
 
 
-def get_comment_by_uuid(session: Session, comment_uuid: UUID) -> Type[Comment] | None:
-    return session.query(Comment).filter(Comment.uuid == comment_uuid).first()
+async def get_user_follow_by_id(session: AsyncSession, user_id: int, follower_id: int) -> Type[UserFollowing] | None:
+    return await session.get(UserFollowing, (user_id, follower_id))
 
 
-def get_user_blogs_by_id(session: Session, user_id: int) -> list[Type[Blog]]:
-    return session.query(User).filter(User.id == user_id).first().blogs
+async def get_all_users_etag(session: AsyncSession, cursor: str | None, limit: int) -> str:
+    return await page_etag(session, select(User.id, User.version), User, cursor, limit)
 
 
-def get_user_blogs_by_uuid(session: Session, user_uuid: UUID) -> list[Type[Blog]]:
-    return session.query(User).filter(User.uuid == user_uuid).first().blogs
+async def get_all_users(session: AsyncSession,
+                        cursor: str | None,
+                        limit: int) -> tuple[list[Type[User]], str | None]:
+    return await paginate(session, select(User).options(*USER_GET_OPTIONS), User, cursor, limit)
 
 
-def get_blog_posts_by_id(session: Session, blog_id: int) -> list[Type[Post]]:
-    return session.query(Blog).filter(Blog.id == blog_id).first().posts
+async def stream_all_users(session: AsyncSession, cursor: str | None) -> AsyncScalarResult:
+    return await stream(session, select(User).options(*USER_GET_OPTIONS), User, cursor)
 
 
-def get_blog_posts_by_uuid(session: Session, blog_uuid: UUID) -> list[Type[Post]]:
-    return session.query(Blog).filter(Blog.uuid == blog_uuid).first().posts
+async def get_all_blogs_etag(session: AsyncSession, cursor: str | None, limit: int) -> str:
+    return await page_etag(session, select(Blog.id, Blog.version), Blog, cursor, limit)
 
 
-def get_post_comments_by_id(session: Session, post_id: int) -> list[Type[Comment]]:
-    return session.query(Post).filter(Post.id == post_id).first().comments
+async def get_all_blogs(session: AsyncSession,
+                        cursor: str | None,
+                        limit: int) -> tuple[list[Type[Blog]], str | None]:
+    return await paginate(session, select(Blog).options(*BLOG_GET_OPTIONS), Blog, cursor, limit)
 
 
-def get_post_comments_by_uuid(session: Session, post_uuid: UUID) -> list[Type[Comment]]:
-    return session.query(Post).filter(Post.uuid == post_uuid).first().comments
+async def stream_all_blogs(session: AsyncSession, cursor: str | None) -> AsyncScalarResult:
+    return await stream(session, select(Blog).options(*BLOG_GET_OPTIONS), Blog, cursor)
 
 
-def get_user_comments_by_id(session: Session, user_id: int) -> list[Type[Comment]]:
-    return session.query(User).filter(User.id == user_id).first().comments
+# The ranking itself comes from the in-memory leaderboard, the database is only
+# asked for the selected blogs by primary key
+async def get_n_most_popular_blogs(session: AsyncSession, amount_to_display: int) -> list[Type[Blog]]:
+    popular_blog_ids = blog_leaderboard.top(amount_to_display)
+    blogs = await session.scalars(select(Blog).filter(Blog.id.in_(popular_blog_ids)).options(*BLOG_GET_OPTIONS))
+    blogs_by_id = {blog.id: blog for blog in blogs}
+    return [blogs_by_id[blog_id] for blog_id in popular_blog_ids if blog_id in blogs_by_id]
 
 
-def get_user_comments_by_uuid(session: Session, user_uuid: UUID) -> list[Type[Comment]]:
-    return session.query(User).filter(User.id == user_uuid).first().comments
+async def get_trending_blogs(session: AsyncSession,
+                             window: TrendingWindow,
+                             amount_to_display: int) -> list[Type[Blog]]:
+    trending_blog_ids = blog_trending.top(window, amount_to_display)
+    blogs = await session.scalars(select(Blog).filter(Blog.id.in_(trending_blog_ids)).options(*BLOG_GET_OPTIONS))
+    blogs_by_id = {blog.id: blog for blog in blogs}
+    return [blogs_by_id[blog_id] for blog_id in trending_blog_ids if blog_id in blogs_by_id]
 
 
-def get_user_followers_by_uuid(session: Session, user_uuid: UUID) -> list[Type[User]]:
-    follower_associations = session.query(User).filter(User.uuid == user_uuid).first().follower_associations
-    return [follower_association.follower for follower_association in follower_associations]
+async def get_trending_posts(session: AsyncSession,
+                             window: TrendingWindow,
+                             amount_to_display: int) -> list[Type[Post]]:
+    trending_post_ids = post_trending.top(window, amount_to_display)
+    posts = await session.scalars(select(Post).filter(Post.id.in_(trending_post_ids)))
+    posts_by_id = {post.id: post for post in posts}
+    return [posts_by_id[post_id] for post_id in trending_post_ids if post_id in posts_by_id]
 
 
-def get_user_follows_by_uuid(session: Session, user_uuid: UUID) -> list[Type[User]]:
-    follow_associations = session.query(User).filter(User.uuid == user_uuid).first().follow_associations
-    return [follow_association.user for follow_association in follow_associations]
+async def get_all_posts_etag(session: AsyncSession, cursor: str | None, limit: int) -> str:
+    return await page_etag(session, select(Post.id, Post.version), Post, cursor, limit)
 
 
-def get_all_users(session: Session) -> list[Type[User]]:
-    return session.query(User).all()
+async def get_all_posts(session: AsyncSession,
+                        cursor: str | None,
+                        limit: int) -> tuple[list[Type[Post]], str | None]:
+    return await paginate(session, select(Post), Post, cursor, limit)
 
 
-def get_all_blogs(session: Session) -> list[Type[Blog]]:
-    return session.query(Blog).all()
+async def stream_all_posts(session: AsyncSession, cursor: str | None) -> AsyncScalarResult:
+    return await stream(session, select(Post), Post, cursor)
 
 
-# Tried to adapt it using the blog_like_associations field in Blog, but doing so
-# resulted in errors that I couldn't solve, so until I figure it out it will have
-# to stay this way
-# TODO: Fix get_n_most_popular_blogs to use blog_like_associations
-def get_n_most_popular_blogs(session: Session, amount_to_display: int) -> list[Type[Blog]]:
-    return session.query(Blog). \
-        outerjoin(BlogLike, BlogLike.blog_id == Blog.id). \
-        order_by(desc(func.count(BlogLike.user_id))). \
-        group_by(Blog.id). \
-        limit(amount_to_display).all()
+async def get_all_comments_etag(session: AsyncSession, cursor: str | None, limit: int) -> str:
+    return await page_etag(session, select(Comment.id, Comment.version), Comment, cursor, limit)
 
 
-def get_all_posts(session: Session) -> list[Type[Post]]:
-    return session.query(Post).all()
+async def get_all_comments(session: AsyncSession,
+                           cursor: str | None,
+                           limit: int) -> tuple[list[Type[Comment]], str | None]:
+    return await paginate(session, select(Comment), Comment, cursor, limit)
 
 
-def get_all_comments(session: Session) -> list[Type[Comment]]:
-    return session.query(Comment).all()
+async def stream_all_comments(session: AsyncSession, cursor: str | None) -> AsyncScalarResult:
+    return await stream(session, select(Comment), Comment, cursor)
 
 
-def get_blog_like_by_id(session: Session, user_id: int, blog_id: int) -> Type[BlogLike] | None:
-    return session.query(BlogLike).filter(BlogLike.user_id == user_id and BlogLike.blog_id == blog_id).first()
+async def get_blog_like_by_id(session: AsyncSession, user_id: int, blog_id: int) -> Type[BlogLike] | None:
+    return await session.get(BlogLike, (user_id, blog_id))
 
 
-def get_blog_like_count_by_uuid(session: Session, blog_uuid: UUID) -> int | None:
-    return session.query(Blog).filter(Blog.uuid == blog_uuid).first().blog_like_associations.len()
+async def get_blog_like_count_by_uuid(session: AsyncSession, blog_uuid: UUID) -> int | None:
+    return await session.scalar(select(Blog.like_count).filter(Blog.uuid == blog_uuid))
 
 
-def get_blog_save_by_id(session: Session, user_id: int, blog_id: int) -> Type[BlogSave] | None:
-    return session.query(BlogSave).filter(BlogSave.user_id == user_id and BlogSave.blog_id == blog_id).first()
+async def get_blog_save_by_id(session: AsyncSession, user_id: int, blog_id: int) -> Type[BlogSave] | None:
+    return await session.get(BlogSave, (user_id, blog_id))
 
 
-def get_blog_save_count_by_uuid(session: Session, blog_uuid: UUID) -> int | None:
-    return session.query(Blog).filter(Blog.uuid == blog_uuid).first().blog_save_associations.len()
+async def get_blog_save_count_by_uuid(session: AsyncSession, blog_uuid: UUID) -> int | None:
+    return await session.scalar(select(Blog.save_count).filter(Blog.uuid == blog_uuid))
 
 
-def get_post_like_by_id(session: Session, user_id: int, post_id: int) -> Type[PostLike] | None:
-    return session.query(PostLike).filter(PostLike.user_id == user_id and PostLike.post_id == post_id).first()
+async def get_post_like_by_id(session: AsyncSession, user_id: int, post_id: int) -> Type[PostLike] | None:
+    return await session.get(PostLike, (user_id, post_id))
 
 
-def get_post_like_count_by_uuid(session: Session, post_uuid: UUID) -> int | None:
-    return session.query(Post).filter(Post.uuid == post_uuid).first().post_like_associations.len()
+async def get_post_like_count_by_uuid(session: AsyncSession, post_uuid: UUID) -> int | None:
+    return await session.scalar(select(Post.like_count).filter(Post.uuid == post_uuid))
 
 
-def get_post_save_by_id(session: Session, user_id: int, post_id: int) -> Type[PostSave] | None:
-    return session.query(PostSave).filter(PostSave.user_id == user_id and PostSave.post_id == post_id).first()
+async def get_post_save_by_id(session: AsyncSession, user_id: int, post_id: int) -> Type[PostSave] | None:
+    return await session.get(PostSave, (user_id, post_id))
 
 
-def get_post_save_count_by_uuid(session: Session, post_uuid: UUID) -> int | None:
-    return session.query(Post).filter(Post.uuid == post_uuid).first().post_save_associations.len()
+async def get_post_save_count_by_uuid(session: AsyncSession, post_uuid: UUID) -> int | None:
+    return await session.scalar(select(Post.save_count).filter(Post.uuid == post_uuid))
 
 
-def get_comment_like_by_id(session: Session, user_id: int, comment_id: int) -> Type[CommentLike] | None:
-    return session.query(CommentLike). \
-        filter(CommentLike.user_id == user_id
-               and CommentLike.comment_id == comment_id). \
-        first()
+async def get_comment_like_by_id(session: AsyncSession, user_id: int, comment_id: int) -> Type[CommentLike] | None:
+    return await session.get(CommentLike, (user_id, comment_id))
 
 
-def get_comment_like_count_by_uuid(session: Session, comment_uuid: UUID) -> int | None:
-    return session.query(Comment).filter(Comment.uuid == comment_uuid).first().comment_like_associations.len()
+async def get_comment_like_count_by_uuid(session: AsyncSession, comment_uuid: UUID) -> int | None:
+    return await session.scalar(select(Comment.like_count).filter(Comment.uuid == comment_uuid))
 
 
-def get_comment_save_by_id(session: Session, user_id: int, comment_id: int) -> Type[CommentSave] | None:
-    return session.query(CommentSave). \
-        filter(CommentSave.user_id == user_id
-               and CommentSave.comment_id == comment_id). \
-        first()
+async def get_comment_save_by_id(session: AsyncSession, user_id: int, comment_id: int) -> Type[CommentSave] | None:
+    return await session.get(CommentSave, (user_id, comment_id))
 
 
-def get_comment_save_count_by_uuid(session: Session, comment_uuid: UUID) -> int | None:
-    return session.query(Comment).filter(Comment.uuid == comment_uuid).first().comment_save_associations.len()
+async def get_comment_save_count_by_uuid(session: AsyncSession, comment_uuid: UUID) -> int | None:
+    return await session.scalar(select(Comment.save_count).filter(Comment.uuid == comment_uuid))
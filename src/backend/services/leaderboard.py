@@ -0,0 +1,47 @@
+from bisect import bisect_left, insort
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.backend.models.models import Blog
+
+
+# In-process ranking of blogs by like count. Blogs are kept in a list sorted by
+# (-like_count, id), so reading the top N is a slice and a like or unlike only
+# moves one entry. It is filled once at startup from the like_count column and
+# afterwards only changed by the create/delete services, after they commit.
+# Each worker process keeps its own copy.
+class BlogLeaderboard:
+    def __init__(self):
+        self.like_counts: dict[int, int] = {}
+        self.ranking: list[tuple[int, int]] = []
+
+    async def load(self, session: AsyncSession) -> None:
+        rows = await session.execute(select(Blog.id, Blog.like_count))
+        self.like_counts = {blog_id: like_count for blog_id, like_count in rows}
+        self.ranking = sorted((-like_count, blog_id) for blog_id, like_count in self.like_counts.items())
+
+    def add(self, blog_id: int, like_count: int = 0) -> None:
+        if blog_id in self.like_counts:
+            return
+        self.like_counts[blog_id] = like_count
+        insort(self.ranking, (-like_count, blog_id))
+
+    def remove(self, blog_id: int) -> None:
+        like_count = self.like_counts.pop(blog_id, None)
+        if like_count is None:
+            return
+        del self.ranking[bisect_left(self.ranking, (-like_count, blog_id))]
+
+    def change(self, blog_id: int, amount: int) -> None:
+        if blog_id not in self.like_counts:
+            return
+        like_count = self.like_counts[blog_id]
+        self.remove(blog_id)
+        self.add(blog_id, max(like_count + amount, 0))
+
+    def top(self, amount: int) -> list[int]:
+        return [blog_id for _, blog_id in self.ranking[:max(amount, 0)]]
+
+
+blog_leaderboard = BlogLeaderboard()
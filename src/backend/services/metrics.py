@@ -0,0 +1,200 @@
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Statements running longer than this are logged with their duration,
+# 0 turns the log off
+SLOW_QUERY_SECONDS = float(os.getenv("BLOG_SLOW_QUERY_SECONDS", "0.25"))
+SLOW_QUERY_MAX_LENGTH = 1000
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 1000)
+# Requests that did not match any route share one label, so scanners probing
+# random paths cannot blow up the number of series
+UNMATCHED_ROUTE = "unmatched"
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def cumulative_counts(self) -> list[tuple[str, int]]:
+        bounds = [format_value(bound) for bound in self.buckets] + ["+Inf"]
+        total = 0
+        cumulative = []
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+
+# SQL statements and the time spent running them within one request
+class RequestStatistics:
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+
+current_request: ContextVar[RequestStatistics | None] = ContextVar("current_request", default=None)
+
+
+# Aggregates of every request and SQL statement since the process started,
+# rendered in the Prometheus text format. Like the caches, every worker
+# process has its own, Prometheus adds them up when it scrapes each worker.
+class Metrics:
+    def __init__(self):
+        self.requests: dict[tuple[str, str, int], int] = defaultdict(int)
+        self.request_seconds: dict[tuple[str, str], Histogram] = {}
+        self.request_statements: dict[tuple[str, str], Histogram] = {}
+        self.request_sql_seconds: dict[tuple[str, str], Histogram] = {}
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.slow_statements = 0
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float,
+                        statistics: RequestStatistics) -> None:
+        key = (method, route)
+        self.requests[(method, route, status)] += 1
+        self.request_seconds.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+        self.request_statements.setdefault(key, Histogram(STATEMENT_BUCKETS)).observe(statistics.statements)
+        self.request_sql_seconds.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(statistics.sql_seconds)
+
+    def observe_statement(self, seconds: float) -> None:
+        self.statements += 1
+        self.sql_seconds += seconds
+
+        statistics = current_request.get()
+        if statistics is not None:
+            statistics.statements += 1
+            statistics.sql_seconds += seconds
+
+    def render(self) -> str:
+        lines = []
+
+        add_metric(lines, "blog_http_requests_total", "counter", "HTTP requests by route and status code.")
+        for (method, route, status), count in sorted(self.requests.items()):
+            lines.append(sample("blog_http_requests_total", {"method": method, "route": route, "status": status},
+                                count))
+
+        add_histograms(lines, "blog_http_request_duration_seconds", "Time to serve a request.",
+                       self.request_seconds)
+        add_histograms(lines, "blog_http_request_sql_statements", "SQL statements run while serving a request.",
+                       self.request_statements)
+        add_histograms(lines, "blog_http_request_sql_duration_seconds",
+                       "Time spent running SQL statements while serving a request.", self.request_sql_seconds)
+
+        add_metric(lines, "blog_sql_statements_total", "counter", "SQL statements run, including outside requests.")
+        lines.append(sample("blog_sql_statements_total", {}, self.statements))
+        add_metric(lines, "blog_sql_duration_seconds_total", "counter", "Time spent running SQL statements.")
+        lines.append(sample("blog_sql_duration_seconds_total", {}, self.sql_seconds))
+        add_metric(lines, "blog_sql_slow_statements_total", "counter",
+                   "SQL statements slower than the slow query threshold.")
+        lines.append(sample("blog_sql_slow_statements_total", {}, self.slow_statements))
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def sample(name: str, labels: dict, value: float) -> str:
+    if not labels:
+        return f"{name} {format_value(value)}"
+    label_text = ",".join(f'{key}="{escape_label(label)}"' for key, label in labels.items())
+    return f"{name}{{{label_text}}} {format_value(value)}"
+
+
+def add_metric(lines: list[str], name: str, metric_type: str, description: str) -> None:
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {metric_type}")
+
+
+def add_histograms(lines: list[str], name: str, description: str,
+                   histograms: dict[tuple[str, str], Histogram]) -> None:
+    add_metric(lines, name, "histogram", description)
+
+    for (method, route), histogram in sorted(histograms.items()):
+        labels = {"method": method, "route": route}
+        for bound, count in histogram.cumulative_counts():
+            lines.append(sample(f"{name}_bucket", {**labels, "le": bound}, count))
+        lines.append(sample(f"{name}_sum", labels, histogram.sum))
+        lines.append(sample(f"{name}_count", labels, sum(histogram.counts)))
+
+
+# Pure ASGI middleware, so the measured time covers the whole response body,
+# including streamed list pages, and not only the time to the headers. Routes
+# are labelled by their path template, /api/getUser/{user_uuid}, not the path.
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        statistics = RequestStatistics()
+        token = current_request.set(statistics)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request.reset(token)
+            route = scope.get("route")
+            metrics.observe_request(scope["method"], route.path if route is not None else UNMATCHED_ROUTE, status,
+                                    time.perf_counter() - started, statistics)
+
+
+# Statements are timed around the cursor call, so only the time spent in the
+# database driver is counted, not building the statement or loading objects
+@event.listens_for(Engine, "before_cursor_execute")
+def start_statement_timer(connection, cursor, statement, parameters, context, executemany) -> None:
+    connection.info.setdefault("statement_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def record_statement(connection, cursor, statement, parameters, context, executemany) -> None:
+    seconds = time.perf_counter() - connection.info["statement_started"].pop()
+    metrics.observe_statement(seconds)
+
+    if 0 < SLOW_QUERY_SECONDS <= seconds:
+        metrics.slow_statements += 1
+        logger.warning("Slow query (%.3fs%s): %s", seconds, ", executemany" if executemany else "",
+                       statement[:SLOW_QUERY_MAX_LENGTH])
+
+
+@event.listens_for(Engine, "handle_error")
+def discard_statement_timer(exception_context) -> None:
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("statement_started"):
+        connection.info["statement_started"].pop()
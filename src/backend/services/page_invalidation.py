@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import os
+from typing import Iterable
+from uuid import UUID
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.backend.models.models import User, Blog, Post
+
+# Endpoint of the frontend page cache, for example
+# http://127.0.0.1:8080/blog/invalidate-pages, and the secret it expects.
+# Without both, pages rendered by the frontend expire by their TTL alone.
+FRONTEND_INVALIDATE_URL = os.getenv("BLOG_FRONTEND_INVALIDATE_URL", "")
+FRONTEND_INVALIDATE_SECRET = os.getenv("BLOG_FRONTEND_INVALIDATE_SECRET", "")
+FRONTEND_INVALIDATE_HEADER = "X-Invalidate-Secret"
+PAGE_INVALIDATION = bool(FRONTEND_INVALIDATE_URL and FRONTEND_INVALIDATE_SECRET)
+
+# Frontend pages showing an entity, by the route they are cached under, with
+# the uuid of the entity as their only path param. The home page lists the
+# most popular blogs, so every change to a blog drops all of its variants.
+PAGE_ROUTES = {
+    User: ("user-page",),
+    Blog: ("blog-page",),
+    Post: ("post-comments",),
+}
+HOME_PAGE_MODELS = {Blog}
+
+logger = logging.getLogger(__name__)
+
+client = httpx.AsyncClient(timeout=httpx.Timeout(2.0, connect=1.0))
+pending_notifications: set[asyncio.Task] = set()
+
+
+# Like the entity cache, pages are only dropped once the transaction commits.
+# Like and save counters are left to the TTL, a like would otherwise drop the
+# page of its target for every visitor.
+def invalidate_pages_on_commit(session: AsyncSession, model: type, entity_uuids: Iterable[UUID]) -> None:
+    if not PAGE_INVALIDATION:
+        return
+
+    pages = session.sync_session.info.setdefault("page_invalidations", set())
+    for entity_uuid in entity_uuids:
+        pages.update((route, str(entity_uuid)) for route in PAGE_ROUTES.get(model, ()))
+        if model in HOME_PAGE_MODELS:
+            pages.add(("home", None))
+
+
+# Commits run on the event loop, which sends the notifications in the
+# background, so a slow or stopped frontend never holds up a write
+@event.listens_for(Session, "after_commit")
+def send_page_invalidations(session: Session) -> None:
+    pages = session.info.pop("page_invalidations", None)
+    if pages:
+        task = asyncio.get_running_loop().create_task(notify_frontend(pages))
+        pending_notifications.add(task)
+        task.add_done_callback(pending_notifications.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_page_invalidations(session: Session) -> None:
+    session.info.pop("page_invalidations", None)
+
+
+async def notify_frontend(pages: set[tuple[str, str | None]]) -> None:
+    responses = await asyncio.gather(*(
+        client.post(FRONTEND_INVALIDATE_URL, headers={FRONTEND_INVALIDATE_HEADER: FRONTEND_INVALIDATE_SECRET},
+                    params={"route": route} if param is None else {"route": route, "param": param})
+        for route, param in pages
+    ), return_exceptions=True)
+
+    for response in responses:
+        if isinstance(response, Exception) or response.status_code != 204:
+            logger.warning("Could not invalidate frontend pages: %s", response)
+
+
+async def close() -> None:
+    if pending_notifications:
+        await asyncio.wait(pending_notifications)
+    await client.aclose()
@@ -0,0 +1,78 @@
+import base64
+import binascii
+import hashlib
+from datetime import datetime
+from typing import Any
+
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncScalarResult
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+STREAM_BATCH_SIZE = 500
+
+
+# Cursors are opaque to clients, they encode the (created_at, id) pair of the
+# last row of a page, which is also the sort key of every list endpoint
+def encode_cursor(model: Any) -> str:
+    raw_cursor = f"{model.created_at.isoformat()}|{model.id}"
+    return base64.urlsafe_b64encode(raw_cursor.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, model_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(model_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+# Lists served from the follow graph are ordered by user id alone
+def encode_id_cursor(model_id: int) -> str:
+    return base64.urlsafe_b64encode(str(model_id).encode()).decode()
+
+
+def decode_id_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def keyset(statement: Select, model: Any, cursor: str | None) -> Select:
+    statement = statement.order_by(model.created_at, model.id)
+
+    if cursor is not None:
+        statement = statement.filter(tuple_(model.created_at, model.id) > decode_cursor(cursor))
+
+    return statement
+
+
+# One row past the page is fetched, so the next cursor is only handed out
+# when there actually is a next page
+async def paginate(session: AsyncSession,
+                   statement: Select,
+                   model: Any,
+                   cursor: str | None,
+                   limit: int) -> tuple[list, str | None]:
+    rows = list(await session.scalars(keyset(statement, model, cursor).limit(limit + 1)))
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1])
+
+
+# ETag of a page, computed from the (id, version) pairs of its rows alone, so
+# an unchanged page is recognized without loading or serializing the rows.
+# The statement selects just those two columns of the model.
+async def page_etag(session: AsyncSession, statement: Select, model: Any, cursor: str | None, limit: int) -> str:
+    rows = (await session.execute(keyset(statement, model, cursor).limit(limit + 1))).all()
+    return '"' + hashlib.blake2b(repr(rows).encode(), digest_size=16).hexdigest() + '"'
+
+
+async def stream(session: AsyncSession, statement: Select, model: Any, cursor: str | None) -> AsyncScalarResult:
+    statement = keyset(statement, model, cursor).execution_options(yield_per=STREAM_BATCH_SIZE)
+    return await session.stream_scalars(statement)
@@ -0,0 +1,97 @@
+import base64
+import binascii
+
+from fastapi import HTTPException
+from sqlalchemy import Subquery, func, literal_column, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.backend.models.models import Post, Comment
+from src.backend.models.search import post_search, comment_search
+from src.backend.schemas.get_schemas import PostGetSchema, CommentGetSchema, PostSearchSchema, \
+    CommentSearchSchema
+
+# Matches in a title count as much as several in a body
+POST_TITLE_WEIGHT = 5.0
+POST_BODY_WEIGHT = 1.0
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+SNIPPET_ELLIPSIS = "..."
+SNIPPET_TOKENS = 16
+
+
+# Every word of the query is quoted, so user input is always a valid FTS5
+# query matching rows that contain all of the words, never a syntax error.
+# A query of whitespace alone has no words, and an empty MATCH is one.
+def match_expression(query: str) -> str:
+    words = query.split()
+
+    if not words:
+        raise HTTPException(status_code=400, detail="Search query has no words")
+
+    return " ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+
+# Search results are sorted by bm25 score, lower is better, and then by id,
+# so the cursor holds the (score, id) pair of the last row of a page
+def encode_search_cursor(score: float, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{score!r}|{row_id}".encode()).decode()
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        score, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return float(score), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def ranked_matches(search_table, query: str, *bm25_weights: float) -> Subquery:
+    search_column = literal_column(search_table.name)
+    return select(search_table.c.rowid.label("id"),
+                  func.bm25(search_column, *bm25_weights).label("score"),
+                  func.snippet(search_column, -1, SNIPPET_START, SNIPPET_END, SNIPPET_ELLIPSIS,
+                               SNIPPET_TOKENS).label("snippet")). \
+        select_from(search_table). \
+        filter(search_column.op("MATCH")(match_expression(query))). \
+        subquery()
+
+
+async def search(session: AsyncSession,
+                 model,
+                 ranked: Subquery,
+                 cursor: str | None,
+                 limit: int) -> tuple[list[tuple], str | None]:
+    statement = select(model, ranked.c.snippet, ranked.c.score). \
+        join(ranked, ranked.c.id == model.id). \
+        order_by(ranked.c.score, model.id)
+
+    if cursor is not None:
+        statement = statement.filter(tuple_(ranked.c.score, model.id) > decode_search_cursor(cursor))
+
+    rows = (await session.execute(statement.limit(limit + 1))).all()
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_search_cursor(rows[-1].score, rows[-1][0].id)
+
+
+async def search_posts(session: AsyncSession,
+                       query: str,
+                       cursor: str | None,
+                       limit: int) -> tuple[list[PostSearchSchema], str | None]:
+    ranked = ranked_matches(post_search, query, POST_TITLE_WEIGHT, POST_BODY_WEIGHT)
+    rows, next_cursor = await search(session, Post, ranked, cursor, limit)
+    return [PostSearchSchema(**PostGetSchema.from_orm(post).dict(), snippet=snippet)
+            for post, snippet, _ in rows], next_cursor
+
+
+async def search_comments(session: AsyncSession,
+                          query: str,
+                          cursor: str | None,
+                          limit: int) -> tuple[list[CommentSearchSchema], str | None]:
+    ranked = ranked_matches(comment_search, query)
+    rows, next_cursor = await search(session, Comment, ranked, cursor, limit)
+    return [CommentSearchSchema(**CommentGetSchema.from_orm(comment).dict(), snippet=snippet)
+            for comment, snippet, _ in rows], next_cursor
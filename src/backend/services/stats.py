@@ -0,0 +1,114 @@
+from uuid import UUID
+
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.backend.models.models import User, Blog, Post, Comment, UserBlog, BlogLike, PostLike, CommentLike, BlogSave, \
+    PostSave, CommentSave
+from src.backend.schemas.get_schemas import BlogStatsSchema, UserStatsSchema
+from src.backend.services.follow_graph import follow_graph
+
+
+# Like and save totals are sums of the counter columns kept by
+# services/counters.py, so no like or save rows are read. Each aggregate is
+# one range scan of an index on blog_id or post_id, and the number of queries
+# does not depend on the size of the blog.
+async def get_blog_stats_by_uuid(session: AsyncSession, blog_uuid: UUID) -> BlogStatsSchema | None:
+    blog = (await session.execute(
+        select(Blog.id, Blog.like_count, Blog.save_count, Blog.created_at,
+               select(func.count()).filter(UserBlog.blog_id == Blog.id).scalar_subquery()).
+        filter(Blog.uuid == blog_uuid)
+    )).first()
+
+    if blog is None:
+        return None
+
+    blog_id, like_count, save_count, created_at, owner_count = blog
+
+    post_count, post_like_count, post_save_count, last_post_at = (await session.execute(
+        select(func.count(), func.coalesce(func.sum(Post.like_count), 0), func.coalesce(func.sum(Post.save_count), 0),
+               func.max(Post.created_at)).
+        filter(Post.blog_id == blog_id)
+    )).one()
+
+    comment_count, comment_like_count, comment_save_count, last_comment_at = (await session.execute(
+        select(func.count(), func.coalesce(func.sum(Comment.like_count), 0),
+               func.coalesce(func.sum(Comment.save_count), 0), func.max(Comment.created_at)).
+        join(Post, Post.id == Comment.post_id).
+        filter(Post.blog_id == blog_id)
+    )).one()
+
+    return BlogStatsSchema(
+        blog_id=blog_id,
+        owner_count=owner_count,
+        post_count=post_count,
+        comment_count=comment_count,
+        like_count=like_count,
+        save_count=save_count,
+        post_like_count=post_like_count,
+        post_save_count=post_save_count,
+        comment_like_count=comment_like_count,
+        comment_save_count=comment_save_count,
+        last_activity_at=max(moment for moment in (created_at, last_post_at, last_comment_at) if moment is not None),
+    )
+
+
+# Likes and saves given by the user are counted in one query over the six
+# like and save tables, each read through its primary key, which starts with
+# the user id. Follower counts come from the follow graph index.
+async def get_user_stats_by_uuid(session: AsyncSession, user_uuid: UUID) -> UserStatsSchema | None:
+    user = (await session.execute(
+        select(User.id, User.created_at,
+               select(func.count()).filter(UserBlog.user_id == User.id).scalar_subquery()).
+        filter(User.uuid == user_uuid)
+    )).first()
+
+    if user is None:
+        return None
+
+    user_id, created_at, blog_count = user
+
+    post_count, post_like_count, post_save_count, last_post_at = (await session.execute(
+        select(func.count(), func.coalesce(func.sum(Post.like_count), 0), func.coalesce(func.sum(Post.save_count), 0),
+               func.max(Post.created_at)).
+        filter(Post.user_id == user_id)
+    )).one()
+
+    comment_count, comment_like_count, comment_save_count, last_comment_at = (await session.execute(
+        select(func.count(), func.coalesce(func.sum(Comment.like_count), 0),
+               func.coalesce(func.sum(Comment.save_count), 0), func.max(Comment.created_at)).
+        filter(Comment.user_id == user_id)
+    )).one()
+
+    given = union_all(
+        *(select(literal(kind).label("kind"), moment.label("moment")).filter(user_column == user_id)
+          for kind, user_column, moment in (("like", BlogLike.user_id, BlogLike.liked_at),
+                                            ("like", PostLike.user_id, PostLike.liked_at),
+                                            ("like", CommentLike.user_id, CommentLike.liked_at),
+                                            ("save", BlogSave.user_id, BlogSave.saved_at),
+                                            ("save", PostSave.user_id, PostSave.saved_at),
+                                            ("save", CommentSave.user_id, CommentSave.saved_at)))
+    ).subquery()
+    given_counts = {kind: (count, last_at) for kind, count, last_at in await session.execute(
+        select(given.c.kind, func.count(), func.max(given.c.moment)).
+        group_by(given.c.kind)
+    )}
+    likes_given, last_like_at = given_counts.get("like", (0, None))
+    saves_given, last_save_at = given_counts.get("save", (0, None))
+
+    return UserStatsSchema(
+        user_id=user_id,
+        blog_count=blog_count,
+        post_count=post_count,
+        comment_count=comment_count,
+        post_like_count=post_like_count,
+        post_save_count=post_save_count,
+        comment_like_count=comment_like_count,
+        comment_save_count=comment_save_count,
+        likes_given=likes_given,
+        saves_given=saves_given,
+        follower_count=follow_graph.follower_count(user_id),
+        follow_count=follow_graph.follow_count(user_id),
+        last_activity_at=max(moment for moment in (created_at, last_post_at, last_comment_at, last_like_at,
+                                                   last_save_at) if moment is not None),
+    )
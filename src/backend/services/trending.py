@@ -0,0 +1,122 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from enum import Enum
+from heapq import nlargest
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.backend.models.models import BlogLike, PostLike, Comment, Post
+
+BUCKET_SECONDS = 300
+LIKE_SCORE = 1
+COMMENT_SCORE = 2
+
+
+class TrendingWindow(str, Enum):
+    hour = "hour"
+    day = "day"
+    week = "week"
+
+
+WINDOW_LENGTHS = {
+    TrendingWindow.hour: timedelta(hours=1),
+    TrendingWindow.day: timedelta(days=1),
+    TrendingWindow.week: timedelta(weeks=1),
+}
+
+WINDOW_BUCKETS = {window: int(length.total_seconds()) // BUCKET_SECONDS for window, length in WINDOW_LENGTHS.items()}
+KEPT_BUCKETS = max(WINDOW_BUCKETS.values())
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+# Timestamps are stored as naive UTC, so they are measured from a naive epoch
+def bucket_of(moment: datetime) -> int:
+    return int((moment - EPOCH).total_seconds()) // BUCKET_SECONDS
+
+
+# Activity scores of one kind of entity over the sliding windows. Events are
+# summed into fixed-width time buckets and every window keeps a running total
+# of the buckets it covers, so when time moves on only the buckets leaving a
+# window are subtracted and ranking never rescans the like/comment tables.
+# Like the leaderboard, every worker process keeps its own copy.
+class TrendingRanking:
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self.buckets: dict[int, Counter] = {}
+        self.window_scores: dict[TrendingWindow, Counter] = {window: Counter() for window in TrendingWindow}
+        self.current_bucket = bucket_of(datetime.utcnow())
+
+    def advance(self, now: datetime) -> None:
+        now_bucket = bucket_of(now)
+
+        if now_bucket <= self.current_bucket:
+            return
+
+        for window, bucket_count in WINDOW_BUCKETS.items():
+            last_expired = min(now_bucket, self.current_bucket + bucket_count) - bucket_count
+            for bucket in range(self.current_bucket - bucket_count + 1, last_expired + 1):
+                if bucket in self.buckets:
+                    self.window_scores[window].subtract(self.buckets[bucket])
+            self.window_scores[window] = +self.window_scores[window]
+
+        for bucket in [bucket for bucket in self.buckets if bucket <= now_bucket - KEPT_BUCKETS]:
+            del self.buckets[bucket]
+
+        self.current_bucket = now_bucket
+
+    def record(self, entity_id: int, happened_at: datetime, score: int) -> None:
+        self.advance(datetime.utcnow())
+        bucket = bucket_of(happened_at)
+
+        if bucket <= self.current_bucket - KEPT_BUCKETS:
+            return
+
+        self.buckets.setdefault(bucket, Counter())[entity_id] += score
+
+        for window, bucket_count in WINDOW_BUCKETS.items():
+            if bucket > self.current_bucket - bucket_count:
+                self.window_scores[window][entity_id] += score
+                if self.window_scores[window][entity_id] <= 0:
+                    del self.window_scores[window][entity_id]
+
+    def forget(self, entity_id: int) -> None:
+        for bucket_scores in self.buckets.values():
+            bucket_scores.pop(entity_id, None)
+        for scores in self.window_scores.values():
+            scores.pop(entity_id, None)
+
+    def top(self, window: TrendingWindow, amount: int) -> list[int]:
+        self.advance(datetime.utcnow())
+        scores = self.window_scores[window]
+        return [entity_id for entity_id, _ in nlargest(max(amount, 0), scores.items(), key=lambda item: item[1])]
+
+
+blog_trending = TrendingRanking()
+post_trending = TrendingRanking()
+
+
+# Fills both rankings with the activity of the longest window at startup
+async def load_trending(session: AsyncSession) -> None:
+    since = datetime.utcnow() - WINDOW_LENGTHS[TrendingWindow.week]
+    blog_trending.clear()
+    post_trending.clear()
+
+    for blog_id, liked_at in await session.execute(
+            select(BlogLike.blog_id, BlogLike.liked_at).filter(BlogLike.liked_at >= since)):
+        blog_trending.record(blog_id, liked_at, LIKE_SCORE)
+
+    for post_id, liked_at in await session.execute(
+            select(PostLike.post_id, PostLike.liked_at).filter(PostLike.liked_at >= since)):
+        post_trending.record(post_id, liked_at, LIKE_SCORE)
+
+    for post_id, blog_id, created_at in await session.execute(
+            select(Comment.post_id, Post.blog_id, Comment.created_at).
+            join(Comment.post).
+            filter(Comment.created_at >= since)):
+        post_trending.record(post_id, created_at, COMMENT_SCORE)
+        blog_trending.record(blog_id, created_at, COMMENT_SCORE)
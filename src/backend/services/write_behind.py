@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import os
+from collections import Counter
+from itertools import islice
+from typing import Any, Callable
+
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import InstrumentedAttribute
+
+from src.backend.database import SessionLocal
+from src.backend.models.models import User, Blog, Post, Comment, BlogLike, PostLike, CommentLike, BlogSave, PostSave, \
+    CommentSave
+from src.backend.services.counters import change_counters
+from src.backend.services.leaderboard import blog_leaderboard
+from src.backend.services.trending import blog_trending, post_trending, LIKE_SCORE
+
+# With write-behind on, likes, saves and their removals are answered right
+# away and written to the database later, in batches of up to
+# WRITE_BEHIND_BATCH_SIZE, at least every WRITE_BEHIND_INTERVAL_SECONDS.
+# What that costs:
+# - events accepted since the last flush are lost if the process crashes, a
+#   clean shutdown flushes them first
+# - a like of a missing user or target, or one that already exists, is
+#   answered with 200 and dropped by the flush instead of answered with an
+#   error
+# - counts and lists only show the change after the flush
+WRITE_BEHIND = os.getenv("BLOG_WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("BLOG_WRITE_BEHIND_BATCH_SIZE", "1000"))
+WRITE_BEHIND_INTERVAL_SECONDS = float(os.getenv("BLOG_WRITE_BEHIND_INTERVAL_SECONDS", "0.5"))
+
+logger = logging.getLogger(__name__)
+
+
+def change_blog_like_rankings(blog_id: int, happened_at, sign: int) -> None:
+    blog_leaderboard.change(blog_id, sign)
+    blog_trending.record(blog_id, happened_at, sign * LIKE_SCORE)
+
+
+def change_post_like_rankings(post_id: int, happened_at, sign: int) -> None:
+    post_trending.record(post_id, happened_at, sign * LIKE_SCORE)
+
+
+# Every buffered association with the column of its target, the counter it
+# keeps, its timestamp and what to update in process once a change commits
+ASSOCIATIONS: dict[type, tuple[InstrumentedAttribute, InstrumentedAttribute, InstrumentedAttribute,
+                               Callable[[int, Any, int], None] | None]] = {
+    BlogLike: (BlogLike.blog_id, Blog.like_count, BlogLike.liked_at, change_blog_like_rankings),
+    PostLike: (PostLike.post_id, Post.like_count, PostLike.liked_at, change_post_like_rankings),
+    CommentLike: (CommentLike.comment_id, Comment.like_count, CommentLike.liked_at, None),
+    BlogSave: (BlogSave.blog_id, Blog.save_count, BlogSave.saved_at, None),
+    PostSave: (PostSave.post_id, Post.save_count, PostSave.saved_at, None),
+    CommentSave: (CommentSave.comment_id, Comment.save_count, CommentSave.saved_at, None),
+}
+
+
+# Pending likes and saves keyed by (association, user id, target id). Only the
+# last event of a key is kept, a new like or save object or None for a
+# removal, so a like followed by an unlike before the flush writes nothing
+# more than the unlike. Each worker process has its own buffer.
+class WriteBehindBuffer:
+    def __init__(self):
+        self.pending: dict[tuple[type, int, int], Any] = {}
+        self.wake = asyncio.Event()
+        self.task: asyncio.Task | None = None
+        self.stopping = False
+
+    def add(self, association_model):
+        target_column = ASSOCIATIONS[type(association_model)][0]
+        key = (type(association_model), association_model.user_id, getattr(association_model, target_column.key))
+        self.record(key, association_model)
+        return association_model
+
+    def remove(self, association: type, user_id: int, target_id: int) -> None:
+        self.record((association, user_id, target_id), None)
+
+    def record(self, key: tuple[type, int, int], association_model) -> None:
+        self.pending.pop(key, None)
+        self.pending[key] = association_model
+        if len(self.pending) >= WRITE_BEHIND_BATCH_SIZE:
+            self.wake.set()
+
+    def start(self) -> None:
+        self.stopping = False
+        self.task = asyncio.create_task(self.run())
+
+    # The loop is asked to stop rather than cancelled, so a batch being
+    # written is finished and the loop's last flush writes what is left
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.stopping = True
+            self.wake.set()
+            await self.task
+            self.task = None
+        else:
+            await self.flush()
+
+        if self.pending:
+            logger.error("Write-behind stopped with %d events that could not be written", len(self.pending))
+
+    async def run(self) -> None:
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(self.wake.wait(), WRITE_BEHIND_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed unexpectedly, retrying later")
+
+        await self.flush()
+
+    # Events are taken out of the buffer before the flush awaits anything, so
+    # events arriving meanwhile wait for the next flush. A batch that fails or
+    # is cancelled is put back behind any newer event of the same key, and
+    # retried by the next flush. Writing a batch again is harmless, as likes
+    # that already exist and removals of missing ones are skipped.
+    async def flush(self) -> None:
+        while self.pending:
+            batch = dict(islice(self.pending.items(), WRITE_BEHIND_BATCH_SIZE))
+            for key in batch:
+                del self.pending[key]
+
+            try:
+                await write_batch(batch)
+            except BaseException as error:
+                for key, association_model in batch.items():
+                    self.pending.setdefault(key, association_model)
+                if not isinstance(error, (SQLAlchemyError, OSError)):
+                    raise
+                logger.exception("Write-behind flush of %d events failed, retrying later", len(batch))
+                return
+
+
+# One transaction per batch, with per association one query for the existing
+# rows, one each for the existing users and targets, one DELETE, one
+# executemany INSERT and one executemany counter UPDATE
+async def write_batch(batch: dict[tuple[type, int, int], Any]) -> None:
+    events_by_association: dict[type, dict[tuple[int, int], Any]] = {}
+    for (association, user_id, target_id), association_model in batch.items():
+        events_by_association.setdefault(association, {})[(user_id, target_id)] = association_model
+
+    committed_changes = []
+
+    async with SessionLocal() as session:
+        for association, events in events_by_association.items():
+            target_column, counter, timestamp_column, _ = ASSOCIATIONS[association]
+            user_ids = {user_id for user_id, _ in events}
+            target_ids = {target_id for _, target_id in events}
+
+            existing_rows = await session.execute(
+                select(association.user_id, target_column, timestamp_column).
+                filter(tuple_(association.user_id, target_column).in_(list(events)))
+            )
+            existing = {(user_id, target_id): happened_at for user_id, target_id, happened_at in existing_rows}
+            existing_user_ids = set(await session.scalars(select(User.id).filter(User.id.in_(user_ids))))
+            existing_target_ids = set(await session.scalars(
+                select(counter.class_.id).
+                filter(counter.class_.id.in_(target_ids))
+            ))
+
+            removed = [pair for pair, association_model in events.items()
+                       if association_model is None and pair in existing]
+            added = [association_model for pair, association_model in events.items()
+                     if association_model is not None and pair not in existing
+                     and pair[0] in existing_user_ids and pair[1] in existing_target_ids]
+
+            if removed:
+                await session.execute(
+                    delete(association).
+                    filter(tuple_(association.user_id, target_column).in_(removed))
+                )
+            if added:
+                await session.execute(insert(association), [
+                    {"user_id": association_model.user_id,
+                     target_column.key: getattr(association_model, target_column.key),
+                     timestamp_column.key: getattr(association_model, timestamp_column.key)}
+                    for association_model in added
+                ])
+
+            amounts = Counter(getattr(association_model, target_column.key) for association_model in added)
+            amounts.subtract(target_id for _, target_id in removed)
+            await change_counters(session, counter, {target_id: amount for target_id, amount in amounts.items()
+                                                     if amount})
+
+            committed_changes += [(association, target_id, existing[(user_id, target_id)], -1)
+                                  for user_id, target_id in removed]
+            committed_changes += [(association, getattr(association_model, target_column.key),
+                                   getattr(association_model, timestamp_column.key), 1)
+                                  for association_model in added]
+
+        await session.commit()
+
+    for association, target_id, happened_at, sign in committed_changes:
+        change_rankings = ASSOCIATIONS[association][3]
+        if change_rankings is not None:
+            change_rankings(target_id, happened_at, sign)
+
+
+write_behind_buffer = WriteBehindBuffer()
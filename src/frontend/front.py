@@ -1,27 +1,209 @@
-from typing import Annotated
-
-import requests
-from fastapi import FastAPI, Request, Form, Cookie
+import asyncio
+import hmac
+import math
+import os
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Annotated, Awaitable, Callable
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request, Form, Cookie, Header
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 RESTAPI_URL = "http://127.0.0.1:8000/api"
 
+# A single keep-alive client is shared by all handlers, so backend calls reuse
+# pooled connections instead of opening a new one per request
+RESTAPI_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+RESTAPI_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+
+# Cookie the backend sets on a client that just wrote, sending its reads to
+# the primary database for a while so it sees its own writes
+READ_PRIMARY_COOKIE = "blog_read_primary_until"
+
+# Backend cookies of the visitor being served. The shared client stores no
+# cookies, as its jar would send them on behalf of every visitor, so the
+# middleware below hands the visitor's cookie to the backend calls made for
+# them through this variable and passes a new one set by the backend on to
+# the visitor.
+visitor_backend_cookies: ContextVar[dict[str, str] | None] = ContextVar("visitor_backend_cookies", default=None)
+
+
+async def send_visitor_cookies(request: httpx.Request) -> None:
+    cookies = visitor_backend_cookies.get()
+    if cookies and READ_PRIMARY_COOKIE in cookies:
+        request.headers["Cookie"] = f"{READ_PRIMARY_COOKIE}={cookies[READ_PRIMARY_COOKIE]}"
+
+
+async def keep_visitor_cookies(response: httpx.Response) -> None:
+    cookies = visitor_backend_cookies.get()
+    value = response.cookies.get(READ_PRIMARY_COOKIE)
+    if cookies is not None and value is not None:
+        cookies[READ_PRIMARY_COOKIE] = value
+
+
+# Status codes of the backend calls made while rendering a cached page
+render_statuses: ContextVar[list[int] | None] = ContextVar("render_statuses", default=None)
+
+
+async def record_render_status(response: httpx.Response) -> None:
+    statuses = render_statuses.get()
+    if statuses is not None:
+        statuses.append(response.status_code)
+
+
+def reads_from_primary() -> bool:
+    try:
+        return float((visitor_backend_cookies.get() or {}).get(READ_PRIMARY_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+
+client = httpx.AsyncClient(limits=RESTAPI_LIMITS, timeout=RESTAPI_TIMEOUT,
+                           cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+                           event_hooks={"request": [send_visitor_cookies],
+                                        "response": [keep_visitor_cookies, record_render_status]})
+
+# Anonymous pages are the same for every visitor, pages of a logged-in user
+# contain their data and are kept for a shorter time
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("FRONT_PAGE_CACHE_MAX_ENTRIES", "1000"))
+ANONYMOUS_PAGE_TTL_SECONDS = float(os.getenv("FRONT_ANONYMOUS_PAGE_TTL_SECONDS", "10"))
+LOGGED_PAGE_TTL_SECONDS = float(os.getenv("FRONT_LOGGED_PAGE_TTL_SECONDS", "3"))
+# Secret the backend sends to drop pages it changed, see
+# src/backend/services/page_invalidation.py. Without one pages only expire.
+INVALIDATE_SECRET = os.getenv("FRONT_INVALIDATE_SECRET", "")
+
 app = FastAPI()
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
 
+@app.on_event("shutdown")
+async def close_client():
+    await client.aclose()
+
+
+@app.middleware("http")
+async def forward_read_primary_cookie(req: Request, call_next):
+    received = req.cookies.get(READ_PRIMARY_COOKIE)
+    cookies = {} if received is None else {READ_PRIMARY_COOKIE: received}
+    token = visitor_backend_cookies.set(cookies)
+    try:
+        response = await call_next(req)
+    finally:
+        visitor_backend_cookies.reset(token)
+
+    value = cookies.get(READ_PRIMARY_COOKIE)
+    if value is not None and value != received:
+        try:
+            max_age = math.ceil(float(value) - time.time())
+        except ValueError:
+            return response
+        if max_age > 0:
+            response.set_cookie(READ_PRIMARY_COOKIE, value, max_age=max_age, httponly=True, samesite="lax")
+    return response
+
+
+# LRU cache of rendered pages keyed by (route, params, variant, base url),
+# where the params are the path params followed by the page cursor, if the
+# page has one, and the variant is None for anonymous visitors. The base url
+# is part of the key because url_for renders absolute links.
+class PageCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.pages: OrderedDict[tuple, tuple[float, bytes]] = OrderedDict()
+
+    def get(self, key: tuple) -> bytes | None:
+        page = self.pages.get(key)
+        if page is None:
+            return None
+        expires_at, body = page
+        if expires_at <= time.monotonic():
+            del self.pages[key]
+            return None
+        self.pages.move_to_end(key)
+        return body
+
+    def set(self, key: tuple, body: bytes, ttl_seconds: float) -> None:
+        self.pages[key] = (time.monotonic() + ttl_seconds, body)
+        self.pages.move_to_end(key)
+        while len(self.pages) > self.max_entries:
+            self.pages.popitem(last=False)
+
+    # Drops every variant of a route, or only those whose params start with
+    # the given ones, so every page of a paged list goes at once
+    def invalidate(self, route: str, params: tuple | None = None) -> None:
+        for key in [key for key in self.pages
+                    if key[0] == route and (params is None or key[1][:len(params)] == params)]:
+            del self.pages[key]
+
+
+page_cache = PageCache(PAGE_CACHE_MAX_ENTRIES)
+
+
+async def cached_page(req: Request,
+                      route: str,
+                      params: tuple,
+                      variant: str | None,
+                      render: Callable[[], Awaitable[HTMLResponse]]) -> HTMLResponse:
+    key = (route, params, variant, str(req.base_url))
+    # A visitor who just wrote gets a fresh render from the primary, the
+    # cached page may predate their write
+    body = None if reads_from_primary() else page_cache.get(key)
+    if body is not None:
+        return HTMLResponse(body)
+    statuses = []
+    token = render_statuses.set(statuses)
+    try:
+        response = await render()
+    finally:
+        render_statuses.reset(token)
+    # A page rendered from a failed backend call, a missing blog or an empty
+    # list alike, is not kept, so it is not served once the data is there
+    if response.status_code == 200 and all(status < 400 for status in statuses):
+        ttl_seconds = ANONYMOUS_PAGE_TTL_SECONDS if variant is None else LOGGED_PAGE_TTL_SECONDS
+        page_cache.set(key, response.body, ttl_seconds)
+    return response
+
+
+# Lets the backend drop the pages of what it changed after each commit,
+# instead of waiting for the TTL. Without a route every page is dropped.
+@app.post("/blog/invalidate-pages", status_code=204)
+async def invalidate_pages(route: str | None = None, param: str | None = None,
+                           x_invalidate_secret: str | None = Header(None)):
+    if not INVALIDATE_SECRET or x_invalidate_secret is None \
+            or not hmac.compare_digest(x_invalidate_secret, INVALIDATE_SECRET):
+        raise HTTPException(status_code=403, detail="Invalid page invalidation secret")
+    if route is None:
+        page_cache.pages.clear()
+    else:
+        page_cache.invalidate(route, None if param is None else (param,))
+
+
+async def get_logged_user(cookie_id: str | None) -> httpx.Response | None:
+    if cookie_id is None:
+        return None
+    return await client.get(f'{RESTAPI_URL}/getUser/{cookie_id}')
+
+
 @app.get("/blog/home", response_class=HTMLResponse)
 async def get_home_page(req: Request, cookie_id: str = Cookie(None)):
-    blogs = requests.get(f'{RESTAPI_URL}/getNMostPopularBlogs?amount_to_display=10').json()
-    if cookie_id is not None:
-        get_user = requests.get(f'{RESTAPI_URL}/getUser/{cookie_id}')
-        if get_user.status_code == 200:
-            return templates.TemplateResponse("userPages/index.html", {"request": req, "blogs": blogs, "user": get_user.json()})
-    return templates.TemplateResponse("index.html", {"request": req, "blogs": blogs})
+    return await cached_page(req, "home", (), cookie_id, lambda: render_home_page(req, cookie_id))
+
+
+async def render_home_page(req: Request, cookie_id: str | None) -> HTMLResponse:
+    blogs, get_user = await asyncio.gather(
+        client.get(f'{RESTAPI_URL}/getNMostPopularBlogs', params={"amount_to_display": 10}),
+        get_logged_user(cookie_id)
+    )
+    if get_user is not None and get_user.status_code == 200:
+        return templates.TemplateResponse("userPages/index.html", {"request": req, "blogs": blogs.json(), "user": get_user.json()})
+    return templates.TemplateResponse("index.html", {"request": req, "blogs": blogs.json()})
 
 
 @app.get("/blog/login-page", response_class=HTMLResponse)
@@ -31,7 +213,7 @@ async def get_login_page(req: Request):
 
 @app.post("/blog/login-user")
 async def login_user(req: Request, user_name: Annotated[str, Form()], password: Annotated[str, Form()]):
-    user = requests.get(f'{RESTAPI_URL}/getUserByLogin?user_profile_name={user_name}&user_password={password}')
+    user = await client.get(f'{RESTAPI_URL}/getUserByLogin', params={"user_profile_name": user_name, "user_password": password})
     if user.status_code != 200:
         result = {"title": "Login Failed", "body": user}
         return templates.TemplateResponse("operationResult.html", {"request": req, "result": result})
@@ -59,7 +241,7 @@ async def get_register_page(req: Request):
 @app.post("/blog/register-user", response_class=HTMLResponse)
 async def register_user(req: Request, first_name: Annotated[str, Form()], last_name: Annotated[str, Form()], user_name: Annotated[str, Form()], email: Annotated[str, Form()], country: Annotated[str, Form()], password: Annotated[str, Form()]):
     user_to_registry = {"first_name": first_name, "last_name": last_name, "profile_name": user_name, "email": email, "country": country, "password": password}
-    x = requests.post(f'{RESTAPI_URL}/createUser', json=user_to_registry)
+    x = await client.post(f'{RESTAPI_URL}/createUser', json=user_to_registry)
     if x.status_code != 201:
         result = {"title": "Register Failed", "body": x}
         return templates.TemplateResponse("operationResult.html", {"request": req, "result": result})
@@ -68,46 +250,66 @@ async def register_user(req: Request, first_name: Annotated[str, Form()], last_n
 
 
 @app.get("/blog/blog-page/{blog_id}", response_class=HTMLResponse)
-async def get_blog_page(req: Request, blog_id: str, cookie_id: str = Cookie(None)):
-    blog = requests.get(f'{RESTAPI_URL}/getBlog/{blog_id}')
-    posts = requests.get(f'{RESTAPI_URL}/getBlogPosts/{blog_id}')
+async def get_blog_page(req: Request, blog_id: str, cursor: str | None = None, cookie_id: str = Cookie(None)):
+    return await cached_page(req, "blog-page", (blog_id, cursor), cookie_id,
+                             lambda: render_blog_page(req, blog_id, cursor, cookie_id))
+
+
+# Lists come from the backend one page at a time, the cursor of the next page
+# is passed on to the template, which links to it
+def page_params(cursor: str | None) -> dict[str, str]:
+    return {} if cursor is None else {"cursor": cursor}
+
+
+async def render_blog_page(req: Request, blog_id: str, cursor: str | None, cookie_id: str | None) -> HTMLResponse:
+    blog, posts, get_user = await asyncio.gather(
+        client.get(f'{RESTAPI_URL}/getBlog/{blog_id}'),
+        client.get(f'{RESTAPI_URL}/getBlogPosts/{blog_id}', params=page_params(cursor)),
+        get_logged_user(cookie_id)
+    )
+    next_cursor = posts.headers.get("X-Next-Cursor")
     if posts.status_code == 404:
         information = [{"title": "This blog has no posts yet"}]
-        if cookie_id is not None:
-            get_user = requests.get(f'{RESTAPI_URL}/getUser/{cookie_id}')
-            if get_user.status_code == 200:
-                return templates.TemplateResponse("userPages/blog.html", {"request": req, "blog": blog.json(), "posts": information, "user": get_user.json()})
-        else:
-            information = [{"title": "This blog has no posts yet"}]
-            return templates.TemplateResponse("blog.html", {"request": req, "blog": blog.json(), "posts": information})
-    if cookie_id is not None:
-        get_user = requests.get(f'{RESTAPI_URL}/getUser/{cookie_id}')
-        if get_user.status_code == 200:
-            return templates.TemplateResponse("userPages/blog.html", {"request": req, "blog": blog.json(), "posts": posts.json(), "user": get_user.json()})
-    return templates.TemplateResponse("blog.html", {"request": req, "blog": blog.json(), "posts": posts.json()})
+    else:
+        information = posts.json()
+    if get_user is not None and get_user.status_code == 200:
+        return templates.TemplateResponse("userPages/blog.html", {"request": req, "blog": blog.json(), "posts": information, "user": get_user.json(), "next_cursor": next_cursor})
+    return templates.TemplateResponse("blog.html", {"request": req, "blog": blog.json(), "posts": information, "next_cursor": next_cursor})
 
 
+# Logged-in visitors only get a different template here, without their data,
+# so they share one variant
 @app.get("/blog/post-comments/{post_id}", response_class=HTMLResponse)
-async def get_post_comments(req: Request, post_id: str, cookie_id: str = Cookie(None)):
-    post = requests.get(f'{RESTAPI_URL}/getPost/{post_id}')
-    comments = requests.get(f'{RESTAPI_URL}/getPostComments/{post_id}')
+async def get_post_comments(req: Request, post_id: str, cursor: str | None = None, cookie_id: str = Cookie(None)):
+    variant = None if cookie_id is None else "logged"
+    return await cached_page(req, "post-comments", (post_id, cursor), variant,
+                             lambda: render_post_comments(req, post_id, cursor, cookie_id))
+
+
+async def render_post_comments(req: Request, post_id: str, cursor: str | None, cookie_id: str | None) -> HTMLResponse:
+    post, comments = await asyncio.gather(
+        client.get(f'{RESTAPI_URL}/getPost/{post_id}'),
+        client.get(f'{RESTAPI_URL}/getPostComments/{post_id}', params=page_params(cursor))
+    )
     if comments.status_code == 404:
         information = [{"body": "This post has no comments yet"}]
         if cookie_id is not None:
             return templates.TemplateResponse("userPages/postsComments.html", {"request": req, "post": post.json(), "comments": information})
         else:
             return templates.TemplateResponse("postsComments.html", {"request": req, "post": post.json(), "comments": information})
+    next_cursor = comments.headers.get("X-Next-Cursor")
     if cookie_id is not None:
-        return templates.TemplateResponse("userPages/postsComments.html", {"request": req, "post": post.json(), "comments": comments.json()})
+        return templates.TemplateResponse("userPages/postsComments.html", {"request": req, "post": post.json(), "comments": comments.json(), "next_cursor": next_cursor})
     else:
-        return templates.TemplateResponse("postsComments.html", {"request": req, "post": post.json(), "comments": comments.json()})
+        return templates.TemplateResponse("postsComments.html", {"request": req, "post": post.json(), "comments": comments.json(), "next_cursor": next_cursor})
 
 
 @app.post("/blog/create-comment/{post_id}")
 async def create_blog(req: Request, post_id: str, body: Annotated[str, Form()], cookie_id: str = Cookie(None)):
-    user = requests.get(f'{RESTAPI_URL}/getUser/{cookie_id}').json()
+    user = (await client.get(f'{RESTAPI_URL}/getUser/{cookie_id}')).json()
     comment_to_create = {"user_id": user['id'], "post_id": post_id, "body": body}
-    x = requests.post(f'{RESTAPI_URL}/createComment', json=comment_to_create)
+    x = await client.post(f'{RESTAPI_URL}/createComment', json=comment_to_create)
+    page_cache.invalidate("post-comments", (post_id,))
     if x.status_code != 201:
         result = {"title": "Creation Failed", "body": x}
         return templates.TemplateResponse("operationResult.html", {"request": req, "result": result})
@@ -117,11 +319,18 @@ async def create_blog(req: Request, post_id: str, body: Annotated[str, Form()],
 
 @app.get("/blog/user-page/{user_id}", response_class=HTMLResponse)
 async def get_home_page(req: Request, user_id: str, cookie_id: str = Cookie(None)):
-    user = requests.get(f'{RESTAPI_URL}/getUser/{user_id}').json()
-    blogs = requests.get(f'{RESTAPI_URL}/getUserBlogs/{user_id}').json()
-    current_user = requests.get(f'{RESTAPI_URL}/getUser/{cookie_id}')
-    if current_user.status_code != 200:
-        return templates.TemplateResponse("user.html", {"request": req, "user": user.json(), "blogs": blogs})
+    return await cached_page(req, "user-page", (user_id,), cookie_id, lambda: render_user_page(req, user_id, cookie_id))
+
+
+async def render_user_page(req: Request, user_id: str, cookie_id: str | None) -> HTMLResponse:
+    user, blogs, current_user = await asyncio.gather(
+        client.get(f'{RESTAPI_URL}/getUser/{user_id}'),
+        client.get(f'{RESTAPI_URL}/getUserBlogs/{user_id}'),
+        get_logged_user(cookie_id)
+    )
+    user, blogs = user.json(), blogs.json()
+    if current_user is None or current_user.status_code != 200:
+        return templates.TemplateResponse("user.html", {"request": req, "user": user, "blogs": blogs})
     if user['uuid'] == cookie_id:
         return templates.TemplateResponse("userPages/selfUser.html", {"request": req, "user": user, "blogs": blogs})
     else:
@@ -135,9 +344,11 @@ async def get_create_blog_page(req: Request):
 
 @app.post("/blog/create-blog")
 async def create_blog(req: Request, title: Annotated[str, Form()], description: Annotated[str, Form()], cookie_id: str = Cookie(None)):
-    user = requests.get(f'{RESTAPI_URL}/getUser/{cookie_id}').json()
+    user = (await client.get(f'{RESTAPI_URL}/getUser/{cookie_id}')).json()
     blog_to_create = {"user_id": user['id'], "title": title, "description": description}
-    x = requests.post(f'{RESTAPI_URL}/createBlog', json=blog_to_create)
+    x = await client.post(f'{RESTAPI_URL}/createBlog', json=blog_to_create)
+    page_cache.invalidate("home")
+    page_cache.invalidate("user-page", (user['uuid'],))
     if x.status_code != 201:
         result = {"title": "Creation Failed", "body": x}
         return templates.TemplateResponse("operationResult.html", {"request": req, "result": result})
@@ -152,10 +363,14 @@ async def get_create_post_page(req: Request, blog_id: str):
 
 @app.post("/blog/create-post/{blog_id}")
 async def create_blog(req: Request, blog_id: str, title: Annotated[str, Form()], body: Annotated[str, Form()], cookie_id: str = Cookie(None)):
-    user = requests.get(f'{RESTAPI_URL}/getUser/{cookie_id}').json()
-    blog = requests.get(f'{RESTAPI_URL}/getBlog/{blog_id}').json()
+    user, blog = await asyncio.gather(
+        client.get(f'{RESTAPI_URL}/getUser/{cookie_id}'),
+        client.get(f'{RESTAPI_URL}/getBlog/{blog_id}')
+    )
+    user, blog = user.json(), blog.json()
     post_to_create = {"user_id": user['id'], "blog_id": blog['id'], "title": title, "body": body}
-    x = requests.post(f'{RESTAPI_URL}/createPost', json=post_to_create)
+    x = await client.post(f'{RESTAPI_URL}/createPost', json=post_to_create)
+    page_cache.invalidate("blog-page", (blog_id,))
     if x.status_code != 201:
         result = {"title": "Creation Failed", "body": x}
         return templates.TemplateResponse("operationResult.html", {"request": req, "result": result})
@@ -0,0 +1,57 @@
+import itertools
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+# The engine is created when src.backend.database is imported, so the test
+# database has to be chosen before any application module is
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ["BLOG_DB_URL"] = f"sqlite+aiosqlite:///{DATABASE_PATH}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from src.backend.main import app  # noqa: E402
+
+unique_numbers = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def database():
+    connection = sqlite3.connect(DATABASE_PATH)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def create_user(client):
+    def create() -> dict:
+        number = next(unique_numbers)
+        response = client.post("/api/createUser", json={
+            "first_name": "Test", "last_name": "User", "profile_name": f"test{number}", "password": "Passw0rd!",
+            "email": f"test{number}@example.com", "country": "PL"
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return create
+
+
+@pytest.fixture
+def create_blog(client, create_user):
+    def create(owner: dict | None = None) -> dict:
+        owner = owner or create_user()
+        response = client.post("/api/createBlog", json={
+            "user_id": owner["id"], "title": f"Test blog {next(unique_numbers)}", "description": "Test blog"
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return create
@@ -0,0 +1,40 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.backend.database import DB_URL
+from src.backend.services.counters import reconcile_counters
+
+
+# Runs on an engine of its own, as the application's engine belongs to the
+# event loop of the test client
+def reconcile() -> None:
+    async def run():
+        engine = create_async_engine(DB_URL)
+        async with async_sessionmaker(bind=engine)() as session:
+            await reconcile_counters(session)
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def blog_state(database, blog: dict) -> tuple[int, int]:
+    return database.execute("SELECT like_count, version FROM blog WHERE id = ?", (blog["id"],)).fetchone()
+
+
+# A corrected counter must change the ETag, or clients keep the wrong count
+def test_reconcile_bumps_the_version_of_corrected_rows_only(client, database, create_blog):
+    drifted, correct = create_blog(), create_blog()
+    etag = client.get(f"/api/getBlog/{drifted['uuid']}").headers["ETag"]
+    database.execute("UPDATE blog SET like_count = 3 WHERE id = ?", (drifted["id"],))
+    database.commit()
+    _, drifted_version = blog_state(database, drifted)
+    correct_state = blog_state(database, correct)
+
+    reconcile()
+
+    assert blog_state(database, drifted) == (0, drifted_version + 1)
+    assert blog_state(database, correct) == correct_state
+    response = client.get(f"/api/getBlog/{drifted['uuid']}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["like_count"] == 0
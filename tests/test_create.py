@@ -0,0 +1,43 @@
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from src.backend.services import create
+
+
+def test_duplicate_blog_title_is_rejected(client, create_blog):
+    blog = create_blog()
+
+    response = client.post("/api/createBlog", json={
+        "user_id": blog["owners"][0]["id"], "title": blog["title"], "description": "Same title"
+    })
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Blog with given title already exists"
+
+
+def test_duplicate_post_title_is_rejected_within_a_blog_only(client, create_blog):
+    blog = create_blog()
+    other_blog = create_blog(blog["owners"][0])
+    post = {"user_id": blog["owners"][0]["id"], "blog_id": blog["id"], "title": "Same title", "body": "Body"}
+
+    assert client.post("/api/createPost", json=post).status_code == 200
+    assert client.post("/api/createPost", json={**post, "blog_id": other_blog["id"]}).status_code == 200
+    response = client.post("/api/createPost", json=post)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Post with given title already exists in given blog"
+
+
+# A colliding uuid is not a duplicate title and must not be reported as one
+def test_other_integrity_errors_are_not_reported_as_duplicate_titles(client, create_user, monkeypatch):
+    owner = create_user()
+    uuid = uuid4()
+    monkeypatch.setattr(create, "uuid4", lambda: uuid)
+
+    first = client.post("/api/createBlog", json={"user_id": owner["id"], "title": f"Blog {uuid}", "description": "A"})
+    assert first.status_code == 200
+
+    with pytest.raises(IntegrityError, match="blog.uuid"):
+        client.post("/api/createBlog", json={"user_id": owner["id"], "title": f"Other {uuid}", "description": "A"})
@@ -0,0 +1,35 @@
+from src.backend.services import feed
+from src.backend.services.metrics import metrics
+
+
+def follow(client, user: dict, follower: dict) -> None:
+    response = client.post("/api/createUserFollow", json={"user_id": user["id"], "follower_id": follower["id"]})
+    assert response.status_code == 200, response.text
+
+
+# Posts of authors past the follower limit are read on demand, the others are
+# copied into the timelines, and the authors of a batch are checked at once
+def test_posts_of_popular_authors_are_fanned_out_on_read(client, database, create_user, create_blog, monkeypatch):
+    monkeypatch.setattr(feed, "FAN_OUT_MAX_FOLLOWERS", 1)
+    popular, followed, unfollowed = create_user(), create_user(), create_user()
+    follow(client, popular, create_user())
+    follow(client, popular, create_user())
+    follow(client, followed, create_user())
+    posts = [{"user_id": author["id"], "blog_id": create_blog(author)["id"], "title": "Post", "body": "Body"}
+             for author in (popular, followed, unfollowed)]
+
+    statements = metrics.statements
+    response = client.post("/api/createPosts", json=posts)
+    assert response.status_code == 200, response.text
+    statements_for_three = metrics.statements - statements
+
+    fanned_out = dict(database.execute(
+        "SELECT user_id, fanned_out FROM post WHERE user_id IN (?, ?, ?)",
+        (popular["id"], followed["id"], unfollowed["id"])
+    ).fetchall())
+    assert fanned_out == {popular["id"]: 0, followed["id"]: 1, unfollowed["id"]: 1}
+
+    more_posts = [{**post, "title": "Other post"} for post in posts[:1]]
+    statements = metrics.statements
+    assert client.post("/api/createPosts", json=more_posts).status_code == 200
+    assert metrics.statements - statements == statements_for_three
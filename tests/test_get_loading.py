@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import event
+
+from src.backend.database import engine
+from src.backend.services.cache import entity_cache
+from src.backend.services.metrics import metrics
+
+
+# Statements run while serving the request, each with its parameters
+def run_statements(client, url: str) -> list[tuple[str, tuple]]:
+    statements = []
+    entity_cache.clear()
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200, response.text
+    return statements
+
+
+# The entity cache is cleared first, as a cached entity is answered without
+# running any statement
+def statement_count(client, url: str) -> int:
+    entity_cache.clear()
+    before = metrics.statements
+    response = client.get(url)
+    assert response.status_code == 200, response.text
+    return metrics.statements - before
+
+
+def add_rows(create_user, create_blog, amount: int) -> None:
+    for _ in range(amount):
+        owner = create_user()
+        create_blog(owner)
+        create_blog(owner)
+
+
+@pytest.mark.parametrize("url", ["/api/getAllUsers", "/api/getAllBlogs",
+                                 "/api/getNMostPopularBlogs?amount_to_display=50"])
+def test_list_statement_count_does_not_grow_with_rows(client, create_user, create_blog, url):
+    add_rows(create_user, create_blog, 3)
+    statements_before = statement_count(client, url)
+
+    add_rows(create_user, create_blog, 15)
+
+    assert statement_count(client, url) == statements_before
+
+
+def test_single_row_statement_count_does_not_grow_with_blogs(client, create_user, create_blog):
+    owner = create_user()
+    blog = create_blog(owner)
+    user_statements = statement_count(client, f"/api/getUser/{owner['uuid']}")
+    blog_statements = statement_count(client, f"/api/getBlog/{blog['uuid']}")
+
+    for _ in range(10):
+        create_blog(owner)
+    add_rows(create_user, create_blog, 5)
+
+    assert statement_count(client, f"/api/getUser/{owner['uuid']}") == user_statements
+    assert statement_count(client, f"/api/getBlog/{blog['uuid']}") == blog_statements
+
+
+# Single-row lookups must only search indexes, a SCAN in the plan means
+# reading a whole table or index on every page view
+@pytest.mark.parametrize("path", ["getUser/{user_uuid}",
+                                  "getUserByLogin?user_profile_name={profile_name}&user_password=Passw0rd!",
+                                  "getBlog/{blog_uuid}"])
+def test_single_row_lookups_do_not_scan(client, database, create_user, create_blog, path):
+    owner = create_user()
+    blog = create_blog(owner)
+    add_rows(create_user, create_blog, 5)
+    url = "/api/" + path.format(user_uuid=owner["uuid"], profile_name=owner["profile_name"], blog_uuid=blog["uuid"])
+
+    for statement, parameters in run_statements(client, url):
+        plan = [row[3] for row in database.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        assert not [step for step in plan if step.startswith("SCAN")], (statement, plan)
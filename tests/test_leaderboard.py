@@ -0,0 +1,43 @@
+import random
+
+from src.backend.services.leaderboard import blog_leaderboard
+
+
+def sql_ranking(database) -> list[int]:
+    return [blog_id for blog_id, in database.execute("SELECT id FROM blog ORDER BY like_count DESC, id ASC")]
+
+
+# The in-process ranking has to agree with the like_count column, and that
+# column with the like rows, after any mix of likes, unlikes and deletes
+def test_leaderboard_matches_sql_ranking(client, database, create_user, create_blog):
+    randomizer = random.Random(7)
+    users = [create_user() for _ in range(8)]
+    blogs = [create_blog() for _ in range(6)]
+    liked = set()
+
+    for user in users:
+        for blog in randomizer.sample(blogs, randomizer.randint(0, len(blogs))):
+            response = client.post("/api/createBlogLike", json={"user_id": user["id"], "blog_id": blog["id"]})
+            assert response.status_code == 200, response.text
+            liked.add((user["uuid"], blog["uuid"]))
+
+    bulk_likes = [{"user_id": user["id"], "blog_id": blog["id"]} for user in users[:3] for blog in blogs
+                  if (user["uuid"], blog["uuid"]) not in liked]
+    assert client.post("/api/createBlogLikes", json=bulk_likes).status_code == 200
+    liked.update((user["uuid"], blog["uuid"]) for user in users[:3] for blog in blogs)
+
+    for user_uuid, blog_uuid in randomizer.sample(sorted(liked), len(liked) // 3):
+        assert client.delete(f"/api/deleteBlogLike/{user_uuid}/{blog_uuid}").status_code == 204
+
+    assert client.delete(f"/api/deleteBlog/{blogs[0]['uuid']}").status_code == 204
+    assert client.delete(f"/api/deleteBlog/{blogs[-1]['uuid']}").status_code == 204
+
+    ranking = sql_ranking(database)
+    assert blog_leaderboard.top(len(ranking) + 1) == ranking
+    assert database.execute(
+        "SELECT count(*) FROM blog "
+        "WHERE like_count != (SELECT count(*) FROM blog_like WHERE blog_like.blog_id = blog.id)"
+    ).fetchone() == (0,)
+
+    top = client.get("/api/getNMostPopularBlogs", params={"amount_to_display": 5})
+    assert [blog["id"] for blog in top.json()] == ranking[:5]
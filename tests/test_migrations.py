@@ -0,0 +1,46 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine, insert, inspect, text
+
+from src.backend.models.migrations import migrate
+from src.backend.models.models import get_metadata, Blog
+
+
+# A database created before the unique index on blog titles existed
+@pytest.fixture
+def old_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        get_metadata().create_all(connection)
+        connection.execute(text("DROP INDEX ix_blog_title"))
+    yield engine
+    engine.dispose()
+
+
+def add_blogs(engine, titles: list[str]) -> None:
+    with engine.begin() as connection:
+        connection.execute(insert(Blog), [
+            {"uuid": uuid4(), "title": title, "description": "Description", "created_at": datetime.now()}
+            for title in titles
+        ])
+
+
+def test_missing_unique_index_is_created(old_database):
+    add_blogs(old_database, ["First", "Second"])
+
+    with old_database.begin() as connection:
+        migrate(connection)
+
+    assert "ix_blog_title" in {index["name"] for index in inspect(old_database).get_indexes("blog")}
+
+
+def test_duplicates_fail_the_migration(old_database):
+    add_blogs(old_database, ["First", "Second", "Second"])
+
+    with pytest.raises(RuntimeError, match=r"ix_blog_title.*\(Second\) x2"):
+        with old_database.begin() as connection:
+            migrate(connection)
+
+    assert "ix_blog_title" not in {index["name"] for index in inspect(old_database).get_indexes("blog")}
@@ -0,0 +1,37 @@
+import pytest
+
+from src.backend.services import page_invalidation
+
+
+@pytest.fixture
+def notified_pages(monkeypatch):
+    pages = []
+
+    async def record(committed_pages):
+        pages.extend(committed_pages)
+
+    monkeypatch.setattr(page_invalidation, "PAGE_INVALIDATION", True)
+    monkeypatch.setattr(page_invalidation, "notify_frontend", record)
+    return pages
+
+
+@pytest.fixture
+def post(client, create_blog):
+    blog = create_blog()
+    response = client.post("/api/createPost", json={
+        "user_id": blog["owners"][0]["id"], "blog_id": blog["id"], "title": "Commented post", "body": "Body"
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+# New comments show up on the comments page of their post, however created
+@pytest.mark.parametrize("path, as_batch", [("/api/createComment", False), ("/api/createComments", True)])
+def test_new_comments_drop_the_page_of_their_post(client, post, notified_pages, path, as_batch):
+    comment = {"user_id": post["user_id"], "post_id": post["id"], "body": "Comment"}
+    notified_pages.clear()
+
+    response = client.post(path, json=[comment, comment] if as_batch else comment)
+
+    assert response.status_code == 200, response.text
+    assert notified_pages == [("post-comments", post["uuid"])]
@@ -0,0 +1,22 @@
+import pytest
+
+
+@pytest.mark.parametrize("path", ["/api/searchPosts", "/api/searchComments"])
+@pytest.mark.parametrize("query", ["   ", "\t\n"])
+def test_blank_query_is_rejected(client, path, query):
+    response = client.get(path, params={"query": query})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Search query has no words"
+
+
+def test_quoted_words_are_matched(client, create_blog):
+    blog = create_blog()
+    post = {"user_id": blog["owners"][0]["id"], "blog_id": blog["id"], "title": "Searchable title",
+            "body": 'Body with "quoted" zanzibar'}
+    assert client.post("/api/createPost", json=post).status_code == 200
+
+    response = client.get("/api/searchPosts", params={"query": ' "zanzibar  quoted'})
+
+    assert response.status_code == 200, response.text
+    assert [found["title"] for found in response.json()] == ["Searchable title"]
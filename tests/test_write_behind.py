@@ -0,0 +1,54 @@
+import asyncio
+
+from src.backend.models.models import BlogLike
+from src.backend.services import write_behind
+from src.backend.services.write_behind import WriteBehindBuffer
+
+
+def test_stop_finishes_the_batch_being_written(monkeypatch):
+    written = []
+
+    async def slow_write_batch(batch):
+        await asyncio.sleep(0.2)
+        written.extend(batch)
+
+    async def scenario():
+        buffer = WriteBehindBuffer()
+        buffer.start()
+        buffer.add(BlogLike(user_id=1, blog_id=1))
+        buffer.wake.set()
+        await asyncio.sleep(0.05)
+        buffer.add(BlogLike(user_id=2, blog_id=1))
+        await buffer.stop()
+        return buffer
+
+    monkeypatch.setattr(write_behind, "write_batch", slow_write_batch)
+    buffer = asyncio.run(scenario())
+
+    assert sorted(written) == [(BlogLike, 1, 1), (BlogLike, 2, 1)]
+    assert not buffer.pending
+
+
+def test_loop_keeps_running_after_an_unexpected_error(monkeypatch):
+    attempts = []
+
+    async def failing_once_write_batch(batch):
+        attempts.append(list(batch))
+        if len(attempts) == 1:
+            raise RuntimeError("unexpected")
+
+    async def scenario():
+        buffer = WriteBehindBuffer()
+        buffer.start()
+        buffer.add(BlogLike(user_id=1, blog_id=1))
+        buffer.wake.set()
+        await asyncio.sleep(0.05)
+        assert not buffer.task.done()
+        await buffer.stop()
+        return buffer
+
+    monkeypatch.setattr(write_behind, "write_batch", failing_once_write_batch)
+    buffer = asyncio.run(scenario())
+
+    assert attempts == [[(BlogLike, 1, 1)], [(BlogLike, 1, 1)]]
+    assert not buffer.pending